@@ -1,122 +1,165 @@
-import streamlit as st
-import json
 import time
+
+# Betik her çalıştırmada baştan yürütülür; ilk render süresi buradan ölçülür
+SCRIPT_START = time.perf_counter()
+
+import streamlit as st
+import streamlit.components.v1 as components
 import os
-from typing import Dict, List, Literal
-from pydantic import BaseModel, Field
 import random
+import uuid
+import threading
 from dotenv import load_dotenv
 
 # Environment variables yükle
 load_dotenv()
 
-# --- 1. Pydantic Model ---
-class Question(BaseModel):
-    question_id: int = Field(..., description="Soru numarası.")
-    question_text: str = Field(..., description="Soru metni.")
-    options: Dict[Literal['A', 'B', 'C', 'D', 'E'], str] = Field(..., description="5 adet seçenek.")
-    correct_option: Literal['A', 'B', 'C', 'D', 'E'] = Field(..., description="Doğru cevap anahtarı.")
-    explanation: str = Field(..., description="Doğru cevabın kısa açıklaması.")
-    question_type: str = Field(..., description="Soru tipi")
-
-class Quiz(BaseModel):
-    quiz: List[Question]
-
-# --- SİMÜLASYON VERİSİ ---
-BOŞLUK_DOLDURMA_SORULARI = [
-    {
-        "question_id": 1,
-        "question_text": "The rapid ______ of artificial intelligence across various sectors is expected to significantly reshape global labor markets.",
-        "options": {"A": "stagnation", "B": "proliferation", "C": "retraction", "D": "curtailment", "E": "impediment"},
-        "correct_option": "B",
-        "explanation": "'Proliferation' means rapid increase or spread, which fits the context of AI expansion.",
-        "question_type": "boşluk doldurma"
-    }
-]
-
-PARAGRAF_SORULARI = [
-    {
-        "question_id": 1,
-        "question_text": "Reading comprehension: The concept of sustainable development has gained significant traction in recent decades. This approach emphasizes meeting present needs without compromising future generations' ability to meet their own needs. What is the primary focus of sustainable development?",
-        "options": {
-            "A": "Maximizing current economic growth at all costs",
-            "B": "Balancing present needs with future generations' requirements", 
-            "C": "Eliminating all industrial activities",
-            "D": "Focusing exclusively on environmental conservation",
-            "E": "Prioritizing social equity over economic considerations"
-        },
-        "correct_option": "B",
-        "explanation": "The text emphasizes balancing present and future needs.",
-        "question_type": "paragraf sorusu"
-    }
-]
-
-KELİME_ANLAMI_SORULARI = [
-    {
-        "question_id": 1,
-        "question_text": "Choose the word that is closest in meaning to 'ubiquitous':",
-        "options": {
-            "A": "Rare",
-            "B": "Widespread", 
-            "C": "Complicated",
-            "D": "Expensive",
-            "E": "Temporary"
-        },
-        "correct_option": "B",
-        "explanation": "'Ubiquitous' means found everywhere, making 'widespread' the closest synonym.",
-        "question_type": "kelime anlamı"
-    }
-]
-
-DİL_BİLGİSİ_SORULARI = [
-    {
-        "question_id": 1,
-        "question_text": "Choose the correct verb form: If I ______ more time, I would have completed the project successfully.",
-        "options": {
-            "A": "have had",
-            "B": "had had", 
-            "C": "would have",
-            "D": "had",
-            "E": "have"
-        },
-        "correct_option": "B",
-        "explanation": "Type 3 conditional requires 'if + past perfect, would + have + past participle'.",
-        "question_type": "dil bilgisi"
-    }
-]
-
-CLOZE_TEST_SORULARI = [
-    {
-        "question_id": 1,
-        "question_text": "Cloze test: Climate change represents one of the most pressing challenges of our time. The ______ of greenhouse gases has led to increased global temperatures. This phenomenon has far-reaching consequences for ecosystems worldwide.",
-        "options": {
-            "A": "reduction, known, manageable",
-            "B": "release, referred, irreversible", 
-            "C": "absorption, called, temporary",
-            "D": "elimination, termed, beneficial",
-            "E": "production, named, insignificant"
-        },
-        "correct_option": "B",
-        "explanation": "'Release', 'referred', and 'irreversible' fit the context of climate change discussion.",
-        "question_type": "cloze test"
-    }
-]
+# --- 1. Metrikler ---
+from metrics import METRICS_PORT, observe, registry, span, start_metrics_server, write_prometheus
 
-# Tüm soruları birleştir
-TÜM_SORULAR = BOŞLUK_DOLDURMA_SORULARI + PARAGRAF_SORULARI + KELİME_ANLAMI_SORULARI + DİL_BİLGİSİ_SORULARI + CLOZE_TEST_SORULARI
+# --- SİMÜLASYON VERİSİ ve Paylaşılan Soru Deposu ---
+# Oturumlar soruların yalnızca depodaki anahtarlarını tutar
+from question_store import estimate_size, get_question_store
+from simulation_data import CLOZE_TEST_SORULARI, SIMULATION_QUESTIONS
+
+# --- Üretim Kuyruğu ---
+# Açıkken sınav üretimi ayrı işçi süreçlerde yapılır; arayüz işi kuyruğa koyar ve soruları okur
+from job_queue import FINISHED_STATUSES, get_job_queue, start_worker_processes
 
 # --- RAG Fonksiyonları Import ---
+# rag_pipeline import'u hafiftir; Gemini istemcisi ilk üretimde get_llm_client ile kurulur
 try:
-    from rag_pipeline import generate_quiz_with_rag
+    from rag_pipeline import generate_quiz_with_rag, iter_quiz_with_rag
+    from llm_backends import backend_available, get_backend
     RAG_AVAILABLE = True
 except ImportError as e:
     RAG_AVAILABLE = False
     print(f"RAG modülü yüklenemedi: {e}")
 
+# Sorular üretildikçe sınava aktarılsın mı (ilk soru hazır olunca sınav başlar)
+STREAM_QUESTIONS = os.getenv("STREAM_QUESTIONS", "1") == "1"
+
+# Üretim, Streamlit sürecindeki thread yerine SQLite kuyruğu üzerinden işçi süreçlerde mi yapılsın
+GENERATION_QUEUE = os.getenv("GENERATION_QUEUE", "0") == "1"
+
+# Kuyruk açıkken Streamlit'in kendisinin başlatacağı işçi süreç sayısı (0 = işçiler ayrıca çalıştırılır:
+# python job_queue.py worker)
+JOB_QUEUE_WORKERS = int(os.getenv("JOB_QUEUE_WORKERS", "1"))
+
+# Kuyruktaki işi bu kadar saniye hiçbir işçi almazsa sınav simülasyon sorularıyla başlar
+QUEUE_CLAIM_TIMEOUT = float(os.getenv("QUEUE_CLAIM_TIMEOUT", "30"))
+
+# Kullanıcı gelen son sorudayken yeni soru için en uzun bekleme (sn); sonra sayfa bir kez yenilenir
+QUESTION_WAIT_SECONDS = float(os.getenv("QUESTION_WAIT_SECONDS", "30"))
+# Bekleme sırasında durum yazısının güncellenme ve kuyruğun okunma aralığı (sn)
+QUESTION_POLL_SECONDS = 0.5
+
+# Render süreleri sayfada da gösterilsin mi
+SHOW_TIMINGS = os.getenv("SHOW_TIMINGS", "0") == "1"
+
+# Kenar çubuğunda gecikme ve hata metrikleri gösterilsin mi
+SHOW_ADMIN_PANEL = os.getenv("SHOW_ADMIN_PANEL", "0") == "1"
+
+@st.cache_resource
+def start_metrics_endpoint():
+    """METRICS_PORT ayarlıysa Prometheus /metrics sunucusunu süreç başına bir kez başlatır"""
+    if METRICS_PORT:
+        return start_metrics_server(METRICS_PORT)
+    return None
+
+@st.cache_resource
+def start_queue_workers():
+    """Kuyruk işçilerini Streamlit süreci başına bir kez başlatır"""
+    if GENERATION_QUEUE and JOB_QUEUE_WORKERS > 0:
+        return start_worker_processes(JOB_QUEUE_WORKERS)
+    return []
+
+@st.cache_resource(show_spinner="🤖 Gemini istemcisi hazırlanıyor...")
+def get_llm_client():
+    """LLM istemcisini süreç başına bir kez kurar; tüm oturumlar aynı örneği kullanır.
+
+    Hata önbelleğe alınmaz, bir sonraki üretimde yeniden denenir.
+    """
+    if not backend_available():
+        return None
+    backend = get_backend()
+    backend.connect()
+    return backend
+
+def export_metrics():
+    """Metrikleri Prometheus metin dosyasına yazar; hata üretimi durdurmaz"""
+    try:
+        write_prometheus()
+    except OSError as e:
+        print(f"⚠️ Metrik dosyası yazılamadı: {e}")
+
+def display_admin_panel():
+    """Kenar çubuğunda soru tipi başına kayan p50/p95 gecikmeler ve hata sayaçları"""
+    with st.sidebar.expander("📈 Yönetim Paneli", expanded=False):
+        latencies = registry.summary("llm_call_seconds", group_by="question_type")
+        if latencies:
+            st.markdown("**LLM gecikmesi (son istekler)**")
+            st.table([
+                {"Soru tipi": q_type, "İstek": s["count"],
+                 "p50 (sn)": f"{s['p50']:.2f}", "p95 (sn)": f"{s['p95']:.2f}"}
+                for q_type, s in latencies.items()
+            ])
+        else:
+            st.caption("Henüz LLM isteği yok.")
+
+        ready = registry.summary("question_ready_seconds", group_by="question_type")
+        if ready:
+            st.markdown("**Sorunun hazır olma süresi**")
+            st.table([
+                {"Sınav tipi": q_type, "Soru": s["count"],
+                 "p50 (sn)": f"{s['p50']:.2f}", "p95 (sn)": f"{s['p95']:.2f}"}
+                for q_type, s in ready.items()
+            ])
+
+        responses = registry.counter_total("json_responses")
+        failures = registry.counter_total("json_failures")
+        col1, col2 = st.columns(2)
+        col1.metric("Yedek soru", registry.counter_total("fallbacks"))
+        col2.metric("Yeniden deneme", registry.counter_total("retries"))
+        col1.metric("JSON hata oranı", f"%{failures / responses * 100:.1f}" if responses else "-")
+        col2.metric("Bankadan soru", registry.counter_total("questions", source="bank"))
+
+        # Oturum durumu yalnızca soru anahtarlarını tutar; sorular tüm oturumlarca paylaşılır
+        session_sizes = session_memory_report()
+        session_bytes = sum(session_sizes.values())
+        observe("session_state_bytes", session_bytes)
+        store_stats = get_question_store().stats()
+        st.markdown("**Bellek**")
+        col1, col2 = st.columns(2)
+        col1.metric("Bu oturum", f"{session_bytes / 1024:.1f} KB")
+        col2.metric("Paylaşılan soru deposu", f"{store_stats['bytes'] / 1024:.0f} KB",
+                    help=f"{store_stats['questions']} soru, {store_stats['shared']} kez paylaşıldı")
+        st.table([
+            {"Anahtar": key, "KB": f"{size / 1024:.2f}"}
+            for key, size in sorted(session_sizes.items(), key=lambda item: -item[1])[:8]
+        ])
+
+        if st.button("💾 Prometheus dosyasına yaz"):
+            export_metrics()
+            st.success("Metrikler yazıldı.")
+
+def session_memory_report():
+    """Bu oturumun durum anahtarlarının yaklaşık bellek kullanımı (bayt)"""
+    return {key: estimate_size(value) for key, value in st.session_state.to_dict().items()}
+
+def report_render_time():
+    """Bu çalıştırmanın render süresini ölçer; oturumun ilk render'ı ayrıca kaydedilir"""
+    elapsed_ms = (time.perf_counter() - SCRIPT_START) * 1000
+    if 'first_render_ms' not in st.session_state:
+        st.session_state.first_render_ms = elapsed_ms
+        print(f"⏱️ İlk render: {elapsed_ms:.0f} ms")
+    if SHOW_TIMINGS:
+        st.caption(f"⏱️ İlk render: {st.session_state.first_render_ms:.0f} ms · bu çalıştırma: {elapsed_ms:.0f} ms")
+
 # --- 2. Oturum Durumu Yönetimi ---
 def initialize_session_state():
-    if 'quiz_data' not in st.session_state:
-        st.session_state.quiz_data = []
+    if 'quiz_ids' not in st.session_state:
+        st.session_state.quiz_ids = []
     if 'current_question_index' not in st.session_state:
         st.session_state.current_question_index = 0
     if 'user_answers' not in st.session_state:
@@ -135,10 +178,19 @@ def initialize_session_state():
         st.session_state.time_limit = None
     if 'remaining_time' not in st.session_state:
         st.session_state.remaining_time = None
+    if 'end_time' not in st.session_state:
+        st.session_state.end_time = None
+    if 'generation_job' not in st.session_state:
+        st.session_state.generation_job = None
+    if 'user_id' not in st.session_state:
+        # Soru bankasında kullanıcının daha önce gördüğü soruları ayırmak için
+        st.session_state.user_id = uuid.uuid4().hex
 
 def reset_quiz_completely():
     """Sınavı tamamen sıfırlar ve ana menüye döner"""
-    st.session_state.quiz_data = []
+    cancel_generation_job()
+    st.session_state.generation_job = None
+    st.session_state.quiz_ids = []
     st.session_state.current_question_index = 0
     st.session_state.user_answers = {}
     st.session_state.quiz_started = False
@@ -146,9 +198,15 @@ def reset_quiz_completely():
     st.session_state.start_time = None
     st.session_state.time_limit = None
     st.session_state.remaining_time = None
+    st.session_state.end_time = None
     st.rerun()
 
 # --- 3. Zaman Sayacı Fonksiyonları ---
+# Geri sayım tarayıcıda çalışır; sunucu yalnızca süre dolunca ya da kullanıcı bir şey yapınca çalışır
+_countdown_component = components.declare_component(
+    "countdown", path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "components", "countdown")
+)
+
 def calculate_time_limit(num_questions, question_type):
     """Soru sayısı ve tipine göre zaman limitini hesaplar"""
     base_time_per_question = 2.25  # dakika
@@ -175,7 +233,7 @@ def format_time(seconds):
     return f"{minutes:02d}:{secs:02d}"
 
 def update_timer():
-    """Zaman sayacını günceller"""
+    """Zaman sayacını sunucu saatine göre günceller; süre dolduysa sınavı bitirir"""
     if (st.session_state.quiz_started and 
         not st.session_state.quiz_completed and 
         st.session_state.start_time and 
@@ -185,10 +243,19 @@ def update_timer():
         st.session_state.remaining_time = max(0, st.session_state.time_limit - elapsed_time)
         
         if st.session_state.remaining_time <= 0:
-            st.session_state.quiz_completed = True
+            finish_quiz()
             st.session_state.remaining_time = 0
             st.rerun()
 
+def finish_quiz():
+    """Sınavı bitirir; bitiş anı süre sınırını aşamaz"""
+    st.session_state.quiz_completed = True
+    if st.session_state.start_time and st.session_state.time_limit:
+        deadline = st.session_state.start_time + st.session_state.time_limit
+        st.session_state.end_time = min(time.time(), deadline)
+    else:
+        st.session_state.end_time = time.time()
+
 # --- 4. Soru Üretme Fonksiyonları ---
 def enhance_simulated_question_with_topic(question, topic, question_type):
     """Simüle edilmiş soruyu konuya uygun hale getirir"""
@@ -218,36 +285,170 @@ def get_random_question_type(previous_types, available_types):
     
     return random.choice(available_types)
 
-def generate_quiz(topic, num_questions, question_type):
-    """RAG veya simülasyon ile soru üretir"""
+def start_generation_job(topic, num_questions, question_type, user_id):
+    """Soruları arka plan thread'inde üretir; sorular hazır oldukça depoya konur, anahtarları job["question_ids"] listesine eklenir.
+
+    Thread Streamlit API'sine dokunmaz, yalnızca bu sözlüğü günceller ve
+    job["changed"] koşuluyla bekleyen oturumu uyandırır.
+    """
+    changed = threading.Condition()
+    job = {"question_ids": [], "total": num_questions, "done": False, "cancelled": False, "error": None,
+           "queue_id": None, "changed": changed}
+    store = get_question_store()
+
+    def worker():
+        questions = iter_quiz_with_rag(topic, num_questions, question_type, user_id=user_id)
+        try:
+            for question in questions:
+                key = store.put(question)
+                with changed:
+                    job["question_ids"].append(key)
+                    changed.notify_all()
+                if job["cancelled"]:
+                    break
+        except Exception as e:
+            job["error"] = str(e)
+            print(f"❌ Arka plan üretim hatası: {e}")
+        finally:
+            questions.close()
+            with changed:
+                job["done"] = True
+                changed.notify_all()
+            export_metrics()
+
+    threading.Thread(target=worker, daemon=True).start()
+    return job
+
+def start_queue_job(topic, num_questions, question_type, user_id):
+    """Sınavı üretim kuyruğuna koyar; sorular refresh_queue_job ile okunur"""
+    queue_id = get_job_queue().enqueue(topic, num_questions, question_type, user_id)
+    return {"question_ids": [], "total": num_questions, "done": False, "cancelled": False, "error": None,
+            "queue_id": queue_id, "status": "queued"}
+
+def refresh_queue_job(job):
+    """Kuyruk işinin yeni sorularını depoya alır; iş bittiyse job["done"] işaretlenir.
+
+    Oturum yalnızca bu çalıştırmada okunan soruları görür; aradaki sorular
+    bir sonraki yeniden çalıştırmada gelir.
+    """
+    if not job or job.get("queue_id") is None or job["done"]:
+        return
+    try:
+        status, questions = get_job_queue().poll(job["queue_id"], len(job["question_ids"]))
+    except Exception as e:
+        print(f"⚠️ Üretim kuyruğu okunamadı: {e}")
+        return
+    job["status"] = status["status"]
+    store = get_question_store()
+    # Aynı liste oturumdaki quiz_ids'tir; yerinde genişletilir
+    job["question_ids"].extend(store.put(question) for question in questions[:job["total"] - len(job["question_ids"])])
+    if status["status"] in FINISHED_STATUSES:
+        job["done"] = True
+        job["error"] = status.get("error")
+
+def cancel_generation_job():
+    """Devam eden arka plan üretimini durdurur"""
+    job = st.session_state.get('generation_job')
+    if job and not job["done"]:
+        job["cancelled"] = True
+        if job.get("queue_id") is not None:
+            try:
+                get_job_queue().cancel(job["queue_id"])
+            except Exception as e:
+                print(f"⚠️ Kuyruk işi iptal edilemedi: {e}")
+
+def get_total_questions():
+    """Sınavdaki toplam soru sayısı; üretim sürüyorsa planlanan sayı"""
+    job = st.session_state.generation_job
+    if job and not job["done"]:
+        return job["total"]
+    return len(st.session_state.quiz_ids)
+
+def get_quiz_question(index):
+    """Sınavın index. sorusu (depodan); depodan silinmişse None"""
+    return get_question_store().quiz_question(st.session_state.quiz_ids[index], index + 1)
+
+def get_quiz_questions():
+    """Sınavın gelmiş olan tüm soruları"""
+    questions = (get_quiz_question(i) for i in range(len(st.session_state.quiz_ids)))
+    return [q for q in questions if q is not None]
+
+def start_quiz(question_ids, num_questions, question_type):
+    """Sınav oturumunu başlatır; süre bu andan itibaren işler"""
+    st.session_state.quiz_ids = question_ids
+    st.session_state.quiz_started = True
+    st.session_state.current_question_index = 0
+    st.session_state.user_answers = {}
+    st.session_state.num_questions_value = num_questions
+    st.session_state.quiz_completed = False
+    st.session_state.question_type = question_type
     
+    st.session_state.time_limit = calculate_time_limit(num_questions, question_type)
+    st.session_state.start_time = time.time()
+    st.session_state.remaining_time = st.session_state.time_limit
+    st.session_state.end_time = None
+
+def generate_quiz(topic, num_questions, question_type):
+    """RAG veya simülasyon ile soru üretir; süre ve kullanılan mod metriklere yazılır"""
+    with span("app_generate_quiz", question_type=question_type) as fields:
+        fields["num_questions"] = num_questions
+        _generate_quiz(topic, num_questions, question_type, fields)
+
+def _generate_quiz(topic, num_questions, question_type, span_fields):
     # Önce data klasörünü kontrol et
     if not os.path.exists("data"):
         os.makedirs("data")
     
-    # RAG kullanmayı dene
-    if RAG_AVAILABLE:
+    # RAG kullanmayı dene (istemci yalnızca ilk üretimde kurulur)
+    rag_ready = False
+    if RAG_AVAILABLE and GENERATION_QUEUE:
+        # İstemciyi işçi süreçler kurar
+        rag_ready = backend_available()
+    elif RAG_AVAILABLE:
+        try:
+            rag_ready = get_llm_client() is not None
+        except Exception as e:
+            print(f"❌ Gemini API yapılandırma hatası: {e}")
+    if rag_ready and (STREAM_QUESTIONS or GENERATION_QUEUE):
+        if GENERATION_QUEUE:
+            span_fields["mode"] = "queue"
+            job = start_queue_job(topic, num_questions, question_type, st.session_state.user_id)
+        else:
+            span_fields["mode"] = "stream"
+            job = start_generation_job(topic, num_questions, question_type, st.session_state.user_id)
+        with st.spinner("🤖 İlk soru hazırlanıyor..."):
+            waited_since = time.time()
+            while not job["question_ids"] and not job["done"]:
+                time.sleep(0.2)
+                refresh_queue_job(job)
+                if job.get("status") == "queued" and time.time() - waited_since > QUEUE_CLAIM_TIMEOUT:
+                    print("⚠️ Kuyruk işini alan işçi yok, simülasyona geçiliyor")
+                    get_job_queue().cancel(job["queue_id"])
+                    break
+        
+        if job["question_ids"]:
+            st.session_state.generation_job = job
+            # Oturum, iş parçacığının doldurduğu anahtar listesini paylaşır
+            start_quiz(job["question_ids"], num_questions, question_type)
+            st.toast(f"✅ İlk soru hazır! Kalan {num_questions - 1} soru arka planda üretiliyor.", icon='🤖')
+            st.rerun()
+            return
+    
+    elif rag_ready:
+        span_fields["mode"] = "batch"
         with st.spinner(f"🤖 RAG ile {num_questions} soru üretiliyor..."):
-            rag_questions = generate_quiz_with_rag(topic, num_questions, question_type)
+            rag_questions = generate_quiz_with_rag(topic, num_questions, question_type,
+                                                   user_id=st.session_state.user_id)
+        export_metrics()
         
         if rag_questions and len(rag_questions) > 0:
-            st.session_state.quiz_data = rag_questions
-            st.session_state.quiz_started = True
-            st.session_state.current_question_index = 0
-            st.session_state.user_answers = {}
-            st.session_state.num_questions_value = num_questions
-            st.session_state.quiz_completed = False
-            st.session_state.question_type = question_type
-            
-            st.session_state.time_limit = calculate_time_limit(num_questions, question_type)
-            st.session_state.start_time = time.time()
-            st.session_state.remaining_time = st.session_state.time_limit
-            
+            start_quiz(get_question_store().put_many(rag_questions), num_questions, question_type)
             st.toast(f"✅ RAG ile {num_questions} soru üretildi!", icon='🤖')
             st.rerun()
             return
     
     # RAG başarısız olursa simülasyona geç
+    span_fields["mode"] = "simulation"
     st.info("🤖 Simülasyon modu ile sorular hazırlanıyor...")
     
     simulated_quiz_data = []
@@ -264,16 +465,7 @@ def generate_quiz(topic, num_questions, question_type):
         else:
             selected_type = question_type
         
-        if selected_type == "boşluk doldurma":
-            question_source = BOŞLUK_DOLDURMA_SORULARI
-        elif selected_type == "paragraf sorusu":
-            question_source = PARAGRAF_SORULARI
-        elif selected_type == "kelime anlamı":
-            question_source = KELİME_ANLAMI_SORULARI
-        elif selected_type == "dil bilgisi":
-            question_source = DİL_BİLGİSİ_SORULARI
-        else:
-            question_source = CLOZE_TEST_SORULARI
+        question_source = SIMULATION_QUESTIONS.get(selected_type, CLOZE_TEST_SORULARI)
         
         original_question = question_source[i % len(question_source)]
         new_question_id = i + 1
@@ -285,18 +477,7 @@ def generate_quiz(topic, num_questions, question_type):
         new_question = enhance_simulated_question_with_topic(new_question, topic, selected_type)
         simulated_quiz_data.append(new_question)
     
-    st.session_state.quiz_data = simulated_quiz_data 
-    st.session_state.quiz_started = True
-    st.session_state.current_question_index = 0
-    st.session_state.user_answers = {}
-    st.session_state.num_questions_value = num_questions
-    st.session_state.quiz_completed = False
-    st.session_state.question_type = question_type
-    
-    st.session_state.time_limit = calculate_time_limit(num_questions, question_type)
-    st.session_state.start_time = time.time()
-    st.session_state.remaining_time = st.session_state.time_limit
-    
+    start_quiz(get_question_store().put_many(simulated_quiz_data), num_questions, question_type)
     st.toast(f"📝 {num_questions} soruluk sınav başlatıldı! Konu: {topic}", icon='🎯')
     st.rerun()
 
@@ -314,46 +495,74 @@ def handle_navigation(num_questions):
     
     with col2:
         if st.button("❌ Sınavı Bitir", type="primary", use_container_width=True):
-            st.session_state.quiz_completed = True
+            finish_quiz()
+            cancel_generation_job()
             st.rerun()
     
+    # Akış modunda yalnızca gelmiş olan sorulara geçilebilir
+    available = len(st.session_state.quiz_ids)
     with col3:
-        if st.session_state.current_question_index < num_questions - 1:
+        if st.session_state.current_question_index < available - 1:
             if st.button("Sonraki Soru ➡️", use_container_width=True):
                 st.session_state.current_question_index += 1
                 st.rerun()
+        elif st.session_state.current_question_index < num_questions - 1:
+            st.button("⏳ Sonraki Soru Hazırlanıyor...", disabled=True, use_container_width=True)
         else:
             st.button("Son Soru ➡️", disabled=True, use_container_width=True)
 
+def wait_for_next_question():
+    """Kullanıcı gelen son sorudaysa yeni soru gelene kadar bekler, sonra sayfayı bir kez yeniler.
+
+    Bekleme sırasında yalnızca durum yazısı güncellenir; sayfa her saniye baştan
+    çalıştırılmaz. Yer tutucu güncellemeleri, kullanıcının tıklamasıyla gelen
+    yeniden çalıştırma isteğinin de beklemeden fark edilmesini sağlar.
+    """
+    job = st.session_state.generation_job
+    if not job or job["done"]:
+        return
+    
+    available = len(st.session_state.quiz_ids)
+    status = st.empty()
+    status.caption(f"🤖 {available}/{job['total']} soru hazır, diğerleri üretiliyor...")
+    if st.session_state.current_question_index < available - 1:
+        return
+    
+    changed = job.get("changed")
+    wait_until = time.time() + QUESTION_WAIT_SECONDS
+    while time.time() < wait_until:
+        if changed is not None:
+            with changed:
+                changed.wait_for(lambda: job["done"] or len(job["question_ids"]) > available, QUESTION_POLL_SECONDS)
+        else:
+            # Kuyruk işinin soruları işçi süreçte üretilir; SQLite'tan okunur
+            time.sleep(QUESTION_POLL_SECONDS)
+            refresh_queue_job(job)
+        if job["done"] or len(job["question_ids"]) > available:
+            break
+        status.caption(f"🤖 {available}/{job['total']} soru hazır, diğerleri üretiliyor...")
+    st.rerun()
+
 # --- 6. Zaman Göstergesi ---
 def display_timer():
-    """Zaman göstergesini görüntüler"""
+    """Zaman göstergesini görüntüler.
+
+    Sayaç tarayıcıda saniyede birkaç kez güncellenir, sunucu her saniye yeniden
+    çalışmaz. Süre dolunca bileşen bir değer göndererek yeniden çalıştırmayı
+    tetikler; sınavın bitip bitmediğine yine update_timer sunucu saatiyle karar verir.
+    """
     if (st.session_state.quiz_started and 
         not st.session_state.quiz_completed and 
         st.session_state.remaining_time is not None):
         
         update_timer()
         
-        progress = st.session_state.remaining_time / st.session_state.time_limit
-        
-        if progress > 0.5:
-            color = "green"
-        elif progress > 0.25:
-            color = "orange"
-        else:
-            color = "red"
-        
-        col1, col2 = st.columns([3, 1])
-        with col1:
-            st.progress(progress, text=f"Kalan Süre: {format_time(st.session_state.remaining_time)}")
-        with col2:
-            st.markdown(f"<span style='color: {color}; font-weight: bold; font-size: 18px;'>{format_time(st.session_state.remaining_time)}</span>", 
-                       unsafe_allow_html=True)
-        
-        if st.session_state.remaining_time < 60:
-            st.warning("⏰ Son 1 dakika! Hızlanın!")
-        elif st.session_state.remaining_time < 300:
-            st.info("⏱️ Son 5 dakika kaldı!")
+        _countdown_component(
+            remaining_ms=int(st.session_state.remaining_time * 1000),
+            total_ms=int(st.session_state.time_limit * 1000),
+            key="quiz_countdown",
+            default=None,
+        )
 
 # --- 7. Soru Görüntüleme ---
 def display_question(question: dict, num_questions: int): 
@@ -400,10 +609,11 @@ def display_question(question: dict, num_questions: int):
 # --- 8. Sonuçları Görüntüleme ---
 def display_results():
     total_score = 0
-    num_questions = len(st.session_state.quiz_data)
+    questions = get_quiz_questions()
+    num_questions = len(questions)
     
     type_analysis = {}
-    for question in st.session_state.quiz_data:
+    for question in questions:
         q_type = question.get('question_type', 'bilinmiyor')
         q_id = question.get('question_id', 0)
         user_answer = st.session_state.user_answers.get(q_id)
@@ -418,7 +628,8 @@ def display_results():
             total_score += 1
     
     if st.session_state.start_time:
-        elapsed_time = time.time() - st.session_state.start_time
+        end_time = st.session_state.end_time or time.time()
+        elapsed_time = end_time - st.session_state.start_time
         time_spent = format_time(elapsed_time)
     else:
         time_spent = "Bilinmiyor"
@@ -449,7 +660,7 @@ def display_results():
             st.write(f"**{q_type}:** {correct}/{total} (%{percentage:.1f})")
         st.markdown("---")
     
-    for question in st.session_state.quiz_data:
+    for question in questions:
         q_id = question.get('question_id', 0)
         user_answer = st.session_state.user_answers.get(q_id)
         q_type = question.get('question_type', 'boşluk doldurma')
@@ -475,7 +686,7 @@ def display_results():
         st.markdown(f"**Açıklama:** {question['explanation']}")
         st.markdown("---")
 
-    percentage = (total_score / num_questions) * 100
+    percentage = (total_score / num_questions) * 100 if num_questions else 0
     st.success(f"## 🎉 Toplam Skor: {total_score} / {num_questions} (%{percentage:.1f})")
     
     if percentage >= 80:
@@ -504,6 +715,11 @@ def main():
     st.subheader("Akbank GenAI Bootcamp Projesi")
 
     initialize_session_state()
+    start_metrics_endpoint()
+    start_queue_workers()
+    refresh_queue_job(st.session_state.generation_job)
+    if SHOW_ADMIN_PANEL:
+        display_admin_panel()
 
     if st.session_state.quiz_started and not st.session_state.quiz_completed:
         update_timer()
@@ -511,18 +727,24 @@ def main():
     if st.session_state.quiz_completed:
         display_results()
     
-    elif st.session_state.quiz_started and st.session_state.quiz_data:
+    elif st.session_state.quiz_started and st.session_state.quiz_ids:
         display_timer()
         st.markdown("---")
         
         current_index = st.session_state.current_question_index
-        num_questions = len(st.session_state.quiz_data)
-        question_to_display = st.session_state.quiz_data[current_index] 
+        num_questions = get_total_questions()
+        question_to_display = get_quiz_question(current_index)
+        if question_to_display is None:
+            st.error("❌ Sınavın soruları sunucu belleğinden silinmiş. Lütfen yeni bir sınav başlatın.")
+            if st.button("🔄 Yeni Sınav Başlat", type="primary"):
+                reset_quiz_completely()
+            return
         
         display_question(question_to_display, num_questions) 
         st.markdown("---")
         
         handle_navigation(num_questions)
+        wait_for_next_question()
     
     else:
         st.markdown("### 🚀 Sınav Oluşturucu")
@@ -572,5 +794,7 @@ def main():
                     safe_num_questions = max(1, min(num_questions, 80))
                     generate_quiz(topic.strip(), safe_num_questions, question_type.strip())
 
+    report_render_time()
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
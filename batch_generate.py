@@ -0,0 +1,241 @@
+import os
+import csv
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from pydantic import ValidationError
+
+from schemas import Question
+from metrics import increment, span
+from rag_pipeline import RAG_AVAILABLE, iter_quiz_with_rag
+
+# --- Toplu Üretim Ayarları ---
+# Aynı anda üretilen sınav (iş) sayısı; LLM istekleri yine ortak zamanlayıcıdan geçer
+BATCH_JOB_WORKERS = int(os.getenv("BATCH_JOB_WORKERS", "4"))
+# Çıktı dosyası bu kadar soruda bir diske zorla yazılır (kontrol noktası)
+BATCH_FSYNC_EVERY = int(os.getenv("BATCH_FSYNC_EVERY", "50"))
+# Tamamlanmış sayılan soru kaynakları: yeni üretilenler ve soru bankasından yeniden kullanılanlar
+LLM_SOURCES = ("llm", "bank")
+
+
+def load_jobs(path):
+    """İş listesini okur: CSV (topic,question_type,num_questions[,job_id]) ya da JSONL.
+
+    job_id verilmezse satır sırasından üretilir; devam ettirmede aynı iş
+    dosyası kullanıldığı sürece kimlikler değişmez.
+    """
+    with open(path, encoding="utf-8") as f:
+        if path.lower().endswith(".csv"):
+            rows = list(csv.DictReader(f))
+        else:
+            rows = [json.loads(line) for line in f if line.strip()]
+
+    jobs = []
+    seen = set()
+    for i, row in enumerate(rows, 1):
+        job = {
+            "job_id": str(row.get("job_id") or f"job-{i:05d}"),
+            "topic": row["topic"].strip(),
+            "question_type": (row.get("question_type") or "karışık").strip(),
+            "num_questions": int(row.get("num_questions") or 10),
+        }
+        if job["job_id"] in seen:
+            raise ValueError(f"Tekrarlanan job_id: {job['job_id']}")
+        seen.add(job["job_id"])
+        jobs.append(job)
+    return jobs
+
+
+def load_progress(output_path):
+    """Çıktıdaki iş başına tamamlanmış soru sayısı.
+
+    Çökme sırasında yarım kalmış son satır kesilip atılır; böylece dosya
+    her zaman geçerli JSONL olarak kalır.
+    """
+    progress = {}
+    if not os.path.exists(output_path):
+        return progress
+    valid_bytes = 0
+    with open(output_path, "rb") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            if not line.endswith(b"\n"):
+                break
+            # Eski çıktılardaki yedek/korpus soruları tamamlanmış sayılmaz, devamda yeniden üretilir
+            if record.get("source", "llm") in LLM_SOURCES:
+                progress[record["job_id"]] = progress.get(record["job_id"], 0) + 1
+            valid_bytes += len(line)
+    if valid_bytes < os.path.getsize(output_path):
+        print(f"⚠️ Yarım kalan kayıt atıldı ({os.path.getsize(output_path) - valid_bytes} bayt)")
+        with open(output_path, "r+b") as f:
+            f.truncate(valid_bytes)
+    return progress
+
+
+class JSONLWriter:
+    """İş parçacıklarından gelen kayıtları tek dosyaya satır satır ekler"""
+
+    def __init__(self, path, fsync_every=BATCH_FSYNC_EVERY):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+        self.fsync_every = fsync_every
+        self.written = 0
+        self._lock = threading.Lock()
+
+    def write(self, record):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            self.written += 1
+            if self.fsync_every and self.written % self.fsync_every == 0:
+                os.fsync(self._file.fileno())
+
+    def close(self):
+        with self._lock:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+
+
+def run_job(job, done, writer, stop):
+    """Bir işin eksik sorularını üretip doğrulanmış olanları yazar; yazılan soru sayısını döner"""
+    remaining = job["num_questions"] - done
+    if remaining <= 0:
+        return 0
+
+    written = 0
+    fallbacks = 0
+    # Aynı işin devamında soru bankası daha önce verdiği soruları tekrar vermesin.
+    # Gece çalışan toplu üretimde sınav süresi sınırı yok; yalnızca tek istek sınırı geçerli
+    questions = iter_quiz_with_rag(job["topic"], remaining, job["question_type"], user_id=f"batch-{job['job_id']}",
+                                   time_budget=0)
+    with span("batch_job", question_type=job["question_type"]) as fields:
+        fields["job_id"] = job["job_id"]
+        try:
+            for question in questions:
+                # Yedek şablon ve korpus soruları toplu üretimin çıktısı değildir;
+                # yazılmaz, böylece sonraki çalıştırma bu yerleri LLM ile doldurur
+                if question.get("source", "llm") not in LLM_SOURCES:
+                    fallbacks += 1
+                    if stop.is_set():
+                        break
+                    continue
+                index = done + written + 1
+                try:
+                    validated = Question.model_validate(dict(question, question_id=index))
+                except ValidationError as e:
+                    increment("batch_invalid")
+                    print(f"⚠️ {job['job_id']}: geçersiz soru atlandı ({e.error_count()} hata)")
+                    continue
+                writer.write({
+                    "job_id": job["job_id"],
+                    "topic": job["topic"],
+                    "question_type": job["question_type"],
+                    "source": question.get("source", "llm"),
+                    "question": validated.model_dump(),
+                })
+                written += 1
+                if stop.is_set():
+                    break
+        finally:
+            questions.close()
+        fields["questions"] = written
+        fields["fallbacks"] = fallbacks
+    if fallbacks:
+        print(f"⚠️ {job['job_id']}: {fallbacks} yedek soru yazılmadı, sonraki çalıştırmada yeniden denenecek")
+    return written
+
+
+def run_batch(jobs_path, output_path, workers=BATCH_JOB_WORKERS):
+    """İş listesini eşzamanlı çalıştırır; önceki çalıştırmada biten sorular yeniden üretilmez"""
+    jobs = load_jobs(jobs_path)
+    progress = load_progress(output_path)
+    pending = [job for job in jobs if progress.get(job["job_id"], 0) < job["num_questions"]]
+    already = sum(min(progress.get(job["job_id"], 0), job["num_questions"]) for job in jobs)
+    target = sum(job["num_questions"] for job in jobs)
+    print(f"📋 {len(jobs)} iş, {target} soru; {already} soru önceki çalıştırmadan hazır, "
+          f"{len(pending)} iş kaldı (eşzamanlı iş: {workers})")
+
+    writer = JSONLWriter(output_path)
+    stop = threading.Event()
+    job_seconds = []
+    failed = []
+    generated = 0
+    start = time.perf_counter()
+    executor = ThreadPoolExecutor(max_workers=max(1, workers))
+    try:
+        futures = {}
+        for job in pending:
+            futures[executor.submit(_timed_job, job, progress.get(job["job_id"], 0), writer, stop)] = job
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                written, seconds = future.result()
+            except Exception as e:
+                failed.append(job["job_id"])
+                print(f"❌ {job['job_id']} başarısız: {e}")
+                continue
+            generated += written
+            job_seconds.append(seconds)
+            finished = len(job_seconds) + len(failed)
+            print(f"✅ {job['job_id']}: {written} soru ({seconds:.1f} sn) [{finished}/{len(pending)}]")
+    except KeyboardInterrupt:
+        # Süren işler bulundukları soruda durur; yazılanlar bir sonraki çalıştırmada atlanır
+        print("⏹️ Durduruluyor, yazılmış sorular korunuyor...")
+        stop.set()
+        for future in futures:
+            future.cancel()
+    finally:
+        executor.shutdown(wait=True)
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    print_summary(generated, elapsed, job_seconds, failed, already + generated, target)
+    return not failed and not stop.is_set()
+
+
+def _timed_job(job, done, writer, stop):
+    if stop.is_set():
+        return 0, 0.0
+    start = time.perf_counter()
+    written = run_job(job, done, writer, stop)
+    return written, time.perf_counter() - start
+
+
+def print_summary(generated, elapsed, job_seconds, failed, completed, target):
+    """Çalıştırma sonunda throughput özeti"""
+    ordered = sorted(job_seconds)
+
+    def pct(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+    rate = generated / elapsed if elapsed > 0 else 0.0
+    print("\n📊 Toplu üretim özeti")
+    print(f"   Üretilen soru: {generated} ({elapsed:.1f} sn, {rate:.2f} soru/sn, {rate * 3600:.0f} soru/saat)")
+    print(f"   Tamamlanan iş: {len(job_seconds)}, başarısız: {len(failed)}")
+    if ordered:
+        print(f"   İş süresi p50/p95: {pct(0.5):.1f} / {pct(0.95):.1f} sn")
+    print(f"   İlerleme: {completed}/{target} soru")
+    if failed:
+        print(f"   Yeniden çalıştırın; başarısız işler kaldığı yerden devam eder: {', '.join(failed[:10])}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Arayüz olmadan toplu sınav sorusu üretimi (devam ettirilebilir JSONL)")
+    parser.add_argument("jobs", help="İş listesi: CSV (topic,question_type,num_questions[,job_id]) ya da JSONL")
+    parser.add_argument("--output", default=os.path.join("data", "batch_questions.jsonl"),
+                        help="Çıktı JSONL dosyası; varsa kaldığı yerden devam edilir")
+    parser.add_argument("--workers", type=int, default=BATCH_JOB_WORKERS, help="Eşzamanlı iş sayısı")
+    args = parser.parse_args()
+
+    if not RAG_AVAILABLE:
+        parser.error("LLM altyapısı kullanılamıyor (GEMINI_API_KEY ya da LLM_BACKEND=fake/http gerekli)")
+    raise SystemExit(0 if run_batch(args.jobs, args.output, args.workers) else 1)
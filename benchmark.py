@@ -0,0 +1,375 @@
+import os
+import io
+import sys
+import json
+import time
+import random
+import platform
+import tempfile
+import subprocess
+from contextlib import redirect_stdout
+
+# Ölçümler sırasında span'ler JSON log dosyasına yazılmasın
+os.environ.setdefault("METRICS_LOG_PATH", "")
+
+# --- Benchmark Ayarları ---
+BENCH_RESULTS_DIR = os.getenv("BENCH_RESULTS_DIR", os.path.join("data", "benchmarks"))
+# Karşılaştırmada p50/p95 bu oranın üzerinde kötüleşirse regresyon sayılır
+REGRESSION_THRESHOLD = 0.20
+
+CASES = ["pdf", "json", "generation", "structured", "simulation"]
+
+PDF_NOISE_LINES = ["Go on to the next page.", "TEST OF ENGLISH", "OSYM"]
+PDF_SENTENCES = [
+    "The rapid development of renewable energy has reshaped national economies.",
+    "Researchers argue that sleep plays an essential role in memory consolidation.",
+    "Urban planners increasingly rely on data to reduce traffic congestion.",
+    "Ancient trade routes facilitated the exchange of both goods and ideas.",
+    "Machine learning models require large amounts of carefully labelled data.",
+]
+
+SIMULATION_SCRIPT = '''
+import time
+import streamlit as st
+import app
+app.RAG_AVAILABLE = False
+app.initialize_session_state()
+if not st.session_state.quiz_started:
+    start = time.perf_counter()
+    try:
+        app.generate_quiz("yapay zeka", {num_questions}, "karışık")
+    finally:
+        st.session_state.bench_elapsed = time.perf_counter() - start
+'''
+
+
+def percentile(sorted_values, q):
+    """Sıralı listede doğrusal ara değerli yüzdelik"""
+    if not sorted_values:
+        return 0.0
+    pos = (len(sorted_values) - 1) * q
+    lower = int(pos)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (pos - lower)
+
+
+def summarize(samples, items_per_sample=1, **extra):
+    """Saniye cinsinden örneklerden gecikme yüzdelikleri ve throughput hesaplar"""
+    values = sorted(samples)
+    total = sum(values)
+    summary = {
+        "runs": len(values),
+        "mean_ms": total / len(values) * 1000 if values else 0.0,
+        "p50_ms": percentile(values, 0.50) * 1000,
+        "p95_ms": percentile(values, 0.95) * 1000,
+        "p99_ms": percentile(values, 0.99) * 1000,
+        "throughput_per_s": len(values) * items_per_sample / total if total else 0.0,
+    }
+    summary.update(extra)
+    return summary
+
+
+def quiet(fn, *args, **kwargs):
+    """Ölçülen kodun print çıktılarını bastırarak çalıştırır"""
+    with redirect_stdout(io.StringIO()):
+        return fn(*args, **kwargs)
+
+
+def write_synthetic_pdf(path, pages, lines_per_page=45):
+    """Harici kütüphane kullanmadan çok sayfalı, metin içeren bir PDF yazar"""
+    rng = random.Random(pages)
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # Sayfa listesi, sayfa nesneleri belli olunca doldurulur
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_ids = []
+    for page_no in range(pages):
+        lines = [rng.choice(PDF_SENTENCES) for _ in range(lines_per_page)]
+        lines.insert(0, f"{page_no + 1}. PASSAGE")
+        lines.append(rng.choice(PDF_NOISE_LINES))
+        text_ops = " ".join(f"({line}) '" for line in lines)
+        stream = f"BT /F1 9 Tf 12 TL 40 800 Td {text_ops} ET".encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        page_ids.append(len(objects))
+    kids = " ".join(f"{i} 0 R" for i in page_ids).encode()
+    objects[1] = b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % pages
+
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+        xref_at = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            f.write(b"%010d 00000 n \n" % offset)
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_at))
+
+
+def bench_pdf(page_counts=(20, 100), repeat=3):
+    """data_prep.extract_and_clean_text: sentetik çok sayfalı PDF'ler"""
+    from data_prep import extract_and_clean_text
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for pages in page_counts:
+            path = os.path.join(tmp, f"synthetic_{pages}.pdf")
+            write_synthetic_pdf(path, pages)
+            samples = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                text = quiet(extract_and_clean_text, path)
+                samples.append(time.perf_counter() - start)
+            results[f"extract_and_clean_text[{pages} sayfa]"] = summarize(
+                samples, pages, unit="sayfa", chars=len(text or ""))
+    return results
+
+
+def make_llm_outputs(count=500, seed=7):
+    """Gerçekçi LLM yanıtları: kod bloğu, açıklama metni, sondaki virgül, akıllı tırnak, yarım yanıt"""
+    from llm_backends import FakeBackend
+
+    backend = FakeBackend(latency_ms=0, seed=seed)
+    rng = random.Random(seed)
+    outputs = []
+    for i in range(count):
+        prompt = f"CREATE EXACTLY {rng.randint(1, 5)} questions\nTOPIC: topic {i}\nQUESTION TYPE: grammar"
+        body = backend.generate(prompt).replace("```json\n", "").replace("\n```", "")
+        kind = i % 6
+        if kind == 0:
+            text = "```json\n" + body + "\n```"
+        elif kind == 1:
+            text = "Here are the questions you asked for:\n" + body + "\nLet me know if you need {more}!"
+        elif kind == 2:
+            text = json.dumps(json.loads(body), indent=4)
+        elif kind == 3:
+            text = body.replace('"}', '",}').replace("}]", "},]")
+        elif kind == 4:
+            text = body.replace('"quiz"', '“quiz”')
+        else:
+            text = body[:len(body) // 2]
+        outputs.append(text)
+    return outputs
+
+
+def bench_json(count=3000, repeat=3):
+    """rag_pipeline.clean_json_response: gerçekçi LLM çıktıları korpusu"""
+    from rag_pipeline import clean_json_response
+
+    outputs = make_llm_outputs(count)
+    samples = []
+    parsed = 0
+    for _ in range(repeat):
+        for text in outputs:
+            start = time.perf_counter()
+            result = quiet(clean_json_response, text)
+            samples.append(time.perf_counter() - start)
+            parsed += result is not None
+    return {"clean_json_response": summarize(samples, unit="yanıt", parsed_rate=parsed / len(samples))}
+
+
+def bench_generation(sizes=(5, 20, 80), repeat=3, latency_ms=200.0, seed=1):
+    """rag_pipeline.generate_quiz_with_rag: gecikme simüle eden sahte model, soru bankası kapalı"""
+    import rag_pipeline
+    from llm_backends import FakeBackend, set_backend
+    from rate_limiter import RequestScheduler, set_scheduler
+
+    set_backend(FakeBackend(latency_ms=latency_ms, seed=seed))
+    # Kota kapalı: pipeline'ın kendisi ölçülür, dakikalık istek sınırı değil
+    set_scheduler(RequestScheduler(rpm=0, tpm=0))
+    rag_pipeline.RAG_AVAILABLE = True
+    results = {}
+    for size in sizes:
+        samples = []
+        first_question = []
+        fallbacks = 0
+        for _ in range(repeat):
+            start = time.perf_counter()
+            questions = []
+            with redirect_stdout(io.StringIO()):
+                for question in rag_pipeline.iter_quiz_with_rag("technology", size, "karışık", use_bank=False):
+                    if not questions:
+                        first_question.append(time.perf_counter() - start)
+                    questions.append(question)
+            samples.append(time.perf_counter() - start)
+            fallbacks += sum(q.get("source") == "fallback" for q in questions)
+        first_sorted = sorted(first_question)
+        results[f"generate_quiz_with_rag[{size} soru]"] = summarize(
+            samples, size, unit="soru",
+            first_question_p50_ms=percentile(first_sorted, 0.50) * 1000,
+            first_question_p95_ms=percentile(first_sorted, 0.95) * 1000,
+            fallback_rate=fallbacks / (size * repeat),
+        )
+    return results
+
+
+def bench_structured(size=20, repeat=3, latency_ms=200.0, malformed_rate=0.1, seed=1):
+    """Şablon (JSON örnekli prompt) ile şema kısıtlı çıktının karşılaştırması.
+
+    Prompt token'ları gerçek prompt'lardan ölçülür. Gecikme ve yedek soru oranı
+    sahte modelle ölçülür: şablon modunda yanıtların malformed_rate kadarı
+    bozuk gelir, şema kısıtlı modda çıktı her zaman geçerli JSON'dur.
+    BENCH_LIVE_LLM=1 ile yapılandırılmış gerçek altyapı kullanılır.
+    """
+    import rag_pipeline
+    from llm_backends import FakeBackend, create_backend, set_backend
+    from metrics import registry
+    from rate_limiter import LLM_OUTPUT_TOKEN_ESTIMATE, RequestScheduler, estimate_tokens, set_scheduler
+
+    live = os.getenv("BENCH_LIVE_LLM", "0") == "1"
+    set_backend(create_backend() if live else FakeBackend(latency_ms=latency_ms, malformed_rate=malformed_rate, seed=seed))
+    if not live:
+        set_scheduler(RequestScheduler(rpm=0, tpm=0))
+    rag_pipeline.RAG_AVAILABLE = True
+    types = rag_pipeline.plan_question_types(size, "karışık")
+    contexts = quiet(rag_pipeline.assemble_contexts, quiet(rag_pipeline.retrieve_context, "technology"), types)
+
+    results = {}
+    original = rag_pipeline.STRUCTURED_OUTPUT
+    try:
+        for mode, structured in (("şablon", False), ("şema", True)):
+            rag_pipeline.STRUCTURED_OUTPUT = structured
+            prompt_tokens = [estimate_tokens(rag_pipeline.build_question_prompt("technology", t, contexts[t], structured))
+                             - LLM_OUTPUT_TOKEN_ESTIMATE for t in types]
+            failures_before = registry.counter_total("json_failures")
+            responses_before = registry.counter_total("json_responses")
+            samples = []
+            fallbacks = 0
+            for _ in range(repeat):
+                start = time.perf_counter()
+                questions = quiet(rag_pipeline.generate_quiz_with_rag, "technology", size, "karışık",
+                                  use_bank=False, time_budget=0) or []
+                samples.append(time.perf_counter() - start)
+                fallbacks += sum(q.get("source") != "llm" for q in questions)
+            responses = registry.counter_total("json_responses") - responses_before
+            failures = registry.counter_total("json_failures") - failures_before
+            results[f"generate_quiz_with_rag {mode}[{size} soru]"] = summarize(
+                samples, size, unit="soru",
+                prompt_tokens_mean=sum(prompt_tokens) / len(prompt_tokens),
+                json_failure_rate=failures / responses if responses else 0.0,
+                fallback_rate=fallbacks / (size * repeat),
+                live=live,
+            )
+    finally:
+        rag_pipeline.STRUCTURED_OUTPUT = original
+    return results
+
+
+def bench_simulation(sizes=(5, 20, 80), repeat=5):
+    """app.generate_quiz simülasyon modunda (Streamlit AppTest ile)"""
+    from streamlit.testing.v1 import AppTest
+
+    results = {}
+    # İlk çalıştırma app import'unu içerir, ölçüme katılmaz
+    quiet(AppTest.from_string(SIMULATION_SCRIPT.format(num_questions=1), default_timeout=60).run)
+    for size in sizes:
+        samples = []
+        for _ in range(repeat):
+            at = quiet(AppTest.from_string(SIMULATION_SCRIPT.format(num_questions=size), default_timeout=60).run)
+            if at.exception:
+                raise RuntimeError(at.exception[0].message)
+            samples.append(at.session_state.bench_elapsed)
+        results[f"app.generate_quiz simülasyon[{size} soru]"] = summarize(samples, size, unit="soru")
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def compare_results(current, baseline, threshold=REGRESSION_THRESHOLD):
+    """İki çalıştırmayı karşılaştırır; regresyon gösteren durum adlarını döner"""
+    regressions = []
+    for name, summary in current["results"].items():
+        old = baseline.get("results", {}).get(name)
+        if not old:
+            continue
+        deltas = []
+        regressed = False
+        for key in ("p50_ms", "p95_ms"):
+            if old[key] > 0:
+                change = (summary[key] - old[key]) / old[key]
+                deltas.append(f"{key} {change * 100:+.1f}%")
+                regressed = regressed or change > threshold
+        marker = "🔴" if regressed else "🟢"
+        print(f"{marker} {name}: {', '.join(deltas)}")
+        if regressed:
+            regressions.append(name)
+    return regressions
+
+
+def run(cases=CASES, repeat=3, latency_ms=200.0, quick=False):
+    """Seçili benchmark'ları çalıştırıp sonuç sözlüğünü döner"""
+    sizes = (5, 20) if quick else (5, 20, 80)
+    results = {}
+    if "pdf" in cases:
+        results.update(bench_pdf((10, 30) if quick else (20, 100), repeat))
+    if "json" in cases:
+        results.update(bench_json(500 if quick else 3000, repeat))
+    if "generation" in cases:
+        results.update(bench_generation(sizes, repeat, latency_ms))
+    if "structured" in cases:
+        results.update(bench_structured(5 if quick else 20, repeat, latency_ms))
+    if "simulation" in cases:
+        results.update(bench_simulation(sizes, max(repeat, 5)))
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {"cases": list(cases), "repeat": repeat, "latency_ms": latency_ms, "quick": quick},
+        "results": results,
+    }
+
+
+def print_results(report):
+    print(f"\n📊 Benchmark sonuçları ({report['git_revision'] or 'git yok'})")
+    for name, s in report["results"].items():
+        print(f"  {name:<45} p50 {s['p50_ms']:>10.3f} ms  p95 {s['p95_ms']:>10.3f} ms  "
+              f"p99 {s['p99_ms']:>10.3f} ms  {s['throughput_per_s']:>10.1f} {s.get('unit', 'çağrı')}/sn")
+        if "prompt_tokens_mean" in s:
+            print(f"  {'':<45} prompt ~{s['prompt_tokens_mean']:.0f} token, JSON hata %{s['json_failure_rate'] * 100:.1f}, "
+                  f"yedek soru %{s['fallback_rate'] * 100:.1f}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Korpus hazırlama, JSON ayrıştırma ve quiz üretimi benchmark'ları")
+    parser.add_argument("cases", nargs="*", help=f"Çalıştırılacak durumlar: {', '.join(CASES)} (varsayılan: hepsi)")
+    parser.add_argument("--repeat", type=int, default=3, help="Her durumun tekrar sayısı")
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="Sahte modelin medyan gecikmesi")
+    parser.add_argument("--quick", action="store_true", help="Küçük boyutlarla hızlı çalıştırma")
+    parser.add_argument("--output", help="Sonuç JSON dosyası (varsayılan: data/benchmarks/<zaman>.json)")
+    parser.add_argument("--compare", help="Karşılaştırılacak önceki sonuç JSON dosyası")
+    args = parser.parse_args()
+    unknown = set(args.cases) - set(CASES)
+    if unknown:
+        parser.error(f"bilinmeyen durum: {', '.join(sorted(unknown))}")
+
+    report = run(args.cases or CASES, args.repeat, args.latency_ms, args.quick)
+    print_results(report)
+
+    output = args.output or os.path.join(BENCH_RESULTS_DIR, time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"💾 Sonuçlar kaydedildi: {output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"\n🔍 Karşılaştırma: {args.compare}")
+        if compare_results(report, baseline):
+            sys.exit(1)
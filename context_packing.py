@@ -0,0 +1,107 @@
+import os
+import re
+
+from retrieval import tokenize
+
+# --- Bağlam Paketleme Ayarları ---
+# Soru tipine göre prompt'a eklenecek pasajların token bütçesi;
+# CONTEXT_TOKEN_BUDGETS="reading comprehension=600,cloze test=400" ile değiştirilebilir
+DEFAULT_CONTEXT_BUDGETS = {
+    "reading comprehension": 600,
+    "cloze test": 400,
+    "vocabulary": 250,
+    "grammar": 250,
+}
+DEFAULT_CONTEXT_BUDGET = 300
+
+# MMR'de alaka ile çeşitlilik arasındaki denge (1 = yalnızca alaka)
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.7"))
+# Kırpıldıktan sonra bundan kısa kalan pasaj eklenmez
+MIN_PASSAGE_TOKENS = int(os.getenv("MIN_PASSAGE_TOKENS", "40"))
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?])\s+')
+
+
+def parse_budgets(value):
+    """"tip=token,tip=token" biçimindeki ayarı okur; geçersiz girdiler atlanır"""
+    budgets = dict(DEFAULT_CONTEXT_BUDGETS)
+    for part in (value or "").split(","):
+        name, _, tokens = part.partition("=")
+        if name.strip() and tokens.strip().isdigit():
+            budgets[name.strip().lower()] = int(tokens)
+    return budgets
+
+
+CONTEXT_TOKEN_BUDGETS = parse_budgets(os.getenv("CONTEXT_TOKEN_BUDGETS"))
+
+
+def count_tokens(text):
+    """Yerel token tahmini: kelime ve noktalama sayısı, uzun kelimeler birden fazla parça sayılır.
+
+    İngilizce metinde alt kelime tokenizer'larına (~%10) yakın sonuç verir;
+    ağ ya da model dosyası gerektirmez.
+    """
+    return sum(1 + len(token) // 7 for token in _TOKEN_RE.findall(text or ""))
+
+
+def context_budget(english_type):
+    return CONTEXT_TOKEN_BUDGETS.get(english_type, DEFAULT_CONTEXT_BUDGET)
+
+
+def trim_to_sentences(text, max_tokens):
+    """Metni baştan, cümle sınırlarını bozmadan max_tokens'a sığacak kadar kısaltır"""
+    kept = []
+    used = 0
+    for sentence in _SENTENCE_SPLIT_RE.split(text.strip()):
+        tokens = count_tokens(sentence)
+        if used + tokens > max_tokens:
+            break
+        kept.append(sentence)
+        used += tokens
+    return " ".join(kept), used
+
+
+def _similarity(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def pack_context(hits, budget, max_passages=None):
+    """Aday pasajlardan token bütçesine sığan, alakalı ve birbirine benzemeyen bir alt küme seçer.
+
+    hits retriever sonuçlarıdır ({"text", "score"}). Seçim maximal marginal
+    relevance ile yapılır: her adımda alaka (min-max normalize skor) ile seçilmişlere
+    en yüksek benzerlik (kelime kümesi Jaccard) arasındaki fark en büyük olan
+    pasaj alınır. Bütçeyi aşan pasaj cümle sınırında kırpılır; en fazla
+    max_passages pasaj seçilir. Seçilen pasajları ve toplam token sayısını döner.
+    """
+    if not hits or budget <= 0:
+        return [], 0
+
+    # Skorlar negatif olabilir (ör. kosinüs); [0, 1] aralığına taşınır, hepsi eşitse alaka 1 sayılır
+    low = min(hit["score"] for hit in hits)
+    spread = max(hit["score"] for hit in hits) - low
+    candidates = [(hit["text"], (hit["score"] - low) / spread if spread > 0 else 1.0, set(tokenize(hit["text"])))
+                  for hit in hits]
+    selected = []
+    selected_terms = []
+    used = 0
+
+    while candidates and budget - used >= MIN_PASSAGE_TOKENS and len(selected) < (max_passages or len(hits)):
+        best = max(
+            range(len(candidates)),
+            key=lambda i: MMR_LAMBDA * candidates[i][1]
+            - (1 - MMR_LAMBDA) * max((_similarity(candidates[i][2], terms) for terms in selected_terms), default=0.0),
+        )
+        text, _, terms = candidates.pop(best)
+        tokens = count_tokens(text)
+        if used + tokens > budget:
+            text, tokens = trim_to_sentences(text, budget - used)
+            if tokens < MIN_PASSAGE_TOKENS:
+                continue
+        selected.append(text)
+        selected_terms.append(terms)
+        used += tokens
+    return selected, used
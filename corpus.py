@@ -0,0 +1,248 @@
+import os
+import re
+import json
+import mmap
+import uuid
+import random
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+
+# --- Korpus Erişim Katmanı ---
+# Korpus dosyası mmap ile açılır; cümle ve paragraf başlangıçlarının bayt ofsetleri
+# dosyanın yanında (<korpus>.idx) tutulur. Aynı dosyayı açan süreçler sayfa önbelleğini paylaşır.
+CORPUS_PATH = os.getenv("CORPUS_PATH", "cleaned_corpus.txt")
+CORPUS_INDEX_SUFFIX = ".idx"
+CORPUS_INDEX_VERSION = 1
+
+# Rastgele pasajın hedef uzunluğu (bayt, ~120 kelime)
+PASSAGE_BYTES = int(os.getenv("PASSAGE_BYTES", "800"))
+
+_SENTENCE_END_RE = re.compile(rb"[.!?]\s+")
+# PDF'ten gelen kitapçıklar tek satırdır; paragraf satır sonunda ya da numaralı bir soruda başlar
+_PARAGRAPH_START_RE = re.compile(rb"\n\s*|(?<![\w.])\d{1,2}\. (?=[A-Z\"(])")
+# Kitapçıklardaki Türkçe yönergeler, seçenekler ve cevap anahtarları bağlam olarak kullanılmaz
+_NOISE_RE = re.compile(r"[çğışöüÇĞŞÖÜİ]|(?<![A-Za-z])[A-E]\)")
+PASSAGE_MIN_WORDS = 25
+
+
+def corpus_signature(corpus_path):
+    """İndeksin güncel olup olmadığını anlamak için korpus dosyasının imzası"""
+    stat = os.stat(corpus_path)
+    return {"path": os.path.abspath(corpus_path), "size": stat.st_size, "mtime": int(stat.st_mtime)}
+
+
+def scan_boundaries(data):
+    """Cümle ve paragraf başlangıç ofsetlerini tek geçişte bulur (data: bytes ya da mmap)"""
+    typecode = "I" if len(data) < 2 ** 32 else "Q"
+    paragraphs = array(typecode, [0])
+    paragraphs.extend(m.end() for m in _PARAGRAPH_START_RE.finditer(data) if 0 < m.end() < len(data))
+    sentence_ends = (m.end() for m in _SENTENCE_END_RE.finditer(data) if m.end() < len(data))
+    # Paragraf başlangıcı aynı zamanda cümle başlangıcıdır; pasajlar paragraf sınırını aşmaz
+    sentences = array(typecode, sorted(set(sentence_ends).union(paragraphs)))
+    return sentences, paragraphs
+
+
+def write_offset_index(index_path, sentences, paragraphs, signature):
+    """Ofsetleri tek dosyaya yazar: JSON başlık satırı + ham dizi baytları"""
+    header = json.dumps({
+        "version": CORPUS_INDEX_VERSION,
+        "signature": signature,
+        "typecode": sentences.typecode,
+        "sentences": len(sentences),
+        "paragraphs": len(paragraphs),
+    }).encode("utf-8")
+    # Diziler 8 bayt hizalı başlasın ki memoryview.cast doğrudan kullanılabilsin
+    header += b" " * (-(len(header) + 1) % 8) + b"\n"
+    # Her yazarın kendi geçici dosyası olur; eşzamanlı kurulumlar birbirinin baytlarını karıştırmaz
+    tmp_path = f"{index_path}.{os.getpid()}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        sentences.tofile(f)
+        paragraphs.tofile(f)
+    try:
+        os.replace(tmp_path, index_path)
+    except OSError:
+        os.remove(tmp_path)
+        raise
+
+
+class Corpus:
+    """mmap'li korpus üzerinde cümle/paragraf ofset indeksi.
+
+    Ofset dizileri de indeks dosyasından mmap ile okunur (memoryview.cast),
+    yani ne korpus ne indeks süreç belleğine kopyalanır. Cümle i'nin baytları
+    sentences[i]:sentences[i+1] aralığıdır; slice() bu aralığı kopyasız döner.
+    """
+
+    def __init__(self, corpus_path, index_path=None):
+        self.path = corpus_path
+        self.index_path = index_path or corpus_path + CORPUS_INDEX_SUFFIX
+        self.signature = corpus_signature(corpus_path)
+        self._file = open(corpus_path, "rb")
+        self.size = self.signature["size"]
+        # Boş dosya mmap'lenemez
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b""
+        self._index_file = None
+        self._index = None
+        self.sentences, self.paragraphs = self._load_offsets()
+
+    def _load_offsets(self):
+        if os.path.exists(self.index_path):
+            try:
+                return self._map_index()
+            except Exception as e:
+                print(f"⚠️ Korpus ofset indeksi okunamadı, yeniden oluşturuluyor: {e}")
+        sentences, paragraphs = scan_boundaries(self._data)
+        try:
+            write_offset_index(self.index_path, sentences, paragraphs, self.signature)
+            print(f"✅ Korpus ofset indeksi oluşturuldu ({len(sentences)} cümle, {len(paragraphs)} paragraf)")
+        except OSError as e:
+            print(f"⚠️ Korpus ofset indeksi yazılamadı, bellekte tutulacak: {e}")
+        return sentences, paragraphs
+
+    def _map_index(self):
+        index_file = open(self.index_path, "rb")
+        header = json.loads(index_file.readline())
+        if header.get("version") != CORPUS_INDEX_VERSION or header.get("signature") != self.signature:
+            index_file.close()
+            raise ValueError("korpus değişmiş")
+        start = index_file.tell()
+        index = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        typecode = header["typecode"]
+        item = array(typecode).itemsize
+        middle = start + header["sentences"] * item
+        end = middle + header["paragraphs"] * item
+        if end != len(index):
+            index.close()
+            index_file.close()
+            raise ValueError("indeks boyutu tutarsız")
+        self._index_file, self._index = index_file, index
+        view = memoryview(index)
+        return view[start:middle].cast(typecode), view[middle:end].cast(typecode)
+
+    def __len__(self):
+        return len(self.sentences)
+
+    def sentence_span(self, i):
+        end = self.sentences[i + 1] if i + 1 < len(self.sentences) else self.size
+        return self.sentences[i], end
+
+    def slice(self, start, end):
+        """Bayt aralığını kopyalamadan döner (memoryview)"""
+        return memoryview(self._data)[start:end]
+
+    def text(self, start=0, end=None):
+        return bytes(self.slice(start, self.size if end is None else end)).decode("utf-8").strip()
+
+    def sentence(self, i):
+        return self.text(*self.sentence_span(i))
+
+    def iter_sentences(self, start=0):
+        """Cümleleri sırayla, tüm dosyayı belleğe almadan verir.
+
+        start verilirse yalnızca bu bayt ofsetinden sonraki metin verilir
+        (korpusa sonradan eklenen kısım); ofseti kesen cümlenin kalanı da dahildir.
+        """
+        first = max(0, bisect_right(self.sentences, start) - 1)
+        for i in range(first, len(self.sentences)):
+            begin, end = self.sentence_span(i)
+            sentence = self.text(max(begin, start), end)
+            if sentence:
+                yield sentence
+
+    def paragraph_end(self, offset):
+        """offset'i içeren paragrafın bitiş ofseti"""
+        pos = bisect_right(self.paragraphs, offset)
+        return self.paragraphs[pos] if pos < len(self.paragraphs) else self.size
+
+    def passage_span(self, i, max_bytes=PASSAGE_BYTES):
+        """i. cümleden başlayıp paragraf sonunu ve max_bytes'ı aşmayan cümle aralığı"""
+        start = self.sentences[i]
+        limit = min(self.paragraph_end(start), start + max_bytes)
+        # limit'e kadar biten son cümle; ilk cümle tek başına uzunsa yine de alınır
+        end_index = max(i + 1, bisect_left(self.sentences, limit + 1) - 1)
+        end = self.sentences[end_index] if end_index < len(self.sentences) else self.size
+        return start, min(end, max(limit, self.sentence_span(i)[1]))
+
+    def sample_passage(self, rng=random, max_bytes=PASSAGE_BYTES):
+        """Rastgele bir cümleden başlayan pasaj; korpus boşsa boş metin"""
+        if not self.size:
+            return ""
+        return self.text(*self.passage_span(rng.randrange(len(self.sentences)), max_bytes))
+
+    def close(self):
+        self.sentences = self.paragraphs = None
+        if self._index is not None:
+            self._index.close()
+            self._index_file.close()
+        if self.size:
+            self._data.close()
+        self._file.close()
+
+
+def open_corpus(corpus_path=CORPUS_PATH):
+    """Korpusu açar; dosya yoksa None"""
+    if not os.path.exists(corpus_path):
+        print(f"⚠️ Korpus bulunamadı: {corpus_path}")
+        return None
+    return Corpus(corpus_path)
+
+
+_corpora = {}
+_corpora_lock = threading.Lock()
+
+
+def get_corpus(corpus_path=CORPUS_PATH):
+    """Süreç genelinde yol başına tek bir Corpus döner; dosya değişmişse yeniden açılır.
+
+    Eski örnek kapatılmaz, elinde tutan çağıranlar onu kullanmaya devam edebilir.
+    """
+    corpus = _corpora.get(corpus_path)
+    if corpus is not None and os.path.exists(corpus_path) and corpus.signature == corpus_signature(corpus_path):
+        return corpus
+    with _corpora_lock:
+        corpus = _corpora.get(corpus_path)
+        if corpus is None or not os.path.exists(corpus_path) or corpus.signature != corpus_signature(corpus_path):
+            corpus = open_corpus(corpus_path)
+            _corpora[corpus_path] = corpus
+    return corpus
+
+
+def sample_passages(count, rng=random, max_bytes=PASSAGE_BYTES, corpus_path=CORPUS_PATH, attempts=20):
+    """Korpustan rastgele en fazla count İngilizce pasaj; korpus yoksa boş liste"""
+    corpus = get_corpus(corpus_path)
+    if corpus is None or not len(corpus):
+        return []
+    passages = []
+    for _ in range(count * attempts):
+        passage = corpus.sample_passage(rng, max_bytes)
+        if len(passage.split()) >= PASSAGE_MIN_WORDS and not _NOISE_RE.search(passage):
+            passages.append(passage)
+            if len(passages) == count:
+                break
+    return passages
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    if len(sys.argv) > 1 and sys.argv[1] == "build":
+        index_path = CORPUS_PATH + CORPUS_INDEX_SUFFIX
+        if os.path.exists(index_path):
+            os.remove(index_path)
+
+    start = time.perf_counter()
+    corpus = get_corpus()
+    if corpus is None:
+        raise SystemExit(1)
+    print(f"📚 {corpus.size / 1024:.0f} KB, {len(corpus)} cümle, {len(corpus.paragraphs)} paragraf "
+          f"(açılış {(time.perf_counter() - start) * 1000:.1f} ms)")
+
+    rng = random.Random(1)
+    start = time.perf_counter()
+    passages = [corpus.sample_passage(rng) for _ in range(10000)]
+    elapsed = time.perf_counter() - start
+    print(f"⚡ {len(passages)} rastgele pasaj, pasaj başına {elapsed / len(passages) * 1e6:.1f} µs")
+    print(f"\n{passages[0]}")
@@ -0,0 +1,193 @@
+import os
+import re
+import random
+import threading
+
+from corpus import CORPUS_PATH, get_corpus
+from retrieval import STOPWORDS, tokenize
+from lexicon import GRAMMAR_CLASSES, get_lexicon, grammar_distractor_pool, word_shape
+
+# --- Korpustan Yerel Soru Üretimi ---
+# LLM zamanında yanıt vermezse korpustaki gerçek cümlelerde bir kelime boşluk yapılır
+SENTENCE_MIN_WORDS = 10
+SENTENCE_MAX_WORDS = 30
+
+# PDF'ten gelen iki sütunlu metinde düzgün kalmış cümleler: büyük harfle başlar, noktayla biter
+_CLEAN_SENTENCE_RE = re.compile(r"^[A-Z][a-z][A-Za-z ,;'’\-]+\.$")
+# Türkçe metin, soru boşlukları, seçenekler ve sayfa notları
+_NOISE_RE = re.compile(r"[çğışöüÇĞŞÖÜİ]|----|\b[A-E]\)|Go on|page")
+_WORD_RE = re.compile(r"^[a-z]+$")
+
+
+def extract_sentences(candidates):
+    """Cümle adayları arasından soru kökü olarak kullanılabilecek temiz İngilizce cümleler"""
+    sentences = []
+    seen = set()
+    for sentence in candidates:
+        sentence = sentence.strip()
+        words = sentence.split()
+        if not SENTENCE_MIN_WORDS <= len(words) <= SENTENCE_MAX_WORDS:
+            continue
+        if _NOISE_RE.search(sentence) or not _CLEAN_SENTENCE_RE.match(sentence):
+            continue
+        # Filigrandan kalan tek harfler ve büyük harfli başlıklar
+        if any(len(w) == 1 and w not in ("a", "I") or (w.isupper() and len(w) > 1) for w in words):
+            continue
+        # Sütunların birbirine karıştığı yerlerde aynı kelime art arda gelir ("The the")
+        if any(a.lower() == b.lower() for a, b in zip(words, words[1:])):
+            continue
+        if sentence not in seen:
+            seen.add(sentence)
+            sentences.append(sentence)
+    return sentences
+
+
+class CorpusQuestionGenerator:
+    """Korpus cümlelerinden ağ gerektirmeden boşluk doldurma soruları üretir.
+
+    Cümleler ve biçime göre gruplanmış kelime havuzu bir kez hazırlanır;
+    bir soru üretmek yalnızca birkaç rastgele seçimdir. Sözlük indeksi
+    verilirse çeldiriciler cevapla aynı sıklık bandından seçilir ve kelime
+    soruları korpustaki eşdizimlerden de üretilir.
+    """
+
+    def __init__(self, sentences, seed=None, lexicon=None):
+        self.sentences = sentences
+        self.lexicon = lexicon
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.words_by_shape = {}
+        self.sentence_tokens = []
+        for sentence in sentences:
+            self.sentence_tokens.append(set(tokenize(sentence)))
+            for word in sentence.split()[1:]:
+                word = word.strip(",;.")
+                if _WORD_RE.match(word) and len(word) >= 5 and word not in STOPWORDS:
+                    self.words_by_shape.setdefault(word_shape(word), set()).add(word)
+        self.words_by_shape = {shape: sorted(words) for shape, words in self.words_by_shape.items()}
+
+    def __len__(self):
+        return len(self.sentences)
+
+    def _pick_sentence(self, topic, rng):
+        """Konuyla ortak kelimesi olan cümleleri tercih eder, yoksa rastgele seçer"""
+        topic_tokens = set(tokenize(topic or ""))
+        related = [i for i, tokens in enumerate(self.sentence_tokens) if topic_tokens & tokens]
+        return self.sentences[rng.choice(related or range(len(self.sentences)))]
+
+    def _distractors(self, answer, words, rng):
+        if self.lexicon is not None:
+            distractors = self.lexicon.distractors(answer, exclude=words, rng=rng)
+            if distractors:
+                return distractors
+        pool = [w for w in self.words_by_shape.get(word_shape(answer), ()) if w != answer and w not in words]
+        if len(pool) < 4:
+            return None
+        # Uzunluğu doğru cevaba yakın kelimeler daha inandırıcı çeldiricidir
+        candidates = rng.sample(pool, min(len(pool), 24))
+        candidates.sort(key=lambda w: abs(len(w) - len(answer)))
+        return candidates[:4]
+
+    def make_item(self, english_type, topic=None, attempts=5):
+        """Verilen tipte bir soru (kök, seçenekler, cevap, açıklama); üretilemezse None"""
+        if english_type == "reading comprehension" or not self.sentences:
+            return None
+        with self._lock:
+            rng = random.Random(self._rng.getrandbits(64))
+
+        if english_type == "vocabulary" and self.lexicon is not None and rng.random() < 0.5:
+            item = self.lexicon.collocation_item(topic, rng=rng)
+            if item:
+                return item
+
+        for attempt in range(attempts):
+            # İlk denemede konuyla ilgili cümle, sonrakilerde herhangi bir cümle
+            sentence = self._pick_sentence(topic if attempt == 0 else None, rng)
+            item = self._blank_sentence(sentence, english_type, rng)
+            if item:
+                return item
+        return None
+
+    def _blank_sentence(self, sentence, english_type, rng):
+        words = sentence.rstrip(".").split()
+        lowered = {w.strip(",;").lower() for w in words}
+
+        if english_type == "grammar":
+            slots = [i for i, w in enumerate(words[1:], 1)
+                     if any(w.strip(",;") in cls for cls in GRAMMAR_CLASSES)]
+        else:
+            min_len = 7 if english_type == "vocabulary" else 5
+            slots = [i for i, w in enumerate(words[1:], 1)
+                     if _WORD_RE.match(w.strip(",;")) and len(w.strip(",;")) >= min_len
+                     and w.strip(",;") not in STOPWORDS]
+        if not slots:
+            return None
+
+        slot = rng.choice(slots)
+        answer = words[slot].strip(",;")
+        if english_type == "grammar":
+            pool = sorted(grammar_distractor_pool(answer) - lowered)
+            distractors = rng.sample(pool, 4) if len(pool) >= 4 else None
+        else:
+            distractors = self._distractors(answer, lowered, rng)
+        if not distractors:
+            return None
+
+        options = distractors + [answer]
+        rng.shuffle(options)
+        letters = "ABCDE"
+        stem_words = list(words)
+        stem_words[slot] = words[slot].replace(answer, "______")
+        return {
+            "question_text": " ".join(stem_words) + ".",
+            "options": dict(zip(letters, options)),
+            "correct_option": letters[options.index(answer)],
+            "explanation": f"The original sentence in the corpus reads: \"{sentence}\"",
+        }
+
+
+def load_generator(corpus_path=CORPUS_PATH):
+    """Korpus dosyasından üreteci kurar; korpus yoksa boş üreteç döner"""
+    if not os.path.exists(corpus_path):
+        print(f"⚠️ Korpus bulunamadı ({corpus_path}), yerel soru üretimi kapalı")
+        return CorpusQuestionGenerator([])
+    sentences = extract_sentences(get_corpus(corpus_path).iter_sentences())
+    try:
+        lexicon = get_lexicon()
+    except Exception as e:
+        print(f"⚠️ Sözlük indeksi yüklenemedi, çeldiriciler yalnızca biçime göre seçilecek: {e}")
+        lexicon = None
+    print(f"✅ Yerel soru üreteci hazır ({len(sentences)} cümle)")
+    return CorpusQuestionGenerator(sentences, lexicon=lexicon)
+
+
+_generator = None
+_generator_lock = threading.Lock()
+
+
+def get_corpus_generator():
+    """Süreç genelinde tek bir korpus soru üreteci döner"""
+    global _generator
+    if _generator is None:
+        with _generator_lock:
+            if _generator is None:
+                _generator = load_generator()
+    return _generator
+
+
+def corpus_generator_ready():
+    """Üreteç bu süreçte kurulduysa True; kurulum tetiklemez"""
+    return _generator is not None
+
+
+if __name__ == "__main__":
+    import time
+
+    generator = get_corpus_generator()
+    start = time.perf_counter()
+    items = [generator.make_item(t, "education") for t in ["cloze test", "vocabulary", "grammar"] * 100]
+    elapsed = time.perf_counter() - start
+    print(f"⚡ {len(items)} soru, soru başına {elapsed / len(items) * 1e6:.0f} µs "
+          f"({sum(item is None for item in items)} üretilemedi)")
+    for item in items[:3]:
+        print(f"\n{item['question_text']}\n{item['options']} -> {item['correct_option']}")
@@ -1,36 +1,226 @@
 import pdfplumber
 import re
 import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
-def extract_and_clean_text(pdf_path):
-    """PDF'den metin çıkarır ve temizler"""
-    all_text = ""
-    
-    noise_patterns = [
-        r'ÖSYM', r'SYM', 
-        r'Diğer sayfaya geçiniz\.', r'Go on to the next page\.', 
-        r'\d{4}-YDS\s+(İlkbahar|Sonbahar)/İNGİLİZCE',
-        r'TEST OF ENGLISH', r'END OF THE TEST\.', 
+from retrieval import CORPUS_PATH, append_to_indexes, corpus_signature
+from exam_items import append_to_item_store
+
+# Tüm gürültü kalıpları tek bir önceden derlenmiş alternasyonda.
+# Çoklu boşluk/satır kalıpları ayrıca gerekmez; son boşluk birleştirme bunları kapsar.
+NOISE_PATTERN = re.compile(
+    '|'.join([
+        r'ÖSYM', r'SYM',
+        r'Diğer sayfaya geçiniz\.', r'Go on to the next page\.',
+        r'\d{4}-YDS\s+(?:İlkbahar|Sonbahar)/İNGİLİZCE',
+        r'TEST OF ENGLISH', r'END OF THE TEST\.',
         r'Sınavda uyulacak kurallar', r'Bu testlerin her hakkı saklıdır',
-        r'\s{2,}', 
-        r'\n{2,}', 
-    ]
+    ]),
+    re.IGNORECASE
+)
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+def clean_page_text(text):
+    """Tek sayfanın metnindeki gürültüyü temizler ve boşlukları birleştirir"""
+    text = NOISE_PATTERN.sub(' ', text)
+    return WHITESPACE_PATTERN.sub(' ', text).strip()
+
+def iter_clean_pages(pdf_path):
+    """PDF'yi sayfa sayfa okuyup temizlenmiş sayfa metinlerini verir.
 
+    Her sayfa işlendikten sonra pdfplumber önbelleği boşaltılır; bellek
+    kullanımı sayfa sayısından bağımsız kalır.
+    """
+    with pdfplumber.open(pdf_path) as pdf:
+        for page in pdf.pages:
+            text = page.extract_text()
+            # close() (pdfplumber >= 0.10) metin haritası önbelleğini de boşaltır
+            getattr(page, "close", page.flush_cache)()
+            if text:
+                cleaned = clean_page_text(text)
+                if cleaned:
+                    yield cleaned
+
+def write_clean_corpus(pdf_path, output_path, append=False):
+    """PDF'yi sayfa sayfa temizleyip doğrudan dosyaya yazar.
+
+    Metnin tamamı bellekte tutulmaz. {pages, chars, seconds} istatistiklerini
+    döner, hata durumunda None.
+    """
     print(f"[{pdf_path}] dosyasından metin çıkarılıyor...")
+    start = time.perf_counter()
+    pages = 0
+    chars = 0
     
     try:
-        with pdfplumber.open(pdf_path) as pdf:
-            for page in pdf.pages:
-                text = page.extract_text()
-                if text:
-                    all_text += text + " "
-
-        for pattern in noise_patterns:
-            all_text = re.sub(pattern, ' ', all_text, flags=re.IGNORECASE)
-            
-        all_text = re.sub(r'\s+', ' ', all_text).strip()
-
-        print("Metin temizleme tamamlandı.")
+        with open(output_path, "a" if append else "w", encoding="utf-8") as f:
+            for page_text in iter_clean_pages(pdf_path):
+                if chars or (append and f.tell() > 0):
+                    f.write(" ")
+                    chars += 1
+                f.write(page_text)
+                chars += len(page_text)
+                pages += 1
+        
+        elapsed = time.perf_counter() - start
+        print(f"Metin temizleme tamamlandı: {pages} sayfa, {elapsed:.2f} sn ({pages / elapsed if elapsed else 0:.1f} sayfa/sn)")
+        return {"pages": pages, "chars": chars, "seconds": elapsed}
+        
+    except FileNotFoundError:
+        print(f"HATA: '{pdf_path}' dosyası bulunamadı.")
+        return None
+    except Exception as e:
+        print(f"Metin çıkarma sırasında beklenmeyen hata: {e}")
+        return None
+
+# --- Çoklu PDF Korpus Oluşturma ---
+SEGMENTS_DIR = os.path.join("data", "segments")
+MANIFEST_PATH = os.path.join("data", "corpus_manifest.json")
+MANIFEST_VERSION = 1
+
+def file_sha256(path):
+    """Dosya içeriğinin sha256 özetini parça parça okuyarak hesaplar"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def load_manifest(manifest_path=MANIFEST_PATH):
+    """Korpus manifestini okur; yoksa boş manifest döner"""
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("version") == MANIFEST_VERSION:
+            return manifest
+        print("⚠️ Manifest sürümü uyumsuz, korpus baştan oluşturulacak")
+    return {"version": MANIFEST_VERSION, "segments": {}, "order": []}
+
+def save_manifest(manifest, manifest_path=MANIFEST_PATH):
+    """Manifesti atomik olarak diske yazar"""
+    os.makedirs(os.path.dirname(manifest_path) or ".", exist_ok=True)
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+def _extract_segment(pdf_path, segment_path):
+    """İşçi süreçte tek bir PDF'yi segment dosyasına yazar"""
+    return pdf_path, write_clean_corpus(pdf_path, segment_path)
+
+def _write_corpus(segment_paths, output_path, append=False):
+    """Segment dosyalarını korpusa ekler (append=False ise korpusu baştan yazar)"""
+    with open(output_path, "a" if append else "w", encoding="utf-8") as out:
+        needs_separator = append and out.tell() > 0
+        for segment_path in segment_paths:
+            with open(segment_path, "r", encoding="utf-8") as seg:
+                if needs_separator:
+                    out.write(" ")
+                shutil.copyfileobj(seg, out)
+                needs_separator = True
+
+def build_corpus(pdf_dir, output_path=CORPUS_PATH, manifest_path=MANIFEST_PATH,
+                 segments_dir=SEGMENTS_DIR, workers=None):
+    """Bir klasördeki PDF'lerden artımlı olarak korpus oluşturur.
+
+    Her PDF içerik özetine göre ayrı bir segment dosyasına çıkarılır ve
+    manifestte özet -> segment olarak kaydedilir. Tekrar çalıştırıldığında
+    yalnızca yeni ya da değişmiş PDF'ler (işlem havuzunda) çıkarılır ve korpusa
+    ile mevcut indekslere eklenir. Bir PDF silinmiş ya da değişmişse korpus,
+    mevcut segmentlerden yeniden çıkarma yapılmadan birleştirilir.
+    """
+    start = time.perf_counter()
+    manifest = load_manifest(manifest_path)
+    os.makedirs(segments_dir, exist_ok=True)
+
+    # Manifest yokken var olan korpus kaybolmasın, ilk segment olarak korunur
+    if not manifest["order"] and os.path.exists(output_path) and os.path.getsize(output_path) > 0:
+        legacy_hash = file_sha256(output_path)
+        legacy_segment = os.path.join(segments_dir, f"{legacy_hash}.txt")
+        shutil.copyfile(output_path, legacy_segment)
+        manifest["segments"][legacy_hash] = {"source": output_path, "segment": legacy_segment, "legacy": True}
+        manifest["order"].append(legacy_hash)
+        print(f"📦 Mevcut korpus başlangıç segmenti olarak kaydedildi: {legacy_segment}")
+
+    pdf_paths = sorted(
+        os.path.join(pdf_dir, name) for name in os.listdir(pdf_dir) if name.lower().endswith(".pdf")
+    )
+    current = {file_sha256(path): path for path in pdf_paths}
+
+    removed = [h for h in manifest["order"]
+               if h not in current and not manifest["segments"][h].get("legacy")]
+    new_hashes = [h for h, path in current.items() if h not in manifest["segments"]]
+    new_hashes.sort(key=lambda h: current[h])
+
+    print(f"📚 {len(pdf_paths)} PDF bulundu: {len(new_hashes)} yeni/değişmiş, {len(removed)} kaldırılmış")
+
+    extracted = []
+    if new_hashes:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(_extract_segment, current[h], os.path.join(segments_dir, f"{h}.txt")): h
+                for h in new_hashes
+            }
+            for future in as_completed(futures):
+                h = futures[future]
+                pdf_path, stats = future.result()
+                if stats is None:
+                    print(f"❌ Atlandı: {pdf_path}")
+                    continue
+                manifest["segments"][h] = {
+                    "source": pdf_path,
+                    "segment": os.path.join(segments_dir, f"{h}.txt"),
+                    "pages": stats["pages"],
+                    "chars": stats["chars"],
+                }
+                extracted.append(h)
+        # Sıra, PDF adına göre belirli kalsın
+        extracted.sort(key=lambda h: current[h])
+
+    for h in removed:
+        manifest["order"].remove(h)
+        segment_path = manifest["segments"].pop(h)["segment"]
+        if os.path.exists(segment_path):
+            os.remove(segment_path)
+
+    if removed or not os.path.exists(output_path):
+        # İndeksler ve soru kayıt deposu imza değiştiği için ilk kullanımda yeniden oluşturulur
+        manifest["order"].extend(extracted)
+        _write_corpus([manifest["segments"][h]["segment"] for h in manifest["order"]], output_path)
+        print(f"🔁 Korpus segmentlerden yeniden birleştirildi ({len(manifest['order'])} segment)")
+    elif extracted:
+        previous_signature = corpus_signature(output_path)
+        new_segments = [manifest["segments"][h]["segment"] for h in extracted]
+        _write_corpus(new_segments, output_path, append=True)
+        manifest["order"].extend(extracted)
+        append_to_indexes(previous_signature, output_path)
+        append_to_item_store(previous_signature, output_path)
+        print(f"➕ {len(extracted)} segment korpusa eklendi")
+    else:
+        print("✅ Korpus güncel, yapılacak iş yok")
+
+    save_manifest(manifest, manifest_path)
+    elapsed = time.perf_counter() - start
+    print(f"✅ Korpus hazır: {output_path} ({elapsed:.1f} sn)")
+    return manifest
+
+def extract_and_clean_text(pdf_path):
+    """PDF'den metin çıkarır ve temizler"""
+    print(f"[{pdf_path}] dosyasından metin çıkarılıyor...")
+    
+    try:
+        start = time.perf_counter()
+        pages = list(iter_clean_pages(pdf_path))
+        all_text = " ".join(pages)
+        elapsed = time.perf_counter() - start
+        
+        print(f"Metin temizleme tamamlandı: {len(pages)} sayfa, {elapsed:.2f} sn")
         return all_text
         
     except FileNotFoundError:
@@ -40,15 +230,20 @@ def extract_and_clean_text(pdf_path):
         print(f"Metin çıkarma sırasında beklenmeyen hata: {e}")
         return None
 
-if __name__ == "__main__":
-    # Örnek kullanım
+def create_sample_corpus():
+    """Tek örnek PDF'yi işler; PDF yoksa örnek veri seti oluşturur"""
     PDF_FILE = "sample.pdf"  # Kullanıcının kendi PDF dosyası
     
-    if not os.path.exists("data"):
-        os.makedirs("data")
+    corpus_dir = os.path.dirname(CORPUS_PATH)
+    if corpus_dir:
+        os.makedirs(corpus_dir, exist_ok=True)
 
     # Örnek dataset oluştur (PDF yoksa)
     if not os.path.exists(PDF_FILE):
+        # Uygulamanın okuduğu korpus, örnek metinle ezilmez
+        if os.path.exists(CORPUS_PATH):
+            print(f"✅ Korpus zaten var, örnek veri seti yazılmadı: {CORPUS_PATH}")
+            return
         print("📝 Örnek veri seti oluşturuluyor...")
         sample_corpus = """ARTIFICIAL INTELLIGENCE AND MODERN SOCIETY
 
@@ -70,17 +265,31 @@ ADVANCEMENTS IN RENEWABLE ENERGY
 
 Renewable energy technologies have experienced rapid development. Solar, wind, and hydropower are becoming increasingly competitive with traditional fossil fuels."""
         
-        with open("data/cleaned_corpus.txt", "w", encoding="utf-8") as f:
+        with open(CORPUS_PATH, "w", encoding="utf-8") as f:
             f.write(sample_corpus)
         
-        print("✅ Örnek veri seti 'data/cleaned_corpus.txt' dosyasına kaydedildi.")
+        print(f"✅ Örnek veri seti '{CORPUS_PATH}' dosyasına kaydedildi.")
     else:
-        # PDF varsa işle
-        cleaned_corpus = extract_and_clean_text(PDF_FILE)
+        # PDF varsa sayfa sayfa işleyip doğrudan dosyaya yaz
+        stats = write_clean_corpus(PDF_FILE, CORPUS_PATH)
         
-        if cleaned_corpus:
-            with open("data/cleaned_corpus.txt", "w", encoding="utf-8") as f:
-                f.write(cleaned_corpus)
-            
-            print(f"✅ Temizlenmiş metin 'data/cleaned_corpus.txt' dosyasına kaydedildi.")
-            print(f"📊 Toplam karakter sayısı: {len(cleaned_corpus)}")
\ No newline at end of file
+        if stats:
+            print(f"✅ Temizlenmiş metin '{CORPUS_PATH}' dosyasına kaydedildi.")
+            print(f"📊 Toplam karakter sayısı: {stats['chars']}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="YDS/YÖKDİL korpus hazırlama")
+    subparsers = parser.add_subparsers(dest="command")
+    build_parser = subparsers.add_parser("build", help="Klasördeki PDF'lerden artımlı korpus oluştur")
+    build_parser.add_argument("pdf_dir", help="PDF klasörü")
+    build_parser.add_argument("--output", default=CORPUS_PATH, help="Korpus dosyası")
+    build_parser.add_argument("--workers", type=int, default=None, help="İşçi süreç sayısı")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        if not os.path.isdir(args.pdf_dir):
+            print(f"HATA: '{args.pdf_dir}' klasörü bulunamadı.")
+            sys.exit(1)
+        build_corpus(args.pdf_dir, args.output, workers=args.workers)
+    else:
+        create_sample_corpus()
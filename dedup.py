@@ -0,0 +1,144 @@
+import os
+import re
+import zlib
+import hashlib
+import threading
+import numpy as np
+
+# --- Yakın Tekrar Tespiti Ayarları ---
+# İki sorunun tahmini Jaccard benzerliği bu değeri aşarsa tekrar sayılır
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.6"))
+
+# 16 bant x 4 satır: ~0.5 benzerlikten itibaren aday olma olasılığı hızla artar
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_WORDS = 3
+
+_WORD_RE = re.compile(r"[^\W_]+")
+_TURKISH_CASE = str.maketrans({"İ": "i", "I": "i"})
+
+# Çarp-kaydır (multiply-shift) hash aileleri; sabit tohum sayesinde imzalar süreçler arasında aynıdır
+_rng = np.random.RandomState(20240601)
+_A = (_rng.randint(1, 2 ** 62, size=NUM_PERM, dtype=np.int64).astype(np.uint64) << np.uint64(1)) | np.uint64(1)
+_B = _rng.randint(0, 2 ** 62, size=NUM_PERM, dtype=np.int64).astype(np.uint64)
+_SHIFT = np.uint64(32)
+
+
+def question_shingles(question):
+    """Soru metni kelime 3'lüleri ve seçenekler; seçenek sırası önemsizdir"""
+    words = _WORD_RE.findall(question.get("question_text", "").translate(_TURKISH_CASE).lower())
+    if len(words) < SHINGLE_WORDS:
+        shingles = {" ".join(words)}
+    else:
+        shingles = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+    for value in question.get("options", {}).values():
+        shingles.add("opt:" + " ".join(_WORD_RE.findall(str(value).translate(_TURKISH_CASE).lower())))
+    return shingles
+
+
+def minhash_signature(question):
+    """Sorunun NUM_PERM boyutlu uint32 MinHash imzası"""
+    hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in question_shingles(question)), dtype=np.uint64)
+    if not len(hashes):
+        return np.zeros(NUM_PERM, dtype=np.uint32)
+    permuted = (hashes[:, None] * _A + _B) >> _SHIFT
+    return permuted.min(axis=0).astype(np.uint32)
+
+
+def band_keys(signature):
+    """LSH bant anahtarları: bant numarası dahil, SQLite INTEGER'a sığan işaretli 64 bit"""
+    keys = []
+    for band in range(BANDS):
+        digest = hashlib.blake2b(signature[band * ROWS:(band + 1) * ROWS].tobytes(),
+                                 digest_size=8, salt=band.to_bytes(2, "little"))
+        keys.append(int.from_bytes(digest.digest(), "little", signed=True))
+    return keys
+
+
+def similarity(sig_a, sig_b):
+    """İki imzadan tahmini Jaccard benzerliği"""
+    return float(np.count_nonzero(sig_a == sig_b)) / NUM_PERM
+
+
+def signature_to_bytes(signature):
+    return signature.astype("<u4").tobytes()
+
+
+def signature_from_bytes(blob):
+    return np.frombuffer(blob, dtype="<u4")
+
+
+class DuplicateFilter:
+    """Bir sınavdaki soruları LSH kovalarında tutar; yakın tekrarları reddeder.
+
+    bank verilirse yeni sorular soru bankasında daha önce sunulmuş sorulara
+    karşı da denetlenir; bu sorgu kilit dışında yapılır. Paralel batch'ler aynı
+    filtreyi paylaştığı için sınav içi kontrol ve ekleme tek kilit altındadır.
+    """
+
+    def __init__(self, threshold=DEDUP_THRESHOLD, bank=None):
+        self.threshold = threshold
+        self.bank = bank
+        self.signatures = []
+        self.buckets = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.signatures)
+
+    def _find(self, signature, keys):
+        seen = set()
+        for key in keys:
+            for idx in self.buckets.get(key, ()):
+                if idx not in seen:
+                    seen.add(idx)
+                    if similarity(signature, self.signatures[idx]) >= self.threshold:
+                        return True
+        return False
+
+    def _add(self, signature, keys):
+        idx = len(self.signatures)
+        self.signatures.append(signature)
+        for key in keys:
+            self.buckets.setdefault(key, []).append(idx)
+
+    def add(self, question):
+        """Soruyu denetlemeden ekler (ör. bankadan gelen ya da yedek sorular)"""
+        signature = minhash_signature(question)
+        with self._lock:
+            self._add(signature, band_keys(signature))
+
+    def accept(self, question):
+        """Soru yeni ise ekleyip True, sınavdaki ya da bankadaki bir soruya çok benziyorsa False döner"""
+        signature = minhash_signature(question)
+        keys = band_keys(signature)
+        # Banka yalnızca okunur, sonucu sınavdaki diğer sorulara bağlı değildir
+        if self.bank is not None and self.bank.has_similar(signature, keys, self.threshold):
+            return False
+        with self._lock:
+            if self._find(signature, keys):
+                return False
+            self._add(signature, keys)
+            return True
+
+
+if __name__ == "__main__":
+    import time
+    import random
+
+    # Rastgele sorularla kontrol başına süre ölçümü
+    rng = random.Random(1)
+    vocab = [f"word{i}" for i in range(5000)]
+    questions = [
+        {"question_text": " ".join(rng.choice(vocab) for _ in range(25)),
+         "options": {k: rng.choice(vocab) for k in "ABCDE"}}
+        for _ in range(20000)
+    ]
+    dup_filter = DuplicateFilter()
+    start = time.perf_counter()
+    accepted = sum(dup_filter.accept(q) for q in questions)
+    elapsed = time.perf_counter() - start
+    near = dict(questions[0], question_text=questions[0]["question_text"] + " indeed")
+    print(f"🔎 {len(questions)} kontrol, {accepted} kabul, kontrol başına {elapsed / len(questions) * 1e6:.1f} µs")
+    print(f"🔁 Yakın tekrar reddedildi mi: {not dup_filter.accept(near)}")
@@ -0,0 +1,386 @@
+import os
+import re
+import json
+import uuid
+import random
+import threading
+from array import array
+
+from corpus import get_corpus
+from retrieval import CORPUS_PATH, INDEX_DIR, corpus_signature
+
+# --- Soru Kaydı Deposu Ayarları ---
+ITEMS_PATH = os.path.join(INDEX_DIR, "exam_items.jsonl")
+ITEMS_OFFSETS_PATH = os.path.join(INDEX_DIR, "exam_items.idx")
+ITEMS_META_PATH = os.path.join(INDEX_DIR, "exam_items.meta.json")
+
+ITEMS_FORMAT_VERSION = 1
+
+# YDS kitapçıklarının standart 80 soruluk bölüm düzeni:
+# (ilk soru, son soru, bölüm adı, rag_pipeline soru tipi)
+YDS_SECTIONS = [
+    (1, 6, "vocabulary", "vocabulary"),
+    (7, 16, "grammar", "grammar"),
+    (17, 26, "cloze", "cloze test"),
+    (27, 36, "sentence completion", "cloze test"),
+    (37, 42, "translation", None),
+    (43, 62, "reading", "reading comprehension"),
+    (63, 67, "dialogue completion", None),
+    (68, 71, "restatement", None),
+    (72, 75, "paragraph completion", "reading comprehension"),
+    (76, 80, "irrelevant sentence", "reading comprehension"),
+]
+
+_BOOKLET_START_RE = re.compile(r"T\.C\. Ölçme, Seçme ve Yerleştirme Merkezi")
+_YEAR_RE = re.compile(r"\b((?:19|20)\d\d)\b")
+_SESSION_RE = re.compile(r"İlkbahar|Sonbahar|YDS/\d", re.IGNORECASE)
+_SECTION_HEADER_RE = re.compile(r"(?<!\d)(\d{1,2})-(\d{1,2}): (?:For these|Answer these)")
+_QUESTION_MARKER_RE = re.compile(r"(?<![\w.])(\d{1,2})\. (?=[A-Z\"'‘“(]|----)")
+_OPTION_RE = re.compile(r"(?<![A-Za-z])([A-E])\)\s*")
+_KEY_PAIR_RE = re.compile(r"(?<!\d)(\d{1,2})\. ?([A-E])(?=\s|$)")
+_PAGE_NUMBER_RE = re.compile(r"\s\d{1,2}\s+\d{4}-Y ?DS.*$")
+# İki sütunlu sayfalarda köke karışan, komşu sorunun tek kelimelik seçenekleri
+_STRAY_OPTION_RE = re.compile(r"(?<![A-Za-z])[A-E]\)\s*[^\s]+(?: / [^\s]+)?")
+
+MAX_OPTION_WORDS = 40
+
+
+def _tmp_path(path):
+    """Yazara özel geçici dosya adı; eşzamanlı yazarlar aynı dosyayı paylaşmaz"""
+    return f"{path}.{os.getpid()}.{uuid.uuid4().hex}.tmp"
+
+
+def _replace(tmp_path, path):
+    try:
+        os.replace(tmp_path, path)
+    except OSError:
+        os.remove(tmp_path)
+        raise
+
+
+def section_for_number(number):
+    """Soru numarasına göre (bölüm adı, soru tipi) döner"""
+    for first, last, section, question_type in YDS_SECTIONS:
+        if first <= number <= last:
+            return section, question_type
+    return None, None
+
+
+def split_booklets(text):
+    """Korpusu kitapçık başlangıçlarından böler"""
+    starts = [m.start() for m in _BOOKLET_START_RE.finditer(text)] or [0]
+    if starts[0] != 0:
+        starts.insert(0, 0)
+    starts.append(len(text))
+    return [text[a:b] for a, b in zip(starts, starts[1:]) if text[a:b].strip()]
+
+
+def find_answer_key(booklet):
+    """Kitapçık sonundaki cevap anahtarının başladığı yeri ve {soru no: cevap} sözlüğünü bulur"""
+    runs = []
+    current = []
+    for m in _KEY_PAIR_RE.finditer(booklet):
+        if current and m.start() - current[-1].end() > 8:
+            runs.append(current)
+            current = []
+        current.append(m)
+    if current:
+        runs.append(current)
+
+    runs = [run for run in runs if len(run) >= 20]
+    if not runs:
+        return len(booklet), {}
+
+    key_run = runs[-1]
+    answers = {}
+    for m in key_run:
+        number = int(m.group(1))
+        if 1 <= number <= 80:
+            answers.setdefault(number, m.group(2))
+    return key_run[0].start(), answers
+
+
+def parse_options(span):
+    """Metin parçasının sonundaki A)-E) seçeneklerini ayıklar; (kök, seçenekler) döner"""
+    markers = list(_OPTION_RE.finditer(span))
+    # Son tam A..E dizisini sondan geriye doğru ara
+    for start in range(len(markers) - 5, -1, -1):
+        window = markers[start:start + 5]
+        if [m.group(1) for m in window] != ["A", "B", "C", "D", "E"]:
+            continue
+        options = {}
+        for m, nxt in zip(window, window[1:] + [None]):
+            value = span[m.end():nxt.start() if nxt else len(span)]
+            options[m.group(1)] = _PAGE_NUMBER_RE.sub("", value).strip()
+        stem = _STRAY_OPTION_RE.sub(" ", span[:window[0].start()])
+        return " ".join(stem.split()), options
+    return span.strip(), None
+
+
+def parse_booklet(booklet):
+    """Tek kitapçığı soru kayıtlarına ayırır"""
+    header = booklet[:400]
+    year_match = _YEAR_RE.search(header)
+    session_match = _SESSION_RE.search(header)
+    exam = " ".join(filter(None, [year_match and year_match.group(1), session_match and session_match.group(0)]))
+
+    key_start, answers = find_answer_key(booklet)
+    body = booklet[:key_start]
+
+    # Her soru numarasının, kendi bölüm başlığından sonraki ilk geçişi alınır
+    section_starts = {}
+    for m in _SECTION_HEADER_RE.finditer(body):
+        first = int(m.group(1))
+        section_starts.setdefault(first, m.end())
+
+    markers = {}
+    for m in _QUESTION_MARKER_RE.finditer(body):
+        number = int(m.group(1))
+        if not 1 <= number <= 80 or number in markers:
+            continue
+        header_start = max((pos for first, pos in section_starts.items() if first <= number), default=0)
+        if m.start() >= header_start:
+            markers[number] = m
+
+    boundaries = sorted([m.start() for m in markers.values()] + [m.start() for m in _SECTION_HEADER_RE.finditer(body)])
+    records = []
+    for number in sorted(markers):
+        m = markers[number]
+        end = next((pos for pos in boundaries if pos > m.start()), len(body))
+        stem, options = parse_options(body[m.end():end])
+        if not options or len(stem.split()) < 3:
+            continue
+        if any(not value or len(value.split()) > MAX_OPTION_WORDS for value in options.values()):
+            continue
+        section, question_type = section_for_number(number)
+        records.append({
+            "exam": exam,
+            "year": int(year_match.group(1)) if year_match else None,
+            "number": number,
+            "section": section,
+            "question_type": question_type,
+            "stem": stem,
+            "options": options,
+            "answer": answers.get(number),
+        })
+    return records
+
+
+def segment_exam_items(text):
+    """Temizlenmiş korpus metnini yapılandırılmış soru kayıtlarına ayırır"""
+    records = []
+    for booklet in split_booklets(text):
+        records.extend(parse_booklet(booklet))
+    return records
+
+
+class ExamItemStore:
+    """JSONL soru kayıtları üzerinde bayt ofset indeksi.
+
+    Kayıt i, ofset dizisinden konumu okunup tek bir satır okunarak O(1)
+    getirilir; tüm dosya belleğe alınmaz. Tip -> kayıt numaraları eşlemesi
+    aynı tipten örnek seçmeyi de O(1) yapar.
+    """
+
+    def __init__(self, items_path=ITEMS_PATH, offsets_path=ITEMS_OFFSETS_PATH, meta_path=ITEMS_META_PATH):
+        self.items_path = items_path
+        self.offsets_path = offsets_path
+        self.meta_path = meta_path
+        self.offsets = array("Q")
+        self.by_type = {}
+        self.by_section = {}
+        self.signature = None
+        self._lock = threading.Lock()
+        self._file = None
+
+    def __len__(self):
+        return len(self.offsets)
+
+    @classmethod
+    def build(cls, records, signature=None, **paths):
+        """Kayıtları JSONL'e yazar, ofset ve tip indekslerini oluşturur.
+
+        Her dosya geçici adla yazılıp yerine taşınır ve meta en son yazılır;
+        eski meta baştan silindiği için okuyucular yarım bir depoyu değil
+        "depo yok" durumunu görür.
+        """
+        store = cls(**paths)
+        os.makedirs(os.path.dirname(store.items_path) or ".", exist_ok=True)
+        if os.path.exists(store.meta_path):
+            os.remove(store.meta_path)
+
+        items_tmp = _tmp_path(store.items_path)
+        with open(items_tmp, "wb") as f:
+            for i, record in enumerate(records):
+                store.offsets.append(f.tell())
+                f.write(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+                store.by_section.setdefault(record["section"], []).append(i)
+                if record["question_type"]:
+                    store.by_type.setdefault(record["question_type"], []).append(i)
+        _replace(items_tmp, store.items_path)
+
+        offsets_tmp = _tmp_path(store.offsets_path)
+        with open(offsets_tmp, "wb") as f:
+            store.offsets.tofile(f)
+        _replace(offsets_tmp, store.offsets_path)
+        store._write_meta(signature)
+        return store
+
+    def append(self, records, signature=None):
+        """Kayıtları mevcut deponun sonuna ekler; eski kayıtlar yeniden yazılmaz.
+
+        Meta en son yazılır: yarıda kalan bir eklemede imza eski kalır ve
+        depo bir sonraki yüklemede yeniden oluşturulur.
+        """
+        start = len(self.offsets)
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            new_offsets = array("Q")
+            with open(self.items_path, "ab") as f:
+                for i, record in enumerate(records, start):
+                    new_offsets.append(f.tell())
+                    f.write(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+                    self.by_section.setdefault(record["section"], []).append(i)
+                    if record["question_type"]:
+                        self.by_type.setdefault(record["question_type"], []).append(i)
+            with open(self.offsets_path, "ab") as f:
+                new_offsets.tofile(f)
+            self.offsets.extend(new_offsets)
+        self._write_meta(signature)
+
+    def _write_meta(self, signature):
+        self.signature = signature
+        meta = {
+            "version": ITEMS_FORMAT_VERSION,
+            "signature": signature,
+            "by_type": self.by_type,
+            "by_section": self.by_section,
+            # Okuyucu dosyaların bu metaya ait olduğunu bu iki değerle doğrular
+            "items": len(self.offsets),
+            "items_size": os.path.getsize(self.items_path),
+        }
+        tmp_path = _tmp_path(self.meta_path)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        _replace(tmp_path, self.meta_path)
+
+    @classmethod
+    def load(cls, **paths):
+        """Ofset ve tip indekslerini diskten yükler (kayıtlar okundukça getirilir)"""
+        store = cls(**paths)
+        with open(store.meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != ITEMS_FORMAT_VERSION:
+            raise ValueError(f"Desteklenmeyen kayıt deposu sürümü: {meta.get('version')}")
+        store.signature = meta["signature"]
+        store.by_type = meta["by_type"]
+        store.by_section = meta["by_section"]
+        with open(store.offsets_path, "rb") as f:
+            store.offsets.frombytes(f.read())
+        # Kayıt dosyası şimdi açılır; sonradan yerine yenisi taşınsa da bu örnek aynı dosyayı okur
+        store._file = open(store.items_path, "rb")
+        if len(store.offsets) != meta.get("items") or os.fstat(store._file.fileno()).st_size != meta.get("items_size"):
+            store._file.close()
+            raise ValueError("Soru kayıt dosyaları metayla uyuşmuyor (yarım yazılmış depo)")
+        return store
+
+    def get(self, i):
+        """i numaralı kaydı döner"""
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.items_path, "rb")
+            self._file.seek(self.offsets[i])
+            line = self._file.readline()
+        return json.loads(line)
+
+    def sample(self, question_type, rng=random):
+        """Verilen soru tipinden rastgele bir kayıt döner; yoksa None"""
+        candidates = self.by_type.get(question_type)
+        if not candidates:
+            return None
+        return self.get(rng.choice(candidates))
+
+
+def load_or_build_item_store(corpus_path=CORPUS_PATH):
+    """Kayıt deposunu yükler; yoksa ya da korpus değişmişse yeniden oluşturur"""
+    if not os.path.exists(corpus_path):
+        print(f"⚠️ Korpus bulunamadı: {corpus_path}")
+        return None
+
+    signature = corpus_signature(corpus_path)
+    if os.path.exists(ITEMS_META_PATH):
+        try:
+            store = ExamItemStore.load()
+            if store.signature == signature:
+                return store
+        except Exception as e:
+            print(f"⚠️ Soru kayıt deposu okunamadı, yeniden oluşturuluyor: {e}")
+
+    # Kitapçık bölme tüm metne bakar; metin mmap'ten bir kez çözülür
+    records = segment_exam_items(get_corpus(corpus_path).text())
+    store = ExamItemStore.build(records, signature)
+    print(f"✅ Soru kayıt deposu oluşturuldu ({len(store)} soru)")
+    return store
+
+
+def append_to_item_store(previous_signature, corpus_path=CORPUS_PATH):
+    """Korpusun sonuna eklenen kitapçıkların sorularını depoya ekler.
+
+    Depo ekleme öncesi korpusla güncel değilse dokunulmaz; bir sonraki
+    kullanımda zaten yeniden oluşturulur.
+    """
+    if not os.path.exists(ITEMS_META_PATH):
+        return
+    try:
+        store = ExamItemStore.load()
+        if store.signature != previous_signature:
+            return
+        records = segment_exam_items(get_corpus(corpus_path).text(previous_signature["size"]))
+        store.append(records, corpus_signature(corpus_path))
+        print(f"✅ Soru kayıt deposuna {len(records)} soru eklendi")
+    except Exception as e:
+        print(f"⚠️ Soru kayıt deposu güncellenemedi: {e}")
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_item_store():
+    """Süreç genelinde tek bir kayıt deposu örneği döner"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = load_or_build_item_store()
+    return _store
+
+
+def item_store_ready():
+    """Depo bu süreçte yüklendiyse True; yükleme tetiklemez"""
+    return _store is not None
+
+
+def sample_exam_item(question_type):
+    """Aynı tipten gerçek bir sınav sorusu döner; depo yoksa None"""
+    store = get_item_store()
+    if store is None:
+        return None
+    return store.sample(question_type)
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == "build":
+        if os.path.exists(ITEMS_META_PATH):
+            os.remove(ITEMS_META_PATH)
+    store = get_item_store()
+    if store:
+        print(f"📚 {len(store)} soru kaydı")
+        for question_type, ids in sorted(store.by_type.items()):
+            print(f"  {question_type}: {len(ids)}")
+        for section, ids in sorted(store.by_section.items()):
+            print(f"  [{section}] {len(ids)}")
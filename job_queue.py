@@ -0,0 +1,333 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# --- Üretim Kuyruğu Ayarları ---
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", os.path.join("data", "job_queue.sqlite3"))
+# Her işçi sürecinde aynı anda yürütülen sınav işi sayısı
+JOB_WORKER_CONCURRENCY = int(os.getenv("JOB_WORKER_CONCURRENCY", "4"))
+# Boş kuyrukta yeni iş için bekleme aralığı (sn)
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "0.5"))
+# Bu kadar süre yaşam sinyali gelmeyen çalışan iş, işçisi çökmüş sayılıp kuyruğa geri konur (sn)
+JOB_STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", "300"))
+# Çalışan iş için, soru gelmese de bu aralıkla yaşam sinyali yazılır (sn; JOB_STALE_SECONDS'tan küçük olmalı)
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", "30"))
+# Biten işler ve soruları bu kadar saat sonra silinir
+JOB_RETENTION_HOURS = float(os.getenv("JOB_RETENTION_HOURS", "24"))
+
+FINISHED_STATUSES = ("done", "failed", "cancelled")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    topic TEXT NOT NULL,
+    question_type TEXT NOT NULL,
+    num_questions INTEGER NOT NULL,
+    user_id TEXT,
+    status TEXT NOT NULL DEFAULT 'queued',
+    worker TEXT,
+    produced INTEGER NOT NULL DEFAULT 0,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    heartbeat_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at);
+CREATE TABLE IF NOT EXISTS job_questions (
+    job_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    PRIMARY KEY (job_id, position)
+);
+"""
+
+
+class JobQueue:
+    """Arayüz ile üretim işçileri arasındaki SQLite tabanlı iş kuyruğu.
+
+    Arayüz işi kuyruğa koyar ve üretilen soruları position sırasıyla okur;
+    işçi süreçler işi sahiplenip soruları hazır oldukça yazar. Sahiplenme
+    koşullu UPDATE ile yapıldığından aynı işi iki işçi alamaz. İşçisi çöken
+    iş, üretilmiş soruları korunarak kuyruğa geri konur ve kalan sorulardan devam eder.
+    """
+
+    def __init__(self, path=JOB_QUEUE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """İşlem sonunda commit eden ve bağlantıyı kapatan bağlantı"""
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def enqueue(self, topic, num_questions, question_type, user_id=None):
+        """Yeni sınav işini kuyruğa koyar ve kimliğini döner"""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, topic, question_type, num_questions, user_id, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, topic, question_type, num_questions, user_id, now),
+            )
+        return job_id
+
+    def claim(self, worker_id):
+        """Kuyruktaki en eski işi bu işçiye verir; iş yoksa None"""
+        now = time.time()
+        with self._connect() as conn:
+            # Çöken işçilerin işleri önce kuyruğa geri alınır
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', worker = NULL WHERE status = 'running' AND heartbeat_at < ?",
+                (now - JOB_STALE_SECONDS,),
+            )
+            for row in conn.execute("SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 5").fetchall():
+                claimed = conn.execute(
+                    """
+                    UPDATE jobs SET status = 'running', worker = ?, started_at = COALESCE(started_at, ?), heartbeat_at = ?
+                    WHERE id = ? AND status = 'queued'
+                    """,
+                    (worker_id, now, now, row["id"]),
+                ).rowcount
+                if claimed:
+                    return dict(conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone())
+        return None
+
+    def add_question(self, job_id, worker_id, question):
+        """Üretilen soruyu işin sonuna ekler.
+
+        İş iptal edildiyse, dolduysa ya da başka bir işçiye geçtiyse False döner; işçi durmalıdır.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            # Önce UPDATE: yazma kilidi alınır, sıra numarası iki işçide çakışmaz
+            updated = conn.execute(
+                """
+                UPDATE jobs SET produced = produced + 1, heartbeat_at = ?
+                WHERE id = ? AND worker = ? AND status = 'running' AND produced < num_questions
+                """,
+                (now, job_id, worker_id),
+            ).rowcount
+            if not updated:
+                return False
+            row = conn.execute("SELECT produced, cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            conn.execute("INSERT INTO job_questions (job_id, position, payload) VALUES (?, ?, ?)",
+                         (job_id, row["produced"] - 1, json.dumps(question, ensure_ascii=False)))
+            return not row["cancel_requested"]
+
+    def heartbeat(self, job_id, worker_id):
+        """Çalışan işin yaşam sinyalini yeniler; iş artık bu işçide değilse False döner"""
+        with self._connect() as conn:
+            return bool(conn.execute(
+                "UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                (time.time(), job_id, worker_id),
+            ).rowcount)
+
+    def finish(self, job_id, worker_id, status="done", error=None):
+        """İşi bitirir; iptal istenmişse durum 'cancelled' olur. İş başka işçiye geçtiyse yok sayılır"""
+        with self._connect() as conn:
+            conn.execute(
+                """
+                UPDATE jobs SET status = CASE WHEN cancel_requested = 1 THEN 'cancelled' ELSE ? END,
+                                error = ?, finished_at = ?
+                WHERE id = ? AND worker = ? AND status = 'running'
+                """,
+                (status, error, time.time(), job_id, worker_id),
+            )
+
+    def cancel(self, job_id):
+        """İşi iptal eder; kuyrukta bekliyorsa hemen, çalışıyorsa sıradaki soruda durur"""
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ?", (job_id,))
+            conn.execute("UPDATE jobs SET status = 'cancelled', finished_at = ? WHERE id = ? AND status = 'queued'",
+                         (time.time(), job_id))
+
+    def poll(self, job_id, after=0):
+        """İşin durumu ve after. sıradan sonraki yeni sorular: (durum sözlüğü, [soru, ...])"""
+        with self._connect() as conn:
+            job = conn.execute("SELECT status, produced, num_questions, error FROM jobs WHERE id = ?",
+                               (job_id,)).fetchone()
+            if job is None:
+                return {"status": "failed", "error": "İş bulunamadı"}, []
+            rows = conn.execute("SELECT payload FROM job_questions WHERE job_id = ? AND position >= ? ORDER BY position",
+                                (job_id, after)).fetchall()
+        return dict(job), [json.loads(row["payload"]) for row in rows]
+
+    def purge(self, older_than_hours=JOB_RETENTION_HOURS):
+        """Biten eski işleri ve sorularını siler; silinen iş sayısını döner"""
+        cutoff = time.time() - older_than_hours * 3600
+        placeholders = ",".join("?" * len(FINISHED_STATUSES))
+        with self._connect() as conn:
+            ids = [row["id"] for row in conn.execute(
+                f"SELECT id FROM jobs WHERE status IN ({placeholders}) AND finished_at < ?",
+                (*FINISHED_STATUSES, cutoff))]
+            conn.executemany("DELETE FROM job_questions WHERE job_id = ?", [(job_id,) for job_id in ids])
+            conn.executemany("DELETE FROM jobs WHERE id = ?", [(job_id,) for job_id in ids])
+        return len(ids)
+
+    def stats(self):
+        """Durumlara göre iş sayıları ve kuyrukta bekleme süresi"""
+        with self._connect() as conn:
+            counts = {row["status"]: row["n"] for row in
+                      conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status")}
+            oldest = conn.execute("SELECT MIN(created_at) FROM jobs WHERE status = 'queued'").fetchone()[0]
+        return {"counts": counts, "oldest_queued_seconds": time.time() - oldest if oldest else 0.0}
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    """Süreç genelinde tek bir kuyruk örneği döner"""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = JobQueue()
+    return _queue
+
+
+def keep_alive(queue, job, stopped):
+    """stopped ayarlanana dek işin yaşam sinyalini JOB_HEARTBEAT_SECONDS aralıkla yazar.
+
+    Soru üretimi uzun sürse de (yavaş model, yeniden denemeler) iş çökmüş sayılmaz.
+    """
+    while not stopped.wait(JOB_HEARTBEAT_SECONDS):
+        try:
+            if not queue.heartbeat(job["id"], job["worker"]):
+                return
+        except sqlite3.Error as e:
+            print(f"⚠️ Kuyruk işi {job['id'][:8]} yaşam sinyali yazılamadı: {e}")
+
+
+def run_queue_job(queue, job):
+    """Sahiplenilen işin eksik sorularını üretip kuyruğa yazar"""
+    # Üretim hattı yalnızca işçi süreçte yüklenir; arayüz süreci bu modülü hafifçe import eder
+    from rag_pipeline import iter_quiz_with_rag
+
+    remaining = job["num_questions"] - job["produced"]
+    if remaining <= 0:
+        queue.finish(job["id"], job["worker"])
+        return
+    stopped = threading.Event()
+    threading.Thread(target=keep_alive, args=(queue, job, stopped), daemon=True).start()
+    questions = iter_quiz_with_rag(job["topic"], remaining, job["question_type"], user_id=job["user_id"])
+    try:
+        for question in questions:
+            if not queue.add_question(job["id"], job["worker"], question):
+                break
+        queue.finish(job["id"], job["worker"])
+    except Exception as e:
+        print(f"❌ Kuyruk işi {job['id'][:8]} başarısız: {e}")
+        queue.finish(job["id"], job["worker"], "failed", str(e))
+    finally:
+        stopped.set()
+        questions.close()
+
+
+def run_worker(worker_name=None, concurrency=JOB_WORKER_CONCURRENCY, stop=None, path=JOB_QUEUE_PATH):
+    """Kuyruktan iş alıp üreten işçi döngüsü; concurrency iş aynı anda yürütülür.
+
+    LLM istekleri süreç içindeki ortak zamanlayıcıdan geçer; birden fazla
+    süreçte her birinin kendi kota payı olduğu unutulmamalı.
+    """
+    worker_name = worker_name or f"{os.uname().nodename}-{os.getpid()}"
+    queue = JobQueue(path)
+    stop = stop or threading.Event()
+    purged = queue.purge()
+    print(f"👷 Üretim işçisi {worker_name} başladı (eşzamanlı iş: {concurrency}, silinen eski iş: {purged})")
+
+    def loop(slot):
+        worker_id = f"{worker_name}/{slot}"
+        while not stop.is_set():
+            try:
+                job = queue.claim(worker_id)
+            except sqlite3.Error as e:
+                print(f"⚠️ Kuyruk okunamadı: {e}")
+                job = None
+            if job is None:
+                stop.wait(JOB_POLL_SECONDS)
+                continue
+            start = time.perf_counter()
+            print(f"🔧 {worker_id}: {job['id'][:8]} ({job['num_questions']} soru, {job['question_type']})")
+            try:
+                run_queue_job(queue, job)
+            except Exception as e:
+                # İş durumu yazılamadıysa yaşam sinyali kesildiği için JOB_STALE_SECONDS sonra kuyruğa geri döner;
+                # işçi iş parçacığı ölmez, sıradaki işe geçer
+                print(f"❌ {worker_id}: {job['id'][:8]} sonlandırılamadı: {type(e).__name__}: {e}")
+                continue
+            print(f"✅ {worker_id}: {job['id'][:8]} bitti ({time.perf_counter() - start:.1f} sn)")
+
+    threads = [threading.Thread(target=loop, args=(slot,), daemon=True) for slot in range(max(1, concurrency))]
+    for thread in threads:
+        thread.start()
+    try:
+        while any(thread.is_alive() for thread in threads):
+            for thread in threads:
+                thread.join(timeout=1)
+    except KeyboardInterrupt:
+        # Süren işler yarıda kalır; JOB_STALE_SECONDS sonra başka bir işçi kaldığı yerden devam eder
+        stop.set()
+
+
+def start_worker_processes(count, concurrency=JOB_WORKER_CONCURRENCY, path=JOB_QUEUE_PATH):
+    """Ayrı süreçlerde işçi başlatır ve süreçleri döner.
+
+    spawn kullanılır: Streamlit sunucusunun thread'leri çatallanan sürece taşınmaz.
+    """
+    import multiprocessing
+
+    context = multiprocessing.get_context("spawn")
+    processes = []
+    for i in range(count):
+        process = context.Process(target=run_worker, kwargs={"concurrency": concurrency, "path": path},
+                                  name=f"quiz-worker-{i}", daemon=True)
+        process.start()
+        processes.append(process)
+    return processes
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Sınav üretim kuyruğu işçileri")
+    sub = parser.add_subparsers(dest="command", required=True)
+    worker_parser = sub.add_parser("worker", help="Kuyruktaki işleri üreten işçileri başlatır")
+    worker_parser.add_argument("--processes", type=int, default=1, help="İşçi süreç sayısı")
+    worker_parser.add_argument("--concurrency", type=int, default=JOB_WORKER_CONCURRENCY,
+                               help="Süreç başına eşzamanlı iş")
+    sub.add_parser("stats", help="Kuyruk durumunu gösterir")
+    sub.add_parser("purge", help=f"{JOB_RETENTION_HOURS:g} saatten eski biten işleri siler")
+    args = parser.parse_args()
+
+    if args.command == "stats":
+        stats = get_job_queue().stats()
+        print(f"📋 İşler: {stats['counts'] or '-'}; en eski bekleyen: {stats['oldest_queued_seconds']:.1f} sn")
+    elif args.command == "purge":
+        print(f"🧹 {get_job_queue().purge()} eski iş silindi")
+    elif args.processes <= 1:
+        run_worker(concurrency=args.concurrency)
+    else:
+        processes = start_worker_processes(args.processes, args.concurrency)
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            print("⏹️ İşçiler durduruluyor...")
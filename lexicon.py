@@ -0,0 +1,368 @@
+import os
+import re
+import json
+import math
+import time
+import random
+import threading
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+from corpus import CORPUS_PATH, corpus_signature, get_corpus
+from retrieval import INDEX_DIR, STOPWORDS
+
+# --- Sözlük İndeksi Ayarları ---
+LEXICON_PATH = os.path.join(INDEX_DIR, "lexicon.json")
+LEXICON_FORMAT_VERSION = 1
+# İndekse alınacak ikili (bigram) için korpusta en az geçiş sayısı
+COLLOCATION_MIN_COUNT = int(os.getenv("COLLOCATION_MIN_COUNT", "3"))
+# Çeldirici adayı olacak kelimenin en az uzunluğu ve geçiş sayısı
+DISTRACTOR_MIN_LENGTH = 4
+DISTRACTOR_MIN_COUNT = 2
+
+# Soru kalıpları, seçenekler ve Türkçe yönergeler kelime sayımına karışmasın
+_SEGMENT_SPLIT_RE = re.compile(r"(?<=[.!?])\s+|\s+[A-E]\)|----")
+_TURKISH_RE = re.compile(r"[çğışöüÇĞŞÖÜİ]")
+_TURKISH_MARKERS = frozenset("ve bir bu ile için olan cümle ifadeyi soru sorular cevap verilen anlamca "
+                             "tamamlayan yakın uygun olarak gibi hangisidir aşağıdaki".split())
+_LETTERS_RE = re.compile(r"[^\W\d_]+")
+
+# Kelimenin biçimine göre çeldirici grubu; doğru cevap şekilden tahmin edilmesin
+_SHAPES = [("ly", "adverb"), ("tion", "noun"), ("sion", "noun"), ("ment", "noun"), ("ness", "noun"),
+           ("ity", "noun"), ("ance", "noun"), ("ence", "noun"), ("ing", "ing"), ("ed", "past"),
+           ("ous", "adjective"), ("ive", "adjective"), ("ful", "adjective"), ("able", "adjective"),
+           ("ible", "adjective"), ("al", "adjective"), ("ize", "verb"), ("ise", "verb"), ("ate", "verb")]
+
+# Dil bilgisi soruları için kapalı sınıf kelimeleri; çeldiriciler aynı sınıftan seçilir
+GRAMMAR_CLASSES = [
+    frozenset("in on at by for with from into onto through during without within despite towards".split()),
+    frozenset("although because while whereas unless since if when though once until".split()),
+    frozenset("which who whom whose where that".split()),
+]
+# Aynı sınıfta birbirinin yerine geçebilen kelimeler; biri cevapken diğeri çeldirici olursa iki doğru seçenek çıkar
+GRAMMAR_SYNONYMS = [
+    frozenset("although though while whereas".split()),
+    frozenset("because since".split()),
+    frozenset("when while once".split()),
+    frozenset("when if once".split()),
+    frozenset("which that".split()),
+    frozenset("who that".split()),
+    frozenset("in within during".split()),
+    frozenset("in into".split()),
+    frozenset("on onto".split()),
+    frozenset("through during".split()),
+]
+_FUNCTION_WORDS = frozenset().union(*GRAMMAR_CLASSES)
+
+
+def grammar_distractor_pool(answer):
+    """answer'ın sınıfından, cevabın yerine de doğru olabilecek kelimeler çıkarılmış çeldirici havuzu"""
+    word_class = next(cls for cls in GRAMMAR_CLASSES if answer in cls)
+    return word_class.difference({answer}, *(group for group in GRAMMAR_SYNONYMS if answer in group))
+
+
+def word_shape(word):
+    for suffix, shape in _SHAPES:
+        if word.endswith(suffix) and len(word) > len(suffix) + 2:
+            return shape
+    return "other"
+
+
+def frequency_band(count):
+    """Geçiş sayısının log2 kovası; aynı banttaki kelimeler benzer sıklıktadır"""
+    return int(math.log2(count)) if count > 0 else 0
+
+
+def english_segments(sentences):
+    """Cümleleri soru kalıplarından ve Türkçe metinden arındırılmış İngilizce parçalara böler"""
+    for segment in (part for sentence in sentences for part in _SEGMENT_SPLIT_RE.split(sentence)):
+        if _TURKISH_RE.search(segment):
+            continue
+        words = _LETTERS_RE.findall(segment)
+        if words and not _TURKISH_MARKERS.intersection(w.lower() for w in words):
+            yield words
+
+
+def count_corpus(sentences):
+    """Kelime sayıları, büyük harfle geçiş sayıları (özel isim tespiti) ve ikili sayıları"""
+    counts = Counter()
+    capitalized = Counter()
+    bigrams = Counter()
+    for words in english_segments(sentences):
+        tokens = []
+        for pos, word in enumerate(words):
+            # Filigran harflerinin yapıştığı kelimeler ("complaiYnt") ve kısaltmalar atlanır
+            if not word.isascii() or (len(word) > 1 and not word[1:].islower()):
+                tokens.append(None)
+                continue
+            token = word.lower()
+            counts[token] += 1
+            if pos > 0 and word[0].isupper():
+                capitalized[token] += 1
+            tokens.append(token)
+        bigrams.update(pair for pair in zip(tokens, tokens[1:]) if None not in pair)
+    return counts, capitalized, bigrams
+
+
+class Lexicon:
+    """Korpustan çıkarılmış kelime sıklıkları, ikili eşdizimler ve çeldirici havuzları.
+
+    Kelimeler sıklığa göre sıralanıp numaralanır; sayılar ve ikililer
+    array'lerde tutulur. İkililer (sol * V + sağ) anahtarıyla sıralı
+    olduğundan bir kelimenin eşdizimleri ikili aramayla bulunur.
+    """
+
+    def __init__(self, words, counts, common, bigram_keys, bigram_counts, signature=None):
+        self.words = words
+        self.counts = counts
+        self.common = common
+        self.bigram_keys = bigram_keys
+        self.bigram_counts = bigram_counts
+        self.signature = signature
+        self.total = sum(counts)
+        self.word_ids = {word: i for i, word in enumerate(words)}
+        # (frekans bandı, biçim) -> çeldirici olabilecek kelime numaraları
+        self.groups = {}
+        for i, word in enumerate(words):
+            if self.is_candidate(i):
+                self.groups.setdefault((frequency_band(counts[i]), word_shape(word)), array("I")).append(i)
+        # Soru yapılabilecek ikililer: iki kelimesi de yaygın ve çeldirici olabilecek türden
+        size = len(words)
+        self.collocation_positions = array("I", (pos for pos, key in enumerate(bigram_keys)
+                                                 if self.is_candidate(key // size) and self.is_candidate(key % size)))
+
+    def __len__(self):
+        return len(self.words)
+
+    def is_candidate(self, word_id):
+        word = self.words[word_id]
+        return (self.common[word_id] and len(word) >= DISTRACTOR_MIN_LENGTH and word not in STOPWORDS
+                and word not in _FUNCTION_WORDS and self.counts[word_id] >= DISTRACTOR_MIN_COUNT)
+
+    def frequency(self, word):
+        word_id = self.word_ids.get(word.lower())
+        return self.counts[word_id] if word_id is not None else 0
+
+    def band(self, word):
+        return frequency_band(self.frequency(word))
+
+    def bigram_count(self, left, right):
+        left_id, right_id = self.word_ids.get(left.lower()), self.word_ids.get(right.lower())
+        if left_id is None or right_id is None:
+            return 0
+        key = left_id * len(self.words) + right_id
+        pos = bisect_left(self.bigram_keys, key)
+        if pos < len(self.bigram_keys) and self.bigram_keys[pos] == key:
+            return self.bigram_counts[pos]
+        return 0
+
+    def collocations(self, word, k=5):
+        """Kelimeden sonra en sık gelen kelimeler, PMI'ye göre sıralı [(kelime, sayı, pmi), ...]"""
+        left_id = self.word_ids.get(word.lower())
+        if left_id is None:
+            return []
+        size = len(self.words)
+        start = bisect_left(self.bigram_keys, left_id * size)
+        end = bisect_left(self.bigram_keys, (left_id + 1) * size)
+        found = []
+        for pos in range(start, end):
+            right_id = self.bigram_keys[pos] % size
+            count = self.bigram_counts[pos]
+            pmi = math.log(count * self.total / (self.counts[left_id] * self.counts[right_id]))
+            found.append((self.words[right_id], count, pmi))
+        found.sort(key=lambda item: item[2], reverse=True)
+        return found[:k]
+
+    def distractors(self, answer, k=4, exclude=(), rng=random):
+        """Cevapla aynı biçimde ve yakın sıklıkta k çeldirici; yeterli aday yoksa None"""
+        answer = answer.lower()
+        shape = word_shape(answer)
+        band = self.band(answer) or 1
+        excluded = {answer, *(w.lower() for w in exclude)}
+        pool = []
+        # Önce aynı bant, yetmezse komşu bantlar
+        for distance in range(0, 4):
+            for candidate_band in {band - distance, band + distance}:
+                pool.extend(i for i in self.groups.get((candidate_band, shape), ())
+                            if self.words[i] not in excluded)
+            if len(pool) >= k * 4:
+                break
+        if len(pool) < k:
+            return None
+        # Uzunluğu doğru cevaba yakın kelimeler daha inandırıcı çeldiricidir
+        candidates = [self.words[i] for i in rng.sample(pool, min(len(pool), k * 6))]
+        candidates.sort(key=lambda w: abs(len(w) - len(answer)))
+        return candidates[:k]
+
+    def review_options(self, answer, options):
+        """Tek kelimelik seçenekleri denetler; sorunlu olanlar için [(seçenek, neden), ...] döner.
+
+        LLM'in önerdiği çeldiricilerde korpusta hiç geçmeyen, cevaptan farklı
+        biçimde (ör. cevap -ly ile biterken isim) ya da sıklığı çok farklı
+        kelimeler cevabı tahmin edilebilir kılar.
+        """
+        answer = answer.strip().lower()
+        if " " in answer:
+            return []
+        issues = []
+        seen = {answer}
+        for option in options:
+            option = option.strip().lower()
+            if option == answer:
+                continue
+            if " " in option:
+                continue
+            if option in seen:
+                issues.append((option, "duplicate"))
+            elif word_shape(option) != word_shape(answer):
+                issues.append((option, "shape"))
+            elif option not in self.word_ids:
+                issues.append((option, "unknown"))
+            elif self.frequency(answer) and abs(self.band(option) - self.band(answer)) > 3:
+                issues.append((option, "frequency"))
+            seen.add(option)
+        return issues
+
+    def collocation_item(self, topic=None, rng=random, attempts=10):
+        """"____ kelimesinden sonra en doğal gelen kelime" sorusu; üretilemezse None"""
+        if not self.collocation_positions:
+            return None
+        topic_ids = [self.word_ids[t] for t in (topic or "").lower().split() if t in self.word_ids]
+        size = len(self.words)
+        for attempt in range(attempts):
+            # İlk denemede konu kelimelerinin eşdizimleri, sonra rastgele bir ikili
+            if attempt == 0 and topic_ids:
+                left_id = rng.choice(topic_ids)
+                start = bisect_left(self.bigram_keys, left_id * size)
+                end = bisect_left(self.bigram_keys, (left_id + 1) * size)
+                if start == end:
+                    continue
+                pos = rng.randrange(start, end)
+            else:
+                pos = rng.choice(self.collocation_positions)
+            left_id, right_id = divmod(self.bigram_keys[pos], size)
+            if not (self.is_candidate(left_id) and self.is_candidate(right_id)):
+                continue
+            left, answer = self.words[left_id], self.words[right_id]
+            # Çeldiriciler bu kelimeyle korpusta hiç yan yana gelmemiş olmalı
+            pool = self.distractors(answer, k=8, exclude=(left,), rng=rng) or []
+            distractors = [w for w in pool if not self.bigram_count(left, w)][:4]
+            if len(distractors) < 4:
+                continue
+            options = distractors + [answer]
+            rng.shuffle(options)
+            letters = "ABCDE"
+            return {
+                "question_text": f"Which word most naturally completes the phrase \"{left} ______\"?",
+                "options": dict(zip(letters, options)),
+                "correct_option": letters[options.index(answer)],
+                "explanation": f"\"{left} {answer}\" is a common collocation in the corpus "
+                               f"({self.bigram_counts[pos]} occurrences); the other words do not follow \"{left}\".",
+            }
+        return None
+
+    @classmethod
+    def build(cls, corpus_path=CORPUS_PATH):
+        counts, capitalized, bigrams = count_corpus(get_corpus(corpus_path).iter_sentences())
+        words = [word for word, _ in counts.most_common()]
+        word_ids = {word: i for i, word in enumerate(words)}
+        # Cümle ortasında çoğunlukla büyük harfle geçen kelimeler özel isimdir
+        common = array("B", (1 if capitalized[word] * 2 <= counts[word] else 0 for word in words))
+        size = len(words)
+        pairs = sorted((word_ids[a] * size + word_ids[b], n) for (a, b), n in bigrams.items()
+                       if n >= COLLOCATION_MIN_COUNT)
+        return cls(words, array("I", (counts[w] for w in words)), common,
+                   array("Q", (key for key, _ in pairs)), array("I", (n for _, n in pairs)),
+                   corpus_signature(corpus_path))
+
+    def save(self, path):
+        """İndeksi JSON olarak diske yazar"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        data = {
+            "version": LEXICON_FORMAT_VERSION,
+            "signature": self.signature,
+            "collocation_min_count": COLLOCATION_MIN_COUNT,
+            "words": self.words,
+            "counts": self.counts.tolist(),
+            "common": self.common.tolist(),
+            "bigram_keys": self.bigram_keys.tolist(),
+            "bigram_counts": self.bigram_counts.tolist(),
+        }
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != LEXICON_FORMAT_VERSION:
+            raise ValueError(f"Desteklenmeyen sözlük sürümü: {data.get('version')}")
+        if data.get("collocation_min_count") != COLLOCATION_MIN_COUNT:
+            raise ValueError("COLLOCATION_MIN_COUNT değişmiş")
+        return cls(data["words"], array("I", data["counts"]), array("B", data["common"]),
+                   array("Q", data["bigram_keys"]), array("I", data["bigram_counts"]), data["signature"])
+
+
+def load_or_build_lexicon(corpus_path=CORPUS_PATH, path=LEXICON_PATH):
+    """Sözlük indeksini diskten yükler; yoksa ya da korpus değişmişse yeniden oluşturur"""
+    if not os.path.exists(corpus_path):
+        print(f"⚠️ Korpus bulunamadı ({corpus_path}), sözlük indeksi boş")
+        return Lexicon([], array("I"), array("B"), array("Q"), array("I"))
+
+    signature = corpus_signature(corpus_path)
+    if os.path.exists(path):
+        try:
+            lexicon = Lexicon.load(path)
+            if lexicon.signature == signature:
+                return lexicon
+            print("🔁 Korpus değişmiş, sözlük indeksi yeniden oluşturuluyor...")
+        except Exception as e:
+            print(f"⚠️ Sözlük indeksi okunamadı, yeniden oluşturuluyor: {e}")
+
+    start = time.perf_counter()
+    lexicon = Lexicon.build(corpus_path)
+    lexicon.save(path)
+    print(f"✅ Sözlük indeksi oluşturuldu ({len(lexicon)} kelime, {len(lexicon.bigram_keys)} eşdizim, "
+          f"{time.perf_counter() - start:.2f} sn)")
+    return lexicon
+
+
+_lexicon = None
+_lexicon_lock = threading.Lock()
+
+
+def get_lexicon():
+    """Süreç genelinde tek bir sözlük indeksi döner"""
+    global _lexicon
+    if _lexicon is None:
+        with _lexicon_lock:
+            if _lexicon is None:
+                _lexicon = load_or_build_lexicon()
+    return _lexicon
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == "build":
+        if os.path.exists(LEXICON_PATH):
+            os.remove(LEXICON_PATH)
+        get_lexicon()
+        raise SystemExit(0)
+
+    lexicon = get_lexicon()
+    word = sys.argv[1] if len(sys.argv) > 1 else "significant"
+    print(f"🔤 {word}: {lexicon.frequency(word)} geçiş, bant {lexicon.band(word)}, biçim {word_shape(word)}")
+    print(f"   Eşdizimler: {lexicon.collocations(word)}")
+    print(f"   Çeldiriciler: {lexicon.distractors(word)}")
+
+    rng = random.Random(1)
+    start = time.perf_counter()
+    items = [lexicon.collocation_item("education", rng=rng) for _ in range(1000)]
+    elapsed = time.perf_counter() - start
+    print(f"⚡ {len(items)} eşdizim sorusu, soru başına {elapsed / len(items) * 1e6:.0f} µs "
+          f"({sum(item is None for item in items)} üretilemedi)")
+    print(f"\n{items[0]['question_text']}\n{items[0]['options']} -> {items[0]['correct_option']}")
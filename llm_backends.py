@@ -0,0 +1,298 @@
+import os
+import re
+import json
+import math
+import time
+import random
+import threading
+import urllib.request
+from collections import deque
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# --- Üretim Altyapısı Ayarları ---
+# "gemini" gerçek API'yi, "fake" süreç içi sahte modeli, "http" yerel sahte sunucuyu kullanır
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini").lower()
+API_KEY = os.getenv("GEMINI_API_KEY")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+
+# Sahte model: gecikme log-normal dağılır (medyan ms ve sigma), hata ve bozuk çıktı oranları 0-1
+FAKE_LLM_LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", "800"))
+FAKE_LLM_LATENCY_SIGMA = float(os.getenv("FAKE_LLM_LATENCY_SIGMA", "0.5"))
+FAKE_LLM_ERROR_RATE = float(os.getenv("FAKE_LLM_ERROR_RATE", "0"))
+FAKE_LLM_MALFORMED_RATE = float(os.getenv("FAKE_LLM_MALFORMED_RATE", "0"))
+# Yanıt vermeden asılı kalan isteklerin oranı (zaman aşımı denemeleri için)
+FAKE_LLM_HANG_RATE = float(os.getenv("FAKE_LLM_HANG_RATE", "0"))
+FAKE_LLM_SEED = os.getenv("FAKE_LLM_SEED")
+# Sahte modelin dakikalık istek kotası; aşılınca 429 (RateLimitError) döner, 0 = sınırsız
+FAKE_LLM_RPM = float(os.getenv("FAKE_LLM_RPM", "0"))
+FAKE_LLM_URL = os.getenv("FAKE_LLM_URL", "http://127.0.0.1:8765/generate")
+
+_COUNT_RE = re.compile(r"CREATE EXACTLY (\d+)")
+_TOPIC_RE = re.compile(r"TOPIC: (.+)")
+_TYPE_RE = re.compile(r"QUESTION TYPE: (.+)")
+
+_FAKE_SUBJECTS = ["Recent research on {topic}", "The public debate about {topic}", "Government policy on {topic}",
+                  "Early work in {topic}", "The economics of {topic}", "Popular interest in {topic}",
+                  "Teaching about {topic}", "Media coverage of {topic}"]
+_FAKE_PREDICATES = ["has been described as ______ by many researchers", "was considered ______ until recently",
+                    "remains ______ despite decades of investment", "turned out to be far more ______ than expected",
+                    "is often seen as ______ by critics", "became increasingly ______ over time",
+                    "proved ______ for most participants", "appears ______ at first glance"]
+_FAKE_SETTINGS = ["in most industrialised countries", "among young professionals", "according to a recent survey",
+                  "during the last decade", "in rural communities", "across European universities",
+                  "within small businesses", "in the developing world"]
+_FAKE_WORDS = ["significant", "gradual", "reliable", "obscure", "essential", "fragile", "abundant",
+               "temporary", "accurate", "remarkable", "inevitable", "diverse", "subtle", "rigid"]
+
+
+class RateLimitError(Exception):
+    """Kota aşıldı (HTTP 429)"""
+
+    status_code = 429
+
+
+class LLMBackend:
+    """Soru üretimi için ortak arayüz: prompt alır, ham model metnini döner"""
+
+    name = None
+
+    def connect(self):
+        """İstemciyi hazırlar (ağır importlar burada yapılır); hata varsa yükseltir"""
+
+    def generate(self, prompt, timeout=None, response_schema=None):
+        """timeout saniye içinde yanıt gelmezse TimeoutError benzeri bir hata yükseltir.
+
+        response_schema verilirse yanıt bu JSON şemasına uyacak şekilde kısıtlanır.
+        """
+        raise NotImplementedError
+
+
+class GeminiBackend(LLMBackend):
+    """Gemini API; model ilk kullanımda süreç başına bir kez kurulur"""
+
+    name = "gemini"
+
+    def __init__(self, model_name=GEMINI_MODEL, api_key=API_KEY):
+        self.model_name = model_name
+        self.api_key = api_key
+        self._model = None
+        self._lock = threading.Lock()
+
+    def connect(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    import google.generativeai as genai
+                    genai.configure(api_key=self.api_key)
+                    self._model = genai.GenerativeModel(self.model_name)
+                    print("✅ Gemini API başarıyla yapılandırıldı")
+        return self._model
+
+    def generate(self, prompt, timeout=None, response_schema=None):
+        request_options = {"timeout": timeout} if timeout else None
+        generation_config = None
+        if response_schema is not None:
+            generation_config = {"response_mime_type": "application/json", "response_schema": response_schema}
+        return self.connect().generate_content(prompt, generation_config=generation_config,
+                                               request_options=request_options).text
+
+
+class FakeBackend(LLMBackend):
+    """Ağ gerektirmeyen, şemaya uygun quiz JSON'u döndüren sahte model.
+
+    Gecikme, hata ve bozuk çıktı oranları ayarlanabilir; seed verilirse
+    aynı istek sırası aynı çıktıları üretir.
+    """
+
+    name = "fake"
+
+    def __init__(self, latency_ms=FAKE_LLM_LATENCY_MS, latency_sigma=FAKE_LLM_LATENCY_SIGMA,
+                 error_rate=FAKE_LLM_ERROR_RATE, malformed_rate=FAKE_LLM_MALFORMED_RATE, seed=FAKE_LLM_SEED,
+                 rpm=FAKE_LLM_RPM, hang_rate=FAKE_LLM_HANG_RATE):
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self.hang_rate = hang_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._calls = 0
+        self.rpm = rpm
+        self._recent = deque()
+
+    def _draw(self):
+        """Bir istek için gecikme, hata ve bozuk çıktı kararlarını çeker"""
+        with self._lock:
+            if self.rpm > 0:
+                # Son 60 saniyedeki kabul edilen istekler üzerinden kota
+                now = time.monotonic()
+                while self._recent and now - self._recent[0] > 60:
+                    self._recent.popleft()
+                if len(self._recent) >= self.rpm:
+                    raise RateLimitError("429 Sahte model kotası aşıldı")
+                self._recent.append(now)
+            self._calls += 1
+            latency = self.latency_ms * math.exp(self._rng.gauss(0, self.latency_sigma)) if self.latency_ms > 0 else 0.0
+            if self._rng.random() < self.hang_rate:
+                latency = 3600 * 1000.0
+            fail = self._rng.random() < self.error_rate
+            malformed = self._rng.random() < self.malformed_rate
+            # Soru içerikleri bu isteğe özel, tohumu ana üreteçten gelen bir üreteçle seçilir
+            content_rng = random.Random(self._rng.getrandbits(64))
+            return self._calls, latency / 1000, fail, malformed, content_rng
+
+    def generate(self, prompt, timeout=None, response_schema=None):
+        call_no, latency, fail, malformed, rng = self._draw()
+        if timeout and latency > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"Sahte model zaman aşımı (istek {call_no}, {timeout:.0f} sn)")
+        time.sleep(latency)
+        if fail:
+            raise RuntimeError(f"Sahte model hatası (istek {call_no})")
+
+        count_match = _COUNT_RE.search(prompt)
+        topic_match = _TOPIC_RE.search(prompt)
+        type_match = _TYPE_RE.search(prompt)
+        count = int(count_match.group(1)) if count_match else 1
+        topic = topic_match.group(1).strip() if topic_match else "general"
+        question_type = type_match.group(1).strip() if type_match else "vocabulary"
+
+        quiz = []
+        for i in range(min(count, 80)):
+            words = rng.sample(_FAKE_WORDS, 5)
+            correct = rng.choice("ABCDE")
+            stem = " ".join([rng.choice(_FAKE_SUBJECTS).format(topic=topic), rng.choice(_FAKE_PREDICATES),
+                             rng.choice(_FAKE_SETTINGS)])
+            quiz.append({
+                "question_id": i + 1,
+                "question_text": stem + ".",
+                "options": dict(zip("ABCDE", words)),
+                "correct_option": correct,
+                "explanation": f"'{words['ABCDE'.index(correct)]}' fits the context best.",
+                "question_type": question_type,
+            })
+
+        text = json.dumps({"quiz": quiz}, ensure_ascii=False)
+        if response_schema is not None:
+            # Şemayla kısıtlanan çıktı her zaman geçerli, çitsiz JSON'dur
+            return text
+        if malformed:
+            # Yarıda kesilmiş yanıt: onarılamaz, çağıran fallback ya da yeniden deneme yapar
+            return "```json\n" + text[:len(text) // 2]
+        return "```json\n" + text + "\n```"
+
+
+class HTTPBackend(LLMBackend):
+    """Yerel sahte sunucuya (python llm_backends.py serve) HTTP ile bağlanır"""
+
+    name = "http"
+
+    def __init__(self, url=FAKE_LLM_URL, timeout=60):
+        self.url = url
+        self.timeout = timeout
+
+    def generate(self, prompt, timeout=None, response_schema=None):
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps({"prompt": prompt, "response_schema": response_schema}).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(request, timeout=timeout or self.timeout) as response:
+            return json.loads(response.read())["text"]
+
+
+def create_backend(name=LLM_BACKEND):
+    """Ada göre üretim altyapısı örneği döner"""
+    if name == "fake":
+        return FakeBackend()
+    if name == "http":
+        return HTTPBackend()
+    if name != "gemini":
+        print(f"⚠️ Bilinmeyen LLM altyapısı '{name}', Gemini kullanılıyor")
+    return GeminiBackend()
+
+
+def backend_available(name=LLM_BACKEND):
+    """Altyapı kullanılabilir mi? Gemini için API anahtarı gerekir"""
+    return name in ("fake", "http") or bool(API_KEY)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """Süreç genelinde tek bir üretim altyapısı örneği döner"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = create_backend(LLM_BACKEND)
+    return _backend
+
+
+def set_backend(backend):
+    """Süreç genelindeki altyapıyı değiştirir (benchmark ve yük testleri için)"""
+    global _backend
+    with _backend_lock:
+        _backend = backend
+
+
+def serve(host="127.0.0.1", port=8765, backend=None):
+    """Sahte modeli POST /generate ile sunan çok iş parçacıklı yerel HTTP sunucusu"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    backend = backend or FakeBackend()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path != "/generate":
+                self.send_error(404)
+                return
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                text = backend.generate(body["prompt"], response_schema=body.get("response_schema"))
+                payload = json.dumps({"text": text}).encode("utf-8")
+            except RateLimitError as e:
+                self.send_error(429, str(e))
+                return
+            except Exception as e:
+                self.send_error(500, str(e))
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    print(f"🧪 Sahte LLM sunucusu: http://{host}:{port}/generate "
+          f"(gecikme ~{backend.latency_ms:.0f} ms, hata %{backend.error_rate * 100:.0f}, "
+          f"bozuk %{backend.malformed_rate * 100:.0f})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="LLM üretim altyapıları")
+    subparsers = parser.add_subparsers(dest="command")
+    serve_parser = subparsers.add_parser("serve", help="Sahte modeli yerel HTTP sunucusu olarak çalıştır")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve(args.host, args.port)
+    else:
+        parser.print_help()
@@ -0,0 +1,224 @@
+import os
+import json
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+# --- Metrik Ayarları ---
+# Ayarlanırsa her span bir JSON satırı olarak bu dosyaya yazılır (varsayılan: kapalı)
+METRICS_LOG_PATH = os.getenv("METRICS_LOG_PATH", "")
+# JSON log bu boyutu aşınca <dosya>.1 olarak döndürülür; en fazla iki dosya tutulur (bayt, 0 = sınırsız)
+METRICS_LOG_MAX_BYTES = int(os.getenv("METRICS_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+METRICS_PROM_PATH = os.getenv("METRICS_PROM_PATH", os.path.join("data", "metrics.prom"))
+# Ayarlanırsa Prometheus metinleri bu portta /metrics altında sunulur
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+# Metrik sunucusunun dinlediği adres; dışarıdan kazınacaksa açıkça 0.0.0.0 verilmeli
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+# Yüzdelikler için tutulan son ölçüm sayısı (seri başına)
+METRICS_WINDOW = int(os.getenv("METRICS_WINDOW", "500"))
+
+METRIC_PREFIX = "yds_"
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def _series_key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _quantile(values, q):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    pos = (len(ordered) - 1) * q
+    lower = int(pos)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (pos - lower)
+
+
+class MetricsRegistry:
+    """Süreç içi sayaçlar ve kayan pencereli ölçümler (süre, boyut).
+
+    Her seri için toplam/sayı ve son METRICS_WINDOW değer tutulur; yüzdelikler
+    bu pencereden hesaplanır. Tüm Streamlit oturumları aynı kaydı paylaşır.
+    """
+
+    def __init__(self, window=METRICS_WINDOW, log_path=METRICS_LOG_PATH, log_max_bytes=METRICS_LOG_MAX_BYTES):
+        self.window = window
+        self.log_path = log_path
+        self.log_max_bytes = log_max_bytes
+        self.counters = {}
+        self.observations = {}
+        self._lock = threading.Lock()
+        self._log_file = None
+
+    def increment(self, name, amount=1, **labels):
+        key = _series_key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = _series_key(name, labels)
+        with self._lock:
+            series = self.observations.get(key)
+            if series is None:
+                series = self.observations[key] = {"count": 0, "sum": 0.0, "window": deque(maxlen=self.window)}
+            series["count"] += 1
+            series["sum"] += value
+            series["window"].append(value)
+
+    def log(self, record):
+        """Tek bir olayı JSON satırı olarak log dosyasına ekler; dosya büyüyünce döndürülür"""
+        if not self.log_path:
+            return
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            try:
+                if self._log_file is None:
+                    os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+                    self._log_file = open(self.log_path, "a", encoding="utf-8", buffering=1)
+                elif self.log_max_bytes and self._log_file.tell() >= self.log_max_bytes:
+                    self._log_file.close()
+                    os.replace(self.log_path, self.log_path + ".1")
+                    self._log_file = open(self.log_path, "a", encoding="utf-8", buffering=1)
+                self._log_file.write(line)
+            except OSError as e:
+                print(f"⚠️ Metrik logu yazılamadı: {e}")
+                self.log_path = None
+
+    def summary(self, name, group_by=None):
+        """Bir ölçümün grup başına sayı, p50 ve p95 değerleri (group_by etiketine göre)"""
+        groups = {}
+        with self._lock:
+            for (series_name, labels), series in self.observations.items():
+                if series_name != name:
+                    continue
+                group = dict(labels).get(group_by, "") if group_by else ""
+                groups.setdefault(group, []).extend(series["window"])
+        return {
+            group: {"count": len(values), "p50": _quantile(values, 0.5), "p95": _quantile(values, 0.95)}
+            for group, values in sorted(groups.items())
+        }
+
+    def counter_total(self, name, **labels):
+        """Etiketleri eşleşen tüm serilerin sayaç toplamı"""
+        wanted = {k: str(v) for k, v in labels.items()}
+        with self._lock:
+            return sum(value for (series_name, series_labels), value in self.counters.items()
+                       if series_name == name and wanted.items() <= dict(series_labels).items())
+
+    def render_prometheus(self):
+        """Prometheus metin formatında tüm metrikler"""
+        def fmt_labels(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ""
+            return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+        lines = []
+        with self._lock:
+            counters = sorted(self.counters.items())
+            observations = sorted((key, dict(series, window=list(series["window"])))
+                                  for key, series in self.observations.items())
+
+        seen = set()
+        for (name, labels), value in counters:
+            metric = f"{METRIC_PREFIX}{name}_total"
+            if metric not in seen:
+                lines.append(f"# TYPE {metric} counter")
+                seen.add(metric)
+            lines.append(f"{metric}{fmt_labels(labels)} {value}")
+
+        for (name, labels), series in observations:
+            metric = METRIC_PREFIX + name
+            if metric not in seen:
+                lines.append(f"# TYPE {metric} summary")
+                seen.add(metric)
+            for q in QUANTILES:
+                lines.append(f"{metric}{fmt_labels(labels, [('quantile', q)])} {_quantile(series['window'], q):.6f}")
+            lines.append(f"{metric}_sum{fmt_labels(labels)} {series['sum']:.6f}")
+            lines.append(f"{metric}_count{fmt_labels(labels)} {series['count']}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+def increment(name, amount=1, **labels):
+    """Sayaç artırır (Prometheus'ta <name>_total)"""
+    registry.increment(name, amount, **labels)
+
+
+def observe(name, value, **labels):
+    """Süre dışı bir ölçüm kaydeder (ör. prompt uzunluğu)"""
+    registry.observe(name, value, **labels)
+
+
+def log_event(event, **fields):
+    """Süresi olmayan tekil bir olayı JSON log satırı olarak yazar"""
+    registry.log({"ts": round(time.time(), 3), "event": event, **fields})
+
+
+@contextmanager
+def span(name, **labels):
+    """Bloğun süresini <name>_seconds olarak kaydeder ve JSON log satırı yazar.
+
+    Blok hata ile biterse süre yine kaydedilir, <name>_errors sayacı artar
+    (Streamlit'in st.rerun gibi BaseException tabanlı akış kontrolleri hata sayılmaz).
+    Yield edilen sözlüğe eklenen alanlar log satırına da yazılır.
+    """
+    fields = {}
+    start = time.perf_counter()
+    error = None
+    try:
+        yield fields
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        registry.observe(f"{name}_seconds", duration, **labels)
+        if error is not None:
+            registry.increment(f"{name}_errors", **labels)
+        registry.log({
+            "ts": round(time.time(), 3),
+            "span": name,
+            "duration_ms": round(duration * 1000, 3),
+            **labels,
+            **fields,
+            **({"error": type(error).__name__} if error is not None else {}),
+        })
+
+
+def write_prometheus(path=METRICS_PROM_PATH):
+    """Prometheus metinlerini dosyaya yazar (node_exporter textfile collector ile okunabilir)"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(registry.render_prometheus())
+    os.replace(tmp_path, path)
+
+
+def start_metrics_server(port=METRICS_PORT, host=METRICS_HOST):
+    """/metrics yolunda Prometheus metinlerini sunan arka plan HTTP sunucusu başlatır"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            payload = registry.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"📈 Metrikler: http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,269 @@
+import os
+import re
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# --- Soru Bankası Ayarları ---
+QUESTION_BANK_PATH = os.getenv("QUESTION_BANK_PATH", os.path.join("data", "question_bank.sqlite3"))
+QUESTION_BANK_MAX_ITEMS = int(os.getenv("QUESTION_BANK_MAX_ITEMS", "50000"))
+QUESTION_BANK_TTL_DAYS = float(os.getenv("QUESTION_BANK_TTL_DAYS", "30"))
+
+_TURKISH_CASE = str.maketrans({"İ": "i", "I": "i"})
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS questions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    topic_key TEXT NOT NULL,
+    question_type TEXT NOT NULL,
+    content_hash TEXT NOT NULL UNIQUE,
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_used_at REAL NOT NULL,
+    use_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_questions_key ON questions (topic_key, question_type, last_used_at);
+CREATE INDEX IF NOT EXISTS idx_questions_lru ON questions (last_used_at);
+CREATE INDEX IF NOT EXISTS idx_questions_created ON questions (created_at);
+CREATE TABLE IF NOT EXISTS seen (
+    user_id TEXT NOT NULL,
+    question_id INTEGER NOT NULL,
+    seen_at REAL NOT NULL,
+    PRIMARY KEY (user_id, question_id)
+);
+CREATE TABLE IF NOT EXISTS stats (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS question_lsh (
+    bucket INTEGER NOT NULL,
+    question_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_question_lsh_bucket ON question_lsh (bucket);
+CREATE INDEX IF NOT EXISTS idx_question_lsh_question ON question_lsh (question_id);
+CREATE INDEX IF NOT EXISTS idx_seen_question ON seen (question_id);
+"""
+
+
+def normalize_topic(topic):
+    """Konu metnini anahtar olarak kullanılabilecek biçime getirir"""
+    topic = topic.translate(_TURKISH_CASE).lower()
+    return re.sub(r"\s+", " ", topic).strip()
+
+
+def content_hash(question):
+    """Aynı sorunun iki kez saklanmasını önlemek için içerik özeti"""
+    options = question.get("options", {})
+    key = question.get("question_text", "") + "|" + "|".join(f"{k}={options[k]}" for k in sorted(options))
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+class QuestionBank:
+    """Doğrulanmış soruları konu + soru tipine göre saklayan SQLite tabanlı banka.
+
+    TTL'i dolan sorular ve kapasite aşıldığında en uzun süredir kullanılmayanlar
+    (LRU) silinir. Her kullanıcının gördüğü sorular ayrıca tutulur ve tekrar verilmez.
+    Soru sayısı stats tablosunda ekleme/silme ile aynı işlemde güncellenir, böylece
+    kapasite denetimi tabloyu saymaz. Her iş parçacığı kendi bağlantısını yeniden kullanır.
+    """
+
+    def __init__(self, path=QUESTION_BANK_PATH, max_items=QUESTION_BANK_MAX_ITEMS, ttl_days=QUESTION_BANK_TTL_DAYS):
+        self.path = path
+        self.max_items = max_items
+        self.ttl_seconds = ttl_days * 86400
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(questions)")}
+            if "minhash" not in columns:
+                # Eski bankalara yakın tekrar imzası sütunu eklenir (doldurmak için: reindex)
+                conn.execute("ALTER TABLE questions ADD COLUMN minhash BLOB")
+            # Sayaçsız eski bankalarda soru sayısı bir kez sayılır
+            conn.execute("INSERT OR IGNORE INTO stats (name, value) SELECT 'size', COUNT(*) FROM questions")
+
+    @contextmanager
+    def _connect(self):
+        """İş parçacığının bağlantısıyla, sonunda commit eden (hata olursa geri alan) işlem"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        with conn:
+            yield conn
+
+    def _bump(self, conn, name, amount):
+        conn.execute(
+            "INSERT INTO stats (name, value) VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, amount),
+        )
+
+    def take(self, topic, question_type, count, user_id=None):
+        """Kullanıcının henüz görmediği en fazla count soruyu döner ve görüldü olarak işaretler"""
+        if count <= 0:
+            return []
+
+        now = time.time()
+        topic_key = normalize_topic(topic)
+        with self._connect() as conn:
+            rows = conn.execute(
+                """
+                SELECT id, payload FROM questions
+                WHERE topic_key = ? AND question_type = ? AND created_at >= ?
+                  AND id NOT IN (SELECT question_id FROM seen WHERE user_id = ?)
+                ORDER BY use_count ASC, last_used_at ASC
+                LIMIT ?
+                """,
+                (topic_key, question_type, now - self.ttl_seconds, user_id or "", count),
+            ).fetchall()
+
+            ids = [row[0] for row in rows]
+            if ids:
+                conn.executemany(
+                    "UPDATE questions SET last_used_at = ?, use_count = use_count + 1 WHERE id = ?",
+                    [(now, qid) for qid in ids],
+                )
+                if user_id:
+                    self._mark_seen(conn, user_id, ids, now)
+
+            self._bump(conn, "requested", count)
+            self._bump(conn, "hits", len(ids))
+
+        questions = []
+        for qid, payload in rows:
+            question = json.loads(payload)
+            question["bank_id"] = qid
+            questions.append(question)
+        return questions
+
+    def store(self, topic, question_type, questions, user_id=None):
+        """Doğrulanmış soruları bankaya ekler; eklenen kayıtların id'lerini döner"""
+        now = time.time()
+        topic_key = normalize_topic(topic)
+        ids = []
+        with self._connect() as conn:
+            for question in questions:
+                payload = {k: v for k, v in question.items() if k not in ("question_id", "bank_id", "source")}
+                cursor = conn.execute(
+                    """
+                    INSERT OR IGNORE INTO questions
+                        (topic_key, question_type, content_hash, payload, created_at, last_used_at, use_count)
+                    VALUES (?, ?, ?, ?, ?, ?, 1)
+                    """,
+                    (topic_key, question_type, content_hash(question), json.dumps(payload, ensure_ascii=False), now, now),
+                )
+                if cursor.rowcount:
+                    ids.append(cursor.lastrowid)
+                    self._index_signature(conn, cursor.lastrowid, question)
+            if user_id and ids:
+                self._mark_seen(conn, user_id, ids, now)
+            self._bump(conn, "size", len(ids))
+            self._evict(conn, now)
+        return ids
+
+    def _index_signature(self, conn, question_id, question):
+        """Sorunun MinHash imzasını ve LSH kovalarını kaydeder"""
+        # numpy yalnızca imza gerektiğinde yüklenir
+        from dedup import band_keys, minhash_signature, signature_to_bytes
+
+        signature = minhash_signature(question)
+        conn.execute("UPDATE questions SET minhash = ? WHERE id = ?", (signature_to_bytes(signature), question_id))
+        conn.executemany(
+            "INSERT INTO question_lsh (bucket, question_id) VALUES (?, ?)",
+            [(key, question_id) for key in band_keys(signature)],
+        )
+
+    def has_similar(self, signature, keys, threshold):
+        """Bankada imzaya threshold üzeri benzeyen bir soru var mı (LSH adayları üzerinden)"""
+        from dedup import signature_from_bytes, similarity
+
+        placeholders = ",".join("?" * len(keys))
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"""
+                SELECT DISTINCT q.minhash FROM question_lsh l JOIN questions q ON q.id = l.question_id
+                WHERE l.bucket IN ({placeholders}) AND q.minhash IS NOT NULL
+                """,
+                keys,
+            ).fetchall()
+        return any(similarity(signature, signature_from_bytes(row[0])) >= threshold for row in rows)
+
+    def reindex(self):
+        """İmzası olmayan (eski) sorular için MinHash imzalarını doldurur"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT id, payload FROM questions WHERE minhash IS NULL").fetchall()
+            for question_id, payload in rows:
+                self._index_signature(conn, question_id, json.loads(payload))
+        return len(rows)
+
+    def _mark_seen(self, conn, user_id, ids, now):
+        conn.executemany(
+            "INSERT OR IGNORE INTO seen (user_id, question_id, seen_at) VALUES (?, ?, ?)",
+            [(user_id, qid, now) for qid in ids],
+        )
+
+    def _evict(self, conn, now):
+        """TTL'i dolan ve kapasiteyi aşan (en uzun süre kullanılmamış) soruları siler"""
+        cutoff = now - self.ttl_seconds
+        ids = [row[0] for row in conn.execute("SELECT id FROM questions WHERE created_at < ?", (cutoff,))]
+        total = self._size(conn) - len(ids)
+        overflow = total - self.max_items
+        if overflow > 0:
+            ids.extend(row[0] for row in conn.execute(
+                "SELECT id FROM questions WHERE created_at >= ? ORDER BY last_used_at ASC LIMIT ?",
+                (cutoff, overflow),
+            ))
+        if ids:
+            # İlişkili kayıtlar id ile silinir; tablo taraması yapılmaz
+            params = [(qid,) for qid in ids]
+            conn.executemany("DELETE FROM questions WHERE id = ?", params)
+            conn.executemany("DELETE FROM seen WHERE question_id = ?", params)
+            conn.executemany("DELETE FROM question_lsh WHERE question_id = ?", params)
+            self._bump(conn, "size", -len(ids))
+
+    def _size(self, conn):
+        row = conn.execute("SELECT value FROM stats WHERE name = 'size'").fetchone()
+        return row[0] if row else 0
+
+    def stats(self):
+        """Toplam istenen soru, bankadan karşılanan soru ve isabet oranı"""
+        with self._connect() as conn:
+            values = dict(conn.execute("SELECT name, value FROM stats").fetchall())
+        size = values.get("size", 0)
+        requested = values.get("requested", 0)
+        hits = values.get("hits", 0)
+        return {
+            "size": size,
+            "requested": requested,
+            "hits": hits,
+            "hit_rate": hits / requested if requested else 0.0,
+        }
+
+
+_bank = None
+_bank_lock = threading.Lock()
+
+
+def get_question_bank():
+    """Süreç genelinde tek bir soru bankası örneği döner"""
+    global _bank
+    if _bank is None:
+        with _bank_lock:
+            if _bank is None:
+                _bank = QuestionBank()
+    return _bank
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == "reindex":
+        print(f"🔁 {get_question_bank().reindex()} soru için imza oluşturuldu")
+    stats = get_question_bank().stats()
+    print(f"📦 Soru bankası: {stats['size']} soru")
+    print(f"🎯 İsabet: {stats['hits']}/{stats['requested']} (%{stats['hit_rate'] * 100:.1f})")
@@ -0,0 +1,141 @@
+import os
+import sys
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from types import MappingProxyType
+
+# --- Paylaşılan Soru Deposu Ayarları ---
+# Süreçte tutulacak en fazla soru; aşılınca en uzun süredir okunmayan soru silinir
+QUESTION_STORE_MAX_ITEMS = int(os.getenv("QUESTION_STORE_MAX_ITEMS", "20000"))
+
+
+def freeze_question(question):
+    """Soruyu salt okunur hale getirir (seçenekler dahil)"""
+    record = dict(question)
+    if "options" in record:
+        record["options"] = MappingProxyType(dict(record["options"]))
+    return MappingProxyType(record)
+
+
+def question_key(question):
+    """Sorunun içeriğinden türetilen kimlik; sınavdaki sırası (question_id) dahil edilmez"""
+    content = {k: v for k, v in question.items() if k != "question_id"}
+    if "options" in content:
+        content["options"] = dict(content["options"])
+    payload = json.dumps(content, ensure_ascii=False, sort_keys=True)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def estimate_size(obj, _seen=None):
+    """Nesnenin ve içerdiği kapların yaklaşık bellek boyutu (bayt)"""
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (dict, MappingProxyType)):
+        size += sum(estimate_size(k, _seen) + estimate_size(v, _seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(item, _seen) for item in obj)
+    return size
+
+
+class QuestionStore:
+    """Tüm Streamlit oturumlarının paylaştığı, değiştirilemez sorular deposu.
+
+    Oturumlar soruların kendisini değil yalnızca anahtarlarını tutar; aynı
+    içerikli soru (ör. soru bankasından ya da simülasyondan gelen) süreçte bir
+    kez saklanır. Okunan sorular LRU sırasında öne alınır, böylece sürmekte
+    olan sınavların soruları silinmez.
+    """
+
+    def __init__(self, max_items=QUESTION_STORE_MAX_ITEMS):
+        self.max_items = max_items
+        self._questions = OrderedDict()
+        self._sizes = {}
+        self._bytes = 0
+        self.shared = 0
+        self.evicted = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._questions)
+
+    def put(self, question):
+        """Soruyu depoya ekler ve anahtarını döner"""
+        key = question_key(question)
+        with self._lock:
+            if key in self._questions:
+                self._questions.move_to_end(key)
+                self.shared += 1
+                return key
+        frozen = freeze_question({k: v for k, v in question.items() if k != "question_id"})
+        size = estimate_size(frozen)
+        with self._lock:
+            if key not in self._questions:
+                self._questions[key] = frozen
+                self._sizes[key] = size
+                self._bytes += size
+                while len(self._questions) > self.max_items:
+                    old_key, _ = self._questions.popitem(last=False)
+                    self._bytes -= self._sizes.pop(old_key)
+                    self.evicted += 1
+        return key
+
+    def put_many(self, questions):
+        return [self.put(question) for question in questions]
+
+    def get(self, key):
+        """Salt okunur soru; silinmişse None"""
+        with self._lock:
+            question = self._questions.get(key)
+            if question is not None:
+                self._questions.move_to_end(key)
+            return question
+
+    def quiz_question(self, key, question_id):
+        """Sınavda gösterilecek soru: depodaki içerik + sınavdaki sıra numarası"""
+        question = self.get(key)
+        if question is None:
+            return None
+        return {**question, "question_id": question_id}
+
+    def stats(self):
+        with self._lock:
+            return {"questions": len(self._questions), "bytes": self._bytes,
+                    "shared": self.shared, "evicted": self.evicted}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_question_store():
+    """Süreç genelinde tek bir soru deposu döner"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = QuestionStore()
+    return _store
+
+
+if __name__ == "__main__":
+    # Tam soru listesi ile yalnızca anahtar tutan oturumun bellek karşılaştırması
+    passage = "Reading comprehension: " + " ".join(f"word{i}" for i in range(150))
+    questions = [
+        {"question_id": i + 1, "question_text": f"{passage} Question {i}?",
+         "options": {k: f"option {k} for question {i}" for k in "ABCDE"},
+         "correct_option": "A", "explanation": "The passage states it clearly. " * 3,
+         "question_type": "paragraf sorusu", "source": "llm"}
+        for i in range(80)
+    ]
+    store = QuestionStore()
+    keys = store.put_many(questions)
+    full_session = estimate_size(questions)
+    lean_session = estimate_size(keys)
+    print(f"📦 80 soruluk oturum: tam liste {full_session / 1024:.1f} KB, anahtarlar {lean_session / 1024:.1f} KB "
+          f"(paylaşılan depo {store.stats()['bytes'] / 1024:.1f} KB)")
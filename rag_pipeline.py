@@ -1,84 +1,280 @@
 import os
 import json
 import re
+import time
 import random
-import google.generativeai as genai
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from dotenv import load_dotenv
+from pydantic import ValidationError
+
+from schemas import QUIZ_ADAPTER, QUIZ_RESPONSE_SCHEMA
+from retrieval import retrieve_hits
+from corpus import sample_passages
+from context_packing import context_budget, count_tokens, pack_context
+from question_bank import get_question_bank
+from exam_items import get_item_store, item_store_ready, sample_exam_item
+from corpus_questions import corpus_generator_ready, get_corpus_generator
+from lexicon import get_lexicon
+from llm_backends import backend_available, get_backend
+from metrics import increment, log_event, observe, registry, span
+from rate_limiter import LLM_OUTPUT_TOKEN_ESTIMATE, DeadlinePassed, get_scheduler
 
 # Environment variables yükle
 load_dotenv()
 
-# --- API Anahtarı ve Model Ayarları ---
-API_KEY = os.getenv("GEMINI_API_KEY")
-
-if not API_KEY:
+# --- Üretim Altyapısı ---
+# İstemci ilk soru üretiminde kurulur; import sırasında ağır kütüphane yüklenmez
+RAG_AVAILABLE = backend_available()
+if not RAG_AVAILABLE:
     print("❌ GEMINI_API_KEY environment variable bulunamadı!")
-    RAG_AVAILABLE = False
-else:
+
+# --- JSON Ayıklama ---
+_JSON_DECODER = json.JSONDecoder()
+_TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+_SMART_QUOTES = str.maketrans({"“": '"', "”": '"', "„": '"', "‘": "'", "’": "'"})
+# Bir yanıtta denenecek en fazla '{' başlangıcı
+MAX_JSON_CANDIDATES = 20
+
+def _decode_first_object(text, required_key=None):
+    """Metindeki ilk geçerli JSON nesnesini raw_decode ile bulur.
+
+    Nesne parantez dengesine göre ayrıştırılır; öncesindeki ve sonrasındaki
+    açıklama metni (içinde süslü parantez olsa bile) yok sayılır. required_key
+    verilirse o anahtarı içermeyen nesneler (ör. bozuk dış nesnenin içindeki
+    tek bir soru) atlanır.
+    """
+    pos = text.find("{")
+    for _ in range(MAX_JSON_CANDIDATES):
+        if pos < 0:
+            break
+        try:
+            obj, end = _JSON_DECODER.raw_decode(text, pos)
+            if isinstance(obj, dict) and (required_key is None or required_key in obj):
+                return obj
+            pos = text.find("{", end if isinstance(obj, dict) else pos + 1)
+            continue
+        except ValueError:
+            pass
+        pos = text.find("{", pos + 1)
+    return None
+
+def repair_json_text(text):
+    """Sık görülen LLM hatalarını düzeltir: akıllı tırnaklar ve sondaki virgüller"""
+    return _TRAILING_COMMA_RE.sub(r"\1", text.translate(_SMART_QUOTES))
+
+def clean_json_response(response_text, required_key="quiz"):
+    """LLM yanıtından ilk JSON nesnesini çıkarır; gerekirse hafif onarım dener"""
+    with span("json_parse") as fields:
+        increment("json_responses")
+        parsed_json = None
+        if response_text:
+            parsed_json = _decode_first_object(response_text, required_key)
+            if parsed_json is None:
+                parsed_json = _decode_first_object(repair_json_text(response_text), required_key)
+                if parsed_json is not None:
+                    increment("json_repaired")
+                    fields["repaired"] = True
+
+        if parsed_json is None:
+            increment("json_failures")
+            fields["failed"] = True
+            print(f"JSON ayıklanamadı: {(response_text or '')[:120]!r}")
+    return parsed_json
+
+def parse_stats():
+    """Ayrıştırılan yanıt, onarılan ve başarısız sayıları ile hata oranı"""
+    stats = {
+        "responses": registry.counter_total("json_responses"),
+        "repaired": registry.counter_total("json_repaired"),
+        "failed": registry.counter_total("json_failures"),
+    }
+    stats["failure_rate"] = stats["failed"] / stats["responses"] if stats["responses"] else 0.0
+    return stats
+
+# --- Soru Tipi Eşlemeleri ---
+TYPE_MAPPING = {
+    "boşluk doldurma": "cloze test",
+    "paragraf sorusu": "reading comprehension",
+    "kelime anlamı": "vocabulary",
+    "dil bilgisi": "grammar",
+    "cloze test": "cloze test"
+}
+
+REVERSE_TYPE_MAPPING = {
+    "cloze test": "boşluk doldurma",
+    "reading comprehension": "paragraf sorusu",
+    "vocabulary": "kelime anlamı",
+    "grammar": "dil bilgisi"
+}
+
+AVAILABLE_TYPES = ["cloze test", "reading comprehension", "vocabulary", "grammar"]
+
+# Aynı anda en fazla kaç LLM isteği gönderileceği
+DEFAULT_MAX_WORKERS = int(os.getenv("RAG_MAX_WORKERS", "8"))
+
+# Tek istekte kaç soru isteneceği (1 = her soru için ayrı istek)
+DEFAULT_BATCH_SIZE = int(os.getenv("RAG_BATCH_SIZE", "1"))
+
+# Prompt'a eklenecek en fazla korpus pasajı sayısı; asıl sınır soru tipinin token bütçesidir
+RAG_TOP_K = int(os.getenv("RAG_TOP_K", "3"))
+
+# Bağlam paketleme için getirilen aday pasaj sayısı (RAG_TOP_K'nın katı); MMR bunlar arasından seçer
+CONTEXT_CANDIDATE_FACTOR = int(os.getenv("CONTEXT_CANDIDATE_FACTOR", "3"))
+
+# Sorular önce soru bankasından karşılansın mı
+USE_QUESTION_BANK = os.getenv("USE_QUESTION_BANK", "1") == "1"
+
+# Yakın tekrar sorular (sınav içinde ve bankadakilere karşı) reddedilip yeniden üretilsin mi
+USE_DEDUP = os.getenv("USE_DEDUP", "1") == "1"
+
+# Yanıt, pydantic modellerinden türetilen şemayla kısıtlansın mı (JSON modu); açıkken prompt'ta JSON örneği olmaz
+STRUCTURED_OUTPUT = os.getenv("STRUCTURED_OUTPUT", "1") == "1"
+
+# Doğrulamadan geçemeyen sorular için en fazla kaç tur yeniden istek atılacağı
+BATCH_MAX_ROUNDS = 2
+
+# Bir sınavın tüm sorularının hazır olması için süre (sn); aşılınca kalan sorular yerelden gelir (0 = sınırsız)
+QUIZ_TIME_BUDGET = float(os.getenv("QUIZ_TIME_BUDGET", "120"))
+
+# Tek bir LLM isteğinin gönderildiği andan itibaren en uzun süresi (sn); kota sırasında geçen süre sayılmaz
+LLM_CALL_DEADLINE = float(os.getenv("LLM_CALL_DEADLINE", "30"))
+
+# Süre sınırları beklenirken görevlerin durumuna bakma aralığı (sn)
+DEADLINE_POLL_SECONDS = 0.5
+
+class RequestDeadline:
+    """Bir üretim görevinin süre durumu.
+
+    quiz_deadline görevin sonucunun işe yarayacağı son andır (time.monotonic,
+    inf = sınırsız); zamanlayıcı bundan sonra kuyrukta beklemez ve yeniden
+    denemez. sent_at uçuştaki isteğin gönderilme anıdır, istek yokken None.
+    """
+
+    def __init__(self, quiz_deadline=float("inf")):
+        self.quiz_deadline = quiz_deadline
+        self.sent_at = None
+
+    def scheduler_deadline(self):
+        return None if self.quiz_deadline == float("inf") else self.quiz_deadline
+
+    def start_request(self):
+        """İstek gönderilirken çağrılır; istek için kalan süreyi (sn, None = sınırsız) döner"""
+        now = time.monotonic()
+        if now >= self.quiz_deadline:
+            raise DeadlinePassed("görev bırakıldı ya da sınav süresi doldu")
+        self.sent_at = now
+        timeout = LLM_CALL_DEADLINE if LLM_CALL_DEADLINE > 0 else float("inf")
+        timeout = min(timeout, self.quiz_deadline - now)
+        return None if timeout == float("inf") else timeout
+
+    def end_request(self):
+        self.sent_at = None
+
+    def abandon(self):
+        """Sonuç artık beklenmiyor; görevin sonraki istekleri gönderilmez"""
+        self.quiz_deadline = min(self.quiz_deadline, time.monotonic())
+
+def plan_question_types(num_questions, question_type):
+    """Her soru için İngilizce soru tipini sırasıyla belirler.
+
+    Karışık modda aynı tip üst üste üç kez gelmez. Plan üretimden önce
+    çıkarıldığı için sorular paralel üretilse de sıra ve kural korunur.
+    """
+    plan = []
+    previous_types = []
+
+    for _ in range(num_questions):
+        if question_type.lower() == "karışık":
+            if len(previous_types) >= 2 and previous_types[-1] == previous_types[-2]:
+                available = [t for t in AVAILABLE_TYPES if t != previous_types[-1]]
+                selected_type = random.choice(available) if available else random.choice(AVAILABLE_TYPES)
+            else:
+                selected_type = random.choice(AVAILABLE_TYPES)
+            previous_types.append(selected_type)
+            if len(previous_types) > 2:
+                previous_types = previous_types[-2:]
+        else:
+            selected_type = TYPE_MAPPING.get(question_type, "cloze test")
+        plan.append(selected_type)
+
+    return plan
+
+def retrieve_context(topic, k=None):
+    """Konu için korpustan aday pasajları skorlarıyla getirir; hata olursa boş liste"""
+    if k is None:
+        k = RAG_TOP_K * max(1, CONTEXT_CANDIDATE_FACTOR)
+    if k <= 0:
+        return []
     try:
-        genai.configure(api_key=API_KEY)
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        RAG_AVAILABLE = True
-        print("✅ Gemini API başarıyla yapılandırıldı")
+        hits = retrieve_hits(topic, k)
+        if not hits:
+            # Konu korpusta hiç geçmiyorsa üslup örneği olarak rastgele gerçek pasajlar kullanılır
+            hits = [{"id": None, "text": text, "score": 1.0} for text in sample_passages(RAG_TOP_K)]
+        return hits
     except Exception as e:
-        print(f"❌ Gemini API yapılandırma hatası: {e}")
-        RAG_AVAILABLE = False
+        print(f"⚠️ Pasaj getirme hatası: {e}")
+        return []
 
-def clean_json_response(response_text):
-    """LLM yanıtından saf JSON çıkarır"""
+def assemble_contexts(hits, question_types):
+    """Her soru tipi için aday pasajlardan kendi token bütçesine sığan bağlamı hazırlar"""
+    contexts = {}
+    for selected_type in dict.fromkeys(question_types):
+        passages, tokens = pack_context(hits, context_budget(selected_type), RAG_TOP_K)
+        contexts[selected_type] = passages
+        observe("context_tokens", tokens, question_type=selected_type)
+        print(f"📚 {selected_type}: {len(passages)} pasaj, ~{tokens}/{context_budget(selected_type)} token")
+    return contexts
+
+def format_context_block(context):
+    """Pasajları prompt içine eklenecek bağlam bölümüne çevirir"""
+    if not context:
+        return ""
+    lines = "\n".join(f"            [{i+1}] {passage}" for i, passage in enumerate(context))
+    return f"""
+            SOURCE PASSAGES FROM REAL YDS/YÖKDİL EXAMS (use their vocabulary, style and content as grounding):
+{lines}
+"""
+
+def format_example_block(selected_type):
+    """Aynı tipte gerçek bir YDS sorusunu örnek (few-shot) olarak prompt'a ekler"""
     try:
-        cleaned_text = response_text.replace('```json', '').replace('```', '').strip()
-        json_match = re.search(r'\{.*\}', cleaned_text, re.DOTALL)
-        if json_match:
-            json_str = json_match.group()
-            parsed_json = json.loads(json_str)
-            return parsed_json
+        item = sample_exam_item(selected_type)
     except Exception as e:
-        print(f"JSON temizleme hatası: {e}")
-    return None
+        print(f"⚠️ Örnek soru getirilemedi: {e}")
+        return ""
+    if not item:
+        return ""
 
-def generate_quiz_with_rag(topic, num_questions, question_type):
-    """RAG ile İngilizce quiz soruları üretir"""
-    
-    if not RAG_AVAILABLE:
-        print("❌ RAG kullanılamıyor, simülasyon moduna geçiliyor...")
-        return None
-    
-    try:
-        print(f"🎯 RAG ile {num_questions} soru üretiliyor...")
-        
-        questions = []
-        available_types = ["cloze test", "reading comprehension", "vocabulary", "grammar"]
-        previous_types = []
-        
-        for i in range(num_questions):
-            if question_type.lower() == "karışık":
-                if len(previous_types) >= 2 and previous_types[-1] == previous_types[-2]:
-                    available = [t for t in available_types if t != previous_types[-1]]
-                    selected_type = random.choice(available) if available else random.choice(available_types)
-                else:
-                    selected_type = random.choice(available_types)
-                previous_types.append(selected_type)
-                if len(previous_types) > 2:
-                    previous_types = previous_types[-2:]
-            else:
-                type_mapping = {
-                    "boşluk doldurma": "cloze test",
-                    "paragraf sorusu": "reading comprehension", 
-                    "kelime anlamı": "vocabulary",
-                    "dil bilgisi": "grammar",
-                    "cloze test": "cloze test"
-                }
-                selected_type = type_mapping.get(question_type, "cloze test")
-            
-            print(f"🔍 Soru {i+1}: {selected_type}")
-            
-            prompt = f"""
+    options = "\n".join(f"            {key}) {value}" for key, value in item['options'].items())
+    answer = f"\n            Answer: {item['answer']}" if item.get('answer') else ""
+    return f"""
+            EXAMPLE OF A REAL YDS {item['section'].upper()} QUESTION ({item['exam']}), match its style and difficulty but do not copy it:
+            {item['stem']}
+{options}{answer}
+"""
+
+def format_schema_block(topic, selected_type, count):
+    """Yapılandırılmış çıktıda JSON örneği yerine geçen kısa yönerge; biçimi şema belirler"""
+    return f"""
+            Fill the "quiz" array with {count} item(s), question_id from 1 to {count},
+            question_type "{selected_type}". Questions must relate to {topic}; write the
+            question, options and explanation in English.
+            """
+
+def build_question_prompt(topic, selected_type, context=None, structured=None):
+    """Tek soruluk üretim prompt'unu hazırlar"""
+    if structured is None:
+        structured = STRUCTURED_OUTPUT
+    header = f"""
             CREATE ONE ENGLISH {selected_type.upper()} QUESTION IN JSON FORMAT:
 
             TOPIC: {topic}
             QUESTION TYPE: {selected_type}
-
+{format_context_block(context)}{format_example_block(selected_type)}"""
+    if structured:
+        return header + format_schema_block(topic, selected_type, 1)
+    return header + f"""
             OUTPUT MUST BE IN THIS EXACT JSON FORMAT:
             {{
                 "quiz": [
@@ -101,108 +297,602 @@ def generate_quiz_with_rag(topic, num_questions, question_type):
 
             Return ONLY JSON, no other text.
             """
-            
+
+def call_llm(prompt, selected_type, deadline=None):
+    """Modeli çağırır; gecikmeyi ve prompt/yanıt boyutlarını soru tipine göre kaydeder.
+
+    deadline (RequestDeadline) verilirse istek süresi gönderildiği anda başlar
+    ve sınav sınırı geçince istek kuyrukta beklemez, yeniden denenmez.
+    """
+    deadline = deadline or RequestDeadline()
+    prompt_tokens = count_tokens(prompt)
+    observe("prompt_chars", len(prompt), question_type=selected_type)
+    observe("prompt_tokens", prompt_tokens, question_type=selected_type)
+    with span("llm_call", question_type=selected_type) as fields:
+        # Kota, eşzamanlılık ve yeniden denemeler tüm oturumlarca paylaşılan zamanlayıcıda
+        schema = QUIZ_RESPONSE_SCHEMA if STRUCTURED_OUTPUT else None
+
+        def send():
+            timeout = deadline.start_request()
             try:
-                response = model.generate_content(prompt)
-                cleaned_json = clean_json_response(response.text)
-                
-                if cleaned_json and 'quiz' in cleaned_json and cleaned_json['quiz']:
-                    question_data = cleaned_json['quiz'][0]
-                    question_data['question_id'] = i + 1
-                    reverse_type_mapping = {
-                        "cloze test": "boşluk doldurma",
-                        "reading comprehension": "paragraf sorusu",
-                        "vocabulary": "kelime anlamı", 
-                        "grammar": "dil bilgisi"
-                    }
-                    question_data['question_type'] = reverse_type_mapping.get(selected_type, selected_type)
-                    questions.append(question_data)
-                    print(f"✅ Soru {i+1} başarıyla üretildi")
-                else:
-                    questions.append(create_fallback_question(i + 1, selected_type, topic))
-                    print(f"⚠️ Soru {i+1} için fallback kullanıldı")
-                    
-            except Exception as e:
-                print(f"❌ Soru {i+1} hatası: {e}")
-                questions.append(create_fallback_question(i + 1, selected_type, topic))
+                return get_backend().generate(prompt, timeout=timeout, response_schema=schema)
+            finally:
+                deadline.end_request()
+
+        # Kota, prompt boyutunu kaydeden sayaçla aynı tahmini kullanır
+        response_text = get_scheduler().call(send, prompt_tokens + LLM_OUTPUT_TOKEN_ESTIMATE,
+                                             deadline.scheduler_deadline())
+        fields["prompt_chars"] = len(prompt)
+        fields["prompt_tokens"] = prompt_tokens
+        fields["response_chars"] = len(response_text or "")
+    observe("response_chars", len(response_text or ""), question_type=selected_type)
+    return response_text
+
+def review_distractors(question, selected_type):
+    """LLM'in önerdiği tek kelimelik çeldiricileri sözlük indeksine göre denetler.
+
+    Soru reddedilmez; cevaptan biçim ya da sıklık olarak ayrışan seçenekler
+    weak_distractors sayacına yazılır, böylece prompt'lar buna göre ayarlanabilir.
+    """
+    if selected_type not in ("vocabulary", "cloze test"):
+        return
+    try:
+        options = question["options"]
+        issues = get_lexicon().review_options(options[question["correct_option"]], options.values())
+    except Exception as e:
+        print(f"⚠️ Çeldirici denetimi yapılamadı: {e}")
+        return
+    for _, reason in issues:
+        increment("weak_distractors", question_type=selected_type, reason=reason)
+
+def generate_single_question(index, selected_type, topic, context=None, accept=None, deadline=None):
+    """Tek bir soruyu üretir, başarısız olursa yedek soru döner.
+
+    accept verilirse yakın tekrar olarak reddedilen soru en fazla
+    BATCH_MAX_ROUNDS kez yeniden istenir.
+    """
+    print(f"🔍 Soru {index+1}: {selected_type}")
+    prompt = build_question_prompt(topic, selected_type, context)
+
+    try:
+        for _ in range(BATCH_MAX_ROUNDS):
+            cleaned_json = clean_json_response(call_llm(prompt, selected_type, deadline))
+
+            items = cleaned_json.get('quiz') if isinstance(cleaned_json, dict) else None
+            if not (isinstance(items, list) and validate_quiz_items(items[:1])):
+                break
+
+            question_data = items[0]
+            if accept is not None and not accept(question_data):
+                print(f"♻️ Soru {index+1} tekrar, yeniden üretiliyor")
+                increment("duplicates", question_type=selected_type)
+                continue
+
+            question_data['question_id'] = index + 1
+            question_data['question_type'] = REVERSE_TYPE_MAPPING.get(selected_type, selected_type)
+            question_data['source'] = "llm"
+            review_distractors(question_data, selected_type)
+            print(f"✅ Soru {index+1} başarıyla üretildi")
+            return question_data
+
+        print(f"⚠️ Soru {index+1} için fallback kullanıldı")
+        return create_fallback_question(index + 1, selected_type, topic, accept)
+
+    except Exception as e:
+        print(f"❌ Soru {index+1} hatası: {e}")
+        return create_fallback_question(index + 1, selected_type, topic, accept)
+
+def build_batch_prompt(topic, selected_type, count, context=None, structured=None):
+    """Aynı tipte birden fazla soru isteyen prompt'u hazırlar"""
+    if structured is None:
+        structured = STRUCTURED_OUTPUT
+    header = f"""
+            CREATE EXACTLY {count} DIFFERENT ENGLISH {selected_type.upper()} QUESTIONS IN JSON FORMAT:
+
+            TOPIC: {topic}
+            QUESTION TYPE: {selected_type}
+{format_context_block(context)}{format_example_block(selected_type)}"""
+    if structured:
+        return header + format_schema_block(topic, selected_type, count)
+    return header + f"""
+            OUTPUT MUST BE IN THIS EXACT JSON FORMAT, WITH {count} ITEMS IN THE "quiz" ARRAY
+            (question_id from 1 to {count}):
+            {{
+                "quiz": [
+                    {{
+                        "question_id": 1,
+                        "question_text": "English question text here related to {topic}",
+                        "options": {{
+                            "A": "Option A text",
+                            "B": "Option B text",
+                            "C": "Option C text",
+                            "D": "Option D text",
+                            "E": "Option E text"
+                        }},
+                        "correct_option": "A",
+                        "explanation": "Explanation in English why this is correct",
+                        "question_type": "{selected_type}"
+                    }}
+                ]
+            }}
+
+            Return ONLY JSON, no other text.
+            """
+
+def validate_quiz_items(items):
+    """Soru listesini tek geçişte Quiz modeline göre doğrular.
+
+    Geçerli maddelerin indeks kümesini döner.
+    """
+    if not isinstance(items, list):
+        return set()
+    try:
+        QUIZ_ADAPTER.validate_python({"quiz": items})
+        return set(range(len(items)))
+    except ValidationError as e:
+        invalid = {err['loc'][1] for err in e.errors()
+                   if len(err['loc']) > 1 and err['loc'][0] == 'quiz' and isinstance(err['loc'][1], int)}
+        return {i for i in range(len(items)) if i not in invalid}
+
+def make_batches(indices, type_plan, batch_size):
+    """Soru indekslerini tipe göre gruplayıp batch_size'lık parçalara böler"""
+    by_type = {}
+    for i in indices:
+        by_type.setdefault(type_plan[i], []).append(i)
+
+    batches = []
+    for selected_type, type_indices in by_type.items():
+        for start in range(0, len(type_indices), batch_size):
+            batches.append((selected_type, type_indices[start:start + batch_size]))
+    # Erken sorulara ait batch'ler önce gönderilsin ki ilk sorular önce hazır olsun
+    batches.sort(key=lambda batch: batch[1][0])
+    return batches
+
+def generate_question_batch(indices, selected_type, topic, context=None, accept=None, deadline=None):
+    """Tek istekte len(indices) soru üretir.
+
+    Dönen liste indices ile hizalıdır; geçersiz, eksik ya da accept'in
+    reddettiği (yakın tekrar) maddeler None olur.
+    """
+    print(f"🔍 Sorular {[i + 1 for i in indices]}: {selected_type}")
+    prompt = build_batch_prompt(topic, selected_type, len(indices), context)
+    results = [None] * len(indices)
+
+    try:
+        cleaned_json = clean_json_response(call_llm(prompt, selected_type, deadline))
+    except Exception as e:
+        print(f"❌ Toplu üretim hatası ({selected_type}): {e}")
+        return results
+
+    items = cleaned_json.get('quiz') if isinstance(cleaned_json, dict) else None
+    if not isinstance(items, list):
+        return results
+
+    items = items[:len(indices)]
+    valid = validate_quiz_items(items)
+    if accept is not None:
+        duplicates = {pos for pos in sorted(valid) if not accept(items[pos])}
+        if duplicates:
+            print(f"♻️ {len(duplicates)} tekrar soru reddedildi ({selected_type})")
+            increment("duplicates", len(duplicates), question_type=selected_type)
+            valid -= duplicates
+    for pos in valid:
+        question_data = items[pos]
+        question_data['question_id'] = indices[pos] + 1
+        question_data['question_type'] = REVERSE_TYPE_MAPPING.get(selected_type, selected_type)
+        question_data['source'] = "llm"
+        review_distractors(question_data, selected_type)
+        results[pos] = question_data
+
+    print(f"✅ {len(valid)}/{len(indices)} soru doğrulandı ({selected_type})")
+    return results
+
+def generate_batch_with_retries(indices, selected_type, topic, context=None, accept=None, deadline=None):
+    """Bir batch'i üretir; doğrulanamayan maddeler yalnızca kendileri için yeniden istenir.
+
+    Son turdan sonra hâlâ eksik kalanlara yedek soru konur, dönen liste indices ile hizalıdır.
+    """
+    results = [None] * len(indices)
+    pending = list(range(len(indices)))
+
+    for round_no in range(BATCH_MAX_ROUNDS):
+        if not pending:
+            break
+        if round_no > 0:
+            print(f"🔁 {len(pending)} soru yeniden üretiliyor...")
+            increment("retries", len(pending), question_type=selected_type)
+
+        produced = generate_question_batch([indices[p] for p in pending], selected_type, topic, context, accept,
+                                           deadline)
+        for p, question_data in zip(pending, produced):
+            if question_data is not None:
+                results[p] = question_data
+        pending = [p for p in pending if results[p] is None]
+
+    for p in pending:
+        print(f"⚠️ Soru {indices[p]+1} için fallback kullanıldı")
+        results[p] = create_fallback_question(indices[p] + 1, selected_type, topic, accept)
+
+    return results
+
+def fill_from_bank(questions, type_plan, topic, user_id=None):
+    """Plandaki yerleri, tip bazında soru bankasından sırayla doldurur.
+
+    Bankadan gelen sorular her tipin ilk yerlerine konur; karışık moddaki
+    tip sırası değişmez. Bankadan karşılanan soru sayısını döner.
+    """
+    bank = get_question_bank()
+    slots_by_type = {}
+    for i, selected_type in enumerate(type_plan):
+        if questions[i] is None:
+            slots_by_type.setdefault(selected_type, []).append(i)
+
+    hits = 0
+    for selected_type, slots in slots_by_type.items():
+        for i, question_data in zip(slots, bank.take(topic, selected_type, len(slots), user_id)):
+            question_data['question_id'] = i + 1
+            question_data['question_type'] = REVERSE_TYPE_MAPPING.get(selected_type, selected_type)
+            question_data['source'] = "bank"
+            questions[i] = question_data
+            hits += 1
+    return hits
+
+def make_duplicate_filter(questions, use_bank):
+    """Sınav için yakın tekrar filtresi kurar; bankadan gelen sorular baştan eklenir.
+
+    Filtrenin accept fonksiyonunu döner; tekrar denetimi kapalıysa ya da
+    kurulamazsa None.
+    """
+    if not USE_DEDUP:
+        return None
+    try:
+        # numpy yalnızca üretim başladığında yüklenir
+        from dedup import DuplicateFilter
+        dup_filter = DuplicateFilter(bank=get_question_bank() if use_bank else None)
+        for question_data in questions:
+            if question_data is not None:
+                dup_filter.add(question_data)
+        return dup_filter.accept
+    except Exception as e:
+        print(f"⚠️ Tekrar filtresi kurulamadı: {e}")
+        return None
+
+def store_in_bank(questions, type_plan, topic, user_id=None):
+    """LLM tarafından üretilip doğrulanan soruları bankaya kaydeder"""
+    bank = get_question_bank()
+    by_type = {}
+    for question_data, selected_type in zip(questions, type_plan):
+        if question_data.get('source') == "llm":
+            by_type.setdefault(selected_type, []).append(question_data)
+    for selected_type, new_questions in by_type.items():
+        bank.store(topic, selected_type, new_questions, user_id)
+
+def iter_quiz_with_rag(topic, num_questions, question_type, max_workers=None, batch_size=None,
+                       user_id=None, use_bank=None, time_budget=None):
+    """Soruları hazır oldukça sırayla veren generator.
+
+    Tüm istekler en fazla max_workers eşzamanlı çağrıyla baştan kuyruğa alınır;
+    soru i, kendisinden önceki sorular verildikten sonra ve kendi isteği biter
+    bitmez verilir. Böylece ilk soru, tüm sınav beklenmeden kullanılabilir.
+    Bir görev LLM_CALL_DEADLINE içinde ya da sınav time_budget saniye içinde
+    bitmezse beklenmez; o sorular yerel kaynaklardan anında doldurulur.
+    """
+    with span("quiz_generation", question_type=question_type) as fields:
+        fields["num_questions"] = num_questions
+        start = time.perf_counter()
+        for question in _iter_questions(topic, num_questions, question_type, max_workers, batch_size,
+                                        user_id, use_bank, time_budget):
+            # Her sorunun, üretim başından itibaren hazır olma süresi
+            observe("question_ready_seconds", time.perf_counter() - start, question_type=question_type)
+            increment("questions", source=question.get("source", "llm"))
+            yield question
+
+def wait_for_task(future, deadline):
+    """Görevin sonucunu süre sınırları içinde bekler; sınır aşılırsa None döner.
+
+    Uçuşta bir istek varsa gönderildiği andan itibaren LLM_CALL_DEADLINE, her
+    durumda sınavın bitiş sınırı uygulanır. Kuyrukta ya da kota sırasında
+    bekleyen görev yalnızca sınav sınırına tabidir.
+    """
+    while True:
+        limit = deadline.quiz_deadline
+        sent = deadline.sent_at
+        if sent is not None and LLM_CALL_DEADLINE > 0:
+            limit = min(limit, sent + LLM_CALL_DEADLINE)
+        remaining = limit - time.monotonic()
+        try:
+            # Sınır geçmiş olsa da bitmiş bir görevin sonucu kullanılır
+            return future.result(timeout=max(0, min(remaining, DEADLINE_POLL_SECONDS)))
+        except FutureTimeoutError:
+            if remaining <= 0:
+                return None
+
+def hedge_question(index, selected_type, topic, accept=None):
+    """Süresi dolan soru yerine ağ gerektirmeyen yedek soru; henüz yüklenmemiş kaynaklar beklenmez"""
+    print(f"⏱️ Soru {index+1} süre sınırını aştı, yerel soru kullanılıyor")
+    increment("deadline_exceeded", question_type=selected_type)
+    return create_fallback_question(index + 1, selected_type, topic, accept, wait=False)
+
+_warm_up_thread = None
+_warm_up_lock = threading.Lock()
+
+def warm_up_local_sources():
+    """Yedek soru kaynaklarını (örnek soru deposu, sözlük, korpus üreteci) arka planda bir kez yükler.
+
+    Süre sınırı aşıldığında yedek soru beklemeden verilmelidir; kaynaklar
+    ilk üretimle birlikte hazırlanmaya başlar.
+    """
+    global _warm_up_thread
+    if _warm_up_thread is not None:
+        return
+    with _warm_up_lock:
+        if _warm_up_thread is not None:
+            return
+
+        def load():
+            for loader in (get_item_store, get_corpus_generator):
+                try:
+                    loader()
+                except Exception as e:
+                    print(f"⚠️ Yedek soru kaynağı yüklenemedi: {e}")
+
+        _warm_up_thread = threading.Thread(target=load, name="fallback-warm-up", daemon=True)
+        _warm_up_thread.start()
+
+def _iter_questions(topic, num_questions, question_type, max_workers, batch_size, user_id, use_bank,
+                    time_budget=None):
+    if not RAG_AVAILABLE:
+        print("❌ RAG kullanılamıyor, simülasyon moduna geçiliyor...")
+        return
+    
+    if max_workers is None:
+        max_workers = DEFAULT_MAX_WORKERS
+    if batch_size is None:
+        batch_size = DEFAULT_BATCH_SIZE
+    if use_bank is None:
+        use_bank = USE_QUESTION_BANK
+    if time_budget is None:
+        time_budget = QUIZ_TIME_BUDGET
+    quiz_deadline = time.monotonic() + time_budget if time_budget > 0 else float("inf")
+    warm_up_local_sources()
+    max_workers = max(1, max_workers)
+    batch_size = max(1, batch_size)
+    
+    print(f"🎯 RAG ile {num_questions} soru üretiliyor (paralellik: {max_workers}, batch: {batch_size})...")
+    
+    type_plan = plan_question_types(num_questions, question_type)
+    questions = [None] * num_questions
+    
+    if use_bank:
+        try:
+            with span("bank_lookup", question_type=question_type):
+                hits = fill_from_bank(questions, type_plan, topic, user_id)
+            print(f"📦 Soru bankası: {hits}/{num_questions} isabet (%{hits / num_questions * 100:.1f})")
+        except Exception as e:
+            print(f"⚠️ Soru bankası okunamadı: {e}")
+    
+    accept = make_duplicate_filter(questions, use_bank)
+    
+    pending = [i for i in range(num_questions) if questions[i] is None]
+    if not pending:
+        yield from questions
+        print(f"✅ Toplam {num_questions} soru bankadan hazırlandı")
+        return
+    
+    with span("retrieval"):
+        hits = retrieve_context(topic)
+        contexts = assemble_contexts(hits, [type_plan[i] for i in pending])
+    
+    if batch_size > 1:
+        tasks = make_batches(pending, type_plan, batch_size)
+        job = lambda task, deadline: generate_batch_with_retries(task[1], task[0], topic, contexts[task[0]],
+                                                                 accept, deadline)
+    else:
+        tasks = [(type_plan[i], [i]) for i in pending]
+        job = lambda task, deadline: [generate_single_question(task[1][0], task[0], topic, contexts[task[0]],
+                                                               accept, deadline)]
+    
+    deadlines = [RequestDeadline(quiz_deadline) for _ in tasks]
+    
+    executor = ThreadPoolExecutor(max_workers=min(max_workers, len(tasks)))
+    try:
+        slot_futures = {}
+        for task_no, task in enumerate(tasks):
+            future = executor.submit(job, task, deadlines[task_no])
+            for pos, i in enumerate(task[1]):
+                slot_futures[i] = (future, pos, task_no)
         
-        print(f"✅ Toplam {len(questions)} soru üretildi")
-        return questions
+        abandoned = set()
+        for i in range(num_questions):
+            if questions[i] is None:
+                future, pos, task_no = slot_futures[i]
+                result = None
+                if task_no not in abandoned:
+                    result = wait_for_task(future, deadlines[task_no])
+                if result is None:
+                    # Geç kalan görev beklenmez; başlamadıysa iptal edilir, başladıysa yeni istek
+                    # göndermez ve yeniden denemez, sonucu gelse de kullanılmaz
+                    abandoned.add(task_no)
+                    deadlines[task_no].abandon()
+                    future.cancel()
+                    questions[i] = hedge_question(i, type_plan[i], topic, accept)
+                else:
+                    questions[i] = result[pos]
+            yield questions[i]
+    finally:
+        # Tüketici erken bırakırsa henüz başlamamış istekler iptal edilir, süren görevler
+        # yeni istek göndermez
+        for deadline in deadlines:
+            deadline.abandon()
+        executor.shutdown(wait=False, cancel_futures=True)
+    
+    if use_bank:
+        try:
+            store_in_bank(questions, type_plan, topic, user_id)
+        except Exception as e:
+            print(f"⚠️ Soru bankasına yazılamadı: {e}")
+    
+    print(f"✅ Toplam {num_questions} soru hazırlandı ({len(pending)} yeni üretildi)")
+    stats = parse_stats()
+    print(f"🧾 JSON ayrıştırma: {stats['responses']} yanıt, {stats['repaired']} onarıldı, "
+          f"hata oranı %{stats['failure_rate'] * 100:.1f}")
+
+def generate_quiz_with_rag(topic, num_questions, question_type, max_workers=None, batch_size=None,
+                           user_id=None, use_bank=None, time_budget=None):
+    """RAG ile İngilizce quiz soruları üretir
+
+    max_workers aynı anda uçuşta olabilecek LLM isteği sayısını sınırlar.
+    1 verilirse sorular eskisi gibi sırayla üretilir. batch_size > 1 ise
+    her istekte aynı tipten batch_size kadar soru istenir. use_bank açıksa
+    sorular önce soru bankasından (user_id'nin görmedikleri) karşılanır,
+    yalnızca eksik kalanlar üretilir. time_budget sınavın hazır olacağı
+    en geç süredir (None = QUIZ_TIME_BUDGET, 0 = sınırsız).
+    """
+    
+    if not RAG_AVAILABLE:
+        print("❌ RAG kullanılamıyor, simülasyon moduna geçiliyor...")
+        return None
+    
+    try:
+        return list(iter_quiz_with_rag(topic, num_questions, question_type, max_workers, batch_size,
+                                       user_id, use_bank, time_budget))
         
     except Exception as e:
         print(f"❌ RAG pipeline hatası: {e}")
         return None
 
-def create_fallback_question(question_id, question_type, topic):
-    """İngilizce yedek soru oluştur"""
-    
-    type_mapping = {
-        "boşluk doldurma": "cloze test",
-        "paragraf sorusu": "reading comprehension",
-        "kelime anlamı": "vocabulary", 
-        "dil bilgisi": "grammar",
-        "cloze test": "cloze test"
-    }
-    english_type = type_mapping.get(question_type, "cloze test")
-    
-    fallbacks = {
-        "cloze test": {
-            "question_text": f"The rapid development of {topic} has ______ significant changes across various industries.",
-            "options": {
-                "A": "triggered", 
-                "B": "reduced", 
-                "C": "prevented", 
-                "D": "ignored", 
-                "E": "complicated"
-            },
-            "correct_option": "A",
-            "explanation": "'Triggered' means started or initiated, which fits the context of development causing changes.",
-            "question_type": "boşluk doldurma"
+# Ortak bir okuma parçasına dayanmayan, tek başına sorulabilen YDS bölümleri
+SELF_CONTAINED_SECTIONS = {"vocabulary", "grammar", "sentence completion", "paragraph completion", "irrelevant sentence"}
+
+def exam_item_fallback(question_id, english_type, accept=None, attempts=5):
+    """Korpustaki aynı tipte, cevabı bilinen gerçek bir YDS sorusunu yedek olarak döner"""
+    for _ in range(attempts):
+        try:
+            item = sample_exam_item(english_type)
+        except Exception as e:
+            print(f"⚠️ Örnek soru getirilemedi: {e}")
+            return None
+        if not item:
+            return None
+        if not item.get('answer') or item['section'] not in SELF_CONTAINED_SECTIONS:
+            continue
+        question = {
+            "question_id": question_id,
+            "question_text": item['stem'],
+            "options": item['options'],
+            "correct_option": item['answer'],
+            "explanation": f"Real YDS question ({item['exam']}, no. {item['number']}); the official answer key gives {item['answer']}.",
+            "question_type": REVERSE_TYPE_MAPPING.get(english_type, english_type),
+            "source": "fallback",
+        }
+        if accept is None or accept(question):
+            return question
+    return None
+
+def corpus_fallback(question_id, english_type, topic, accept=None, attempts=5):
+    """Korpustaki gerçek bir cümleden anında üretilen boşluk doldurma sorusu"""
+    try:
+        generator = get_corpus_generator()
+    except Exception as e:
+        print(f"⚠️ Yerel soru üreteci kurulamadı: {e}")
+        return None
+    for _ in range(attempts):
+        item = generator.make_item(english_type, topic)
+        if not item:
+            return None
+        question = dict(item, question_id=question_id, source="corpus",
+                        question_type=REVERSE_TYPE_MAPPING.get(english_type, english_type))
+        if accept is None or accept(question):
+            return question
+    return None
+
+# Konu şablonlu yedek sorular; modül yüklenirken bir kez kurulur, {topic} çağrıda doldurulur
+FALLBACK_TEMPLATES = {
+    "cloze test": {
+        "question_text": "The rapid development of {topic} has ______ significant changes across various industries.",
+        "options": {
+            "A": "triggered", 
+            "B": "reduced", 
+            "C": "prevented", 
+            "D": "ignored", 
+            "E": "complicated"
         },
-        "reading comprehension": {
-            "question_text": f"Reading comprehension: The integration of {topic} into modern society has fundamentally transformed how we communicate and work. According to the passage, what is the primary impact of {topic}?",
-            "options": {
-                "A": "It has no substantial effect on daily life",
-                "B": "It has fundamentally transformed communication and work", 
-                "C": "It only affects specialized technical fields",
-                "D": "Its benefits are limited to developed nations",
-                "E": "It primarily creates social problems"
-            },
-            "correct_option": "B",
-            "explanation": "The passage explicitly states that the integration has fundamentally transformed communication and work.",
-            "question_type": "paragraf sorusu"
+        "correct_option": "A",
+        "explanation": "'Triggered' means started or initiated, which fits the context of development causing changes.",
+        "question_type": "boşluk doldurma"
+    },
+    "reading comprehension": {
+        "question_text": "Reading comprehension: The integration of {topic} into modern society has fundamentally transformed how we communicate and work. According to the passage, what is the primary impact of {topic}?",
+        "options": {
+            "A": "It has no substantial effect on daily life",
+            "B": "It has fundamentally transformed communication and work", 
+            "C": "It only affects specialized technical fields",
+            "D": "Its benefits are limited to developed nations",
+            "E": "It primarily creates social problems"
         },
-        "vocabulary": {
-            "question_text": f"In the context of {topic}, choose the word closest in meaning to 'innovation':",
-            "options": {
-                "A": "breakthrough", 
-                "B": "tradition", 
-                "C": "stagnation", 
-                "D": "repetition", 
-                "E": "imitation"
-            },
-            "correct_option": "A",
-            "explanation": "'Innovation' refers to introducing new methods or ideas, making 'breakthrough' the closest synonym.",
-            "question_type": "kelime anlamı"
+        "correct_option": "B",
+        "explanation": "The passage explicitly states that the integration has fundamentally transformed communication and work.",
+        "question_type": "paragraf sorusu"
+    },
+    "vocabulary": {
+        "question_text": "In the context of {topic}, choose the word closest in meaning to 'innovation':",
+        "options": {
+            "A": "breakthrough", 
+            "B": "tradition", 
+            "C": "stagnation", 
+            "D": "repetition", 
+            "E": "imitation"
         },
-        "grammar": {
-            "question_text": f"Choose the correct verb form: Research in {topic} ______ that new applications are being developed rapidly.",
-            "options": {
-                "A": "has shown", 
-                "B": "showing", 
-                "C": "have shown", 
-                "D": "are showing", 
-                "E": "show"
-            },
-            "correct_option": "A",
-            "explanation": "'Has shown' is correct because 'research' is a singular noun requiring a singular verb form.",
-            "question_type": "dil bilgisi"
-        }
+        "correct_option": "A",
+        "explanation": "'Innovation' refers to introducing new methods or ideas, making 'breakthrough' the closest synonym.",
+        "question_type": "kelime anlamı"
+    },
+    "grammar": {
+        "question_text": "Choose the correct verb form: Research in {topic} ______ that new applications are being developed rapidly.",
+        "options": {
+            "A": "has shown", 
+            "B": "showing", 
+            "C": "have shown", 
+            "D": "are showing", 
+            "E": "show"
+        },
+        "correct_option": "A",
+        "explanation": "'Has shown' is correct because 'research' is a singular noun requiring a singular verb form.",
+        "question_type": "dil bilgisi"
     }
+}
+
+def create_fallback_question(question_id, question_type, topic, accept=None, wait=True):
+    """İngilizce yedek soru oluştur.
+
+    Önce korpustan aynı tipte gerçek bir sınav sorusu, sonra korpus
+    cümlesinden üretilen bir soru denenir (accept ile sınavdaki sorulara
+    tekrar olmaması denetlenir); ikisi de yoksa konu şablonu kullanılır.
+    Hepsi yereldir, ağ beklemez. wait False ise henüz yüklenmemiş
+    kaynaklar atlanır, böylece ilk yedek soru indeks kurulumunu beklemez.
+    """
+    
+    english_type = TYPE_MAPPING.get(question_type, question_type)
+    if english_type not in AVAILABLE_TYPES:
+        english_type = "cloze test"
+    increment("fallbacks", question_type=english_type)
+    log_event("fallback", question_id=question_id, question_type=english_type)
+    
+    exam_question = exam_item_fallback(question_id, english_type, accept) if wait or item_store_ready() else None
+    if exam_question:
+        return exam_question
+    
+    corpus_question = None
+    if wait or corpus_generator_ready():
+        corpus_question = corpus_fallback(question_id, english_type, topic, accept)
+    if corpus_question:
+        return corpus_question
     
-    template = fallbacks.get(english_type, fallbacks["cloze test"])
-    question = template.copy()
+    template = FALLBACK_TEMPLATES.get(english_type, FALLBACK_TEMPLATES["cloze test"])
+    question = dict(template, question_text=template["question_text"].format(topic=topic),
+                    options=dict(template["options"]))
     question["question_id"] = question_id
+    question["source"] = "fallback"
     return question
 
 if __name__ == '__main__':
@@ -0,0 +1,243 @@
+import os
+import time
+import random
+import threading
+
+from context_packing import count_tokens
+from metrics import increment, observe
+
+# --- İstek Zamanlayıcı Ayarları ---
+# Dakika başına istek ve token kotası (0 = sınırsız)
+LLM_RPM = float(os.getenv("LLM_RPM", "60"))
+LLM_TPM = float(os.getenv("LLM_TPM", "1000000"))
+# Eşzamanlı istek sınırı bu aralıkta AIMD ile ayarlanır
+LLM_MIN_CONCURRENCY = int(os.getenv("LLM_MIN_CONCURRENCY", "1"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "1.0"))
+LLM_BACKOFF_CAP = float(os.getenv("LLM_BACKOFF_CAP", "30.0"))
+# Yanıt için ayrılan tahmini token (prompt'a eklenir)
+LLM_OUTPUT_TOKEN_ESTIMATE = int(os.getenv("LLM_OUTPUT_TOKEN_ESTIMATE", "1000"))
+
+THROTTLE_STATUS = 429
+RETRYABLE_STATUS = frozenset({429, 500, 502, 503, 504})
+# google.api_core istisnaları; paket import edilmeden adıyla tanınır
+THROTTLE_ERRORS = frozenset({"ResourceExhausted", "TooManyRequests", "RateLimitError"})
+RETRYABLE_ERRORS = THROTTLE_ERRORS | frozenset({
+    "ServiceUnavailable", "InternalServerError", "DeadlineExceeded", "GatewayTimeout",
+    "TimeoutError", "ConnectionError", "ConnectionResetError", "RemoteDisconnected",
+})
+
+
+class DeadlinePassed(TimeoutError):
+    """İsteğin mutlak süre sınırı geçti; yeniden denenmez"""
+
+
+def remaining_until(deadline):
+    """Mutlak sınıra (time.monotonic) kalan süre; sınır yoksa None"""
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def error_status(error):
+    """İstisnadan HTTP durum kodunu çıkarır (google.api_core, urllib, requests)"""
+    for attr in ("code", "status_code", "status"):
+        value = getattr(error, attr, None)
+        if callable(value):
+            try:
+                value = value()
+            except Exception:
+                value = None
+        value = getattr(value, "value", value)
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def is_throttle_error(error):
+    return error_status(error) == THROTTLE_STATUS or type(error).__name__ in THROTTLE_ERRORS
+
+
+def is_retryable_error(error):
+    return error_status(error) in RETRYABLE_STATUS or type(error).__name__ in RETRYABLE_ERRORS
+
+
+def estimate_tokens(prompt):
+    """Prompt + beklenen yanıt için token tahmini; bağlam bütçeleriyle aynı sayaç kullanılır"""
+    return count_tokens(prompt) + LLM_OUTPUT_TOKEN_ESTIMATE
+
+
+class TokenBucket:
+    """Dakikalık kotayı sürekli dolan bir kova olarak uygular; 0 oran sınırsızdır"""
+
+    def __init__(self, per_minute, capacity=None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount=1, deadline=None):
+        """amount kadar token alınana dek bekler; beklenen süreyi döner.
+
+        Token deadline'dan önce alınamayacaksa beklemeden DeadlinePassed yükselir.
+        """
+        if self.rate <= 0:
+            return 0.0
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return waited
+                wait = (amount - self.tokens) / self.rate
+            if deadline is not None and now + wait >= deadline:
+                raise DeadlinePassed("kota için beklenecek süre, istek sınırını aşıyor")
+            time.sleep(wait)
+            waited += wait
+
+    def release(self, amount=1):
+        """Kullanılmadan geri verilen token'ları kovaya iade eder"""
+        if self.rate <= 0:
+            return
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.capacity, self.tokens + min(amount, self.capacity))
+
+
+class RequestScheduler:
+    """Tüm LLM çağrılarının geçtiği süreç genelinde zamanlayıcı.
+
+    İstek ve token kovaları dakikalık kotayı uygular. Eşzamanlılık sınırı
+    AIMD ile ayarlanır: her başarılı çağrıda yavaşça artar, kısıtlama (429)
+    görüldüğünde yarıya iner. Yeniden denenebilir hatalar üstel geri çekilme
+    ve tam jitter ile tekrar denenir; yalnızca denemeler tükenince hata yükselir.
+    deadline verilen çağrı bu sınırdan sonra ne kuyrukta bekler ne yeniden denenir.
+    """
+
+    def __init__(self, rpm=LLM_RPM, tpm=LLM_TPM, min_concurrency=LLM_MIN_CONCURRENCY,
+                 max_concurrency=LLM_MAX_CONCURRENCY, max_retries=LLM_MAX_RETRIES,
+                 backoff_base=LLM_BACKOFF_BASE, backoff_cap=LLM_BACKOFF_CAP):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.min_concurrency = max(1, min_concurrency)
+        self.max_concurrency = max(self.min_concurrency, max_concurrency)
+        self.limit = float(self.max_concurrency)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.in_flight = 0
+        self._cond = threading.Condition()
+        self._rng = random.Random()
+
+    def _enter(self, deadline=None):
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                remaining = remaining_until(deadline)
+                if remaining is not None and remaining <= 0:
+                    raise DeadlinePassed("eşzamanlılık sırası beklenirken istek sınırı geçti")
+                self._cond.wait(remaining)
+            self.in_flight += 1
+
+    def _exit(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def _on_success(self):
+        with self._cond:
+            # Eklemeli artış: sınır başına yaklaşık bir tam tur başarıda +1
+            self.limit = min(self.max_concurrency, self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+        observe("llm_concurrency_limit", self.limit)
+
+    def _on_throttle(self):
+        with self._cond:
+            # Çarpımsal azalış
+            self.limit = max(self.min_concurrency, self.limit / 2)
+        increment("llm_throttled")
+        observe("llm_concurrency_limit", self.limit)
+
+    def backoff(self, attempt):
+        """attempt. deneme için tam jitter'lı üstel bekleme süresi"""
+        return self._rng.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    def call(self, fn, tokens=1, deadline=None):
+        """fn()'i kota ve eşzamanlılık sınırları içinde, gerekirse yeniden deneyerek çağırır.
+
+        deadline mutlak bir time.monotonic() değeridir; geçtiğinde DeadlinePassed yükselir.
+        fn istek gerçekten gönderilirken çağrılır, istek başına süre o anda başlatılabilir.
+        """
+        for attempt in range(self.max_retries + 1):
+            taken = []
+            try:
+                remaining = remaining_until(deadline)
+                if remaining is not None and remaining <= 0:
+                    raise DeadlinePassed("istek sınırı gönderilmeden geçti")
+                waited = self.requests.acquire(1, deadline)
+                taken.append((self.requests, 1))
+                waited += self.tokens.acquire(tokens, deadline)
+                taken.append((self.tokens, tokens))
+                if waited:
+                    observe("rate_limit_wait_seconds", waited)
+                self._enter(deadline)
+            except DeadlinePassed:
+                # İstek gönderilmedi; alınan kota başka çağrılara iade edilir
+                for bucket, amount in taken:
+                    bucket.release(amount)
+                increment("llm_deadline_exceeded")
+                raise
+
+            try:
+                result = fn()
+            except Exception as e:
+                if not is_retryable_error(e) or attempt == self.max_retries:
+                    raise
+                if is_throttle_error(e):
+                    self._on_throttle()
+                delay = self.backoff(attempt)
+                remaining = remaining_until(deadline)
+                if remaining is not None and remaining <= delay:
+                    # Bekleme sonrası istek zaten geç kalacak; hata hemen yükselir
+                    increment("llm_deadline_exceeded")
+                    raise
+                increment("llm_retries", reason=type(e).__name__)
+                print(f"⏳ LLM isteği yeniden denenecek ({attempt + 1}/{self.max_retries}, "
+                      f"{delay:.1f} sn): {type(e).__name__}")
+            else:
+                self._on_success()
+                return result
+            finally:
+                self._exit()
+            time.sleep(delay)
+
+    def stats(self):
+        with self._cond:
+            return {"limit": self.limit, "in_flight": self.in_flight}
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Süreç genelinde tek bir istek zamanlayıcısı döner"""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = RequestScheduler()
+    return _scheduler
+
+
+def set_scheduler(scheduler):
+    """Süreç genelindeki zamanlayıcıyı değiştirir (benchmark ve yük testleri için)"""
+    global _scheduler
+    with _scheduler_lock:
+        _scheduler = scheduler
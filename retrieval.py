@@ -0,0 +1,302 @@
+import os
+import re
+import json
+import math
+import heapq
+import time
+import threading
+from collections import Counter
+
+from corpus import CORPUS_PATH, corpus_signature, get_corpus
+
+# --- Retrieval Ayarları ---
+INDEX_DIR = os.getenv("INDEX_DIR", os.path.join("data", "index"))
+BM25_INDEX_PATH = os.path.join(INDEX_DIR, "bm25_index.json")
+DENSE_INDEX_DIR = os.path.join(INDEX_DIR, "dense")
+
+# Kullanılacak arama altyapısı: "bm25" (sözcük tabanlı) veya "dense" (vektör)
+RETRIEVER_BACKEND = os.getenv("RETRIEVER_BACKEND", "bm25").lower()
+
+# Bir pasajın hedef kelime sayısı
+PASSAGE_WORDS = 120
+
+INDEX_FORMAT_VERSION = 1
+
+# İngilizce ve Türkçe sık geçen, ayırt edici olmayan kelimeler
+STOPWORDS = frozenset("""
+a an the and or but if of to in on at by for with from as is are was were be been being
+it its this that these those there their they them he she his her we our you your i me my
+not no nor so than then too very can could will would shall should may might must do does did
+has have had having which who whom whose what when where why how all any both each few more
+most other some such only own same just also into over under about after before between through
+during above below up down out off again further once here
+ve veya ile de da bir bu şu o için gibi ama fakat çok daha en mi mı mu mü ne ki ise her
+olan olarak ya hem ancak kadar sonra önce göre diye değil var yok
+""".split())
+
+_TOKEN_RE = re.compile(r"[^\W\d_]+")
+_TURKISH_CASE = str.maketrans({"İ": "i", "I": "i"})
+
+
+def normalize_token(token):
+    """Basit ek budama: İngilizce çoğul/iyelik ve Türkçe çoğul ekleri"""
+    if token.endswith("'s"):
+        token = token[:-2]
+    if len(token) > 5 and token.endswith(("lar", "ler")):
+        return token[:-3]
+    if len(token) > 4 and token.endswith("s") and not token.endswith(("ss", "us", "is")):
+        return token[:-1]
+    return token
+
+
+def tokenize(text):
+    """Türkçe/İngilizce farkındalıklı küçük harfe çevirme ve kelimelere ayırma"""
+    text = text.translate(_TURKISH_CASE).lower()
+    tokens = []
+    for token in _TOKEN_RE.findall(text):
+        if len(token) < 2 or token in STOPWORDS:
+            continue
+        tokens.append(normalize_token(token))
+    return tokens
+
+
+def chunk_sentences(sentences, target_words=PASSAGE_WORDS):
+    """Cümleleri sırayla yaklaşık target_words kelimelik pasajlarda birleştirir"""
+    passages = []
+    current = []
+    current_words = 0
+
+    for sentence in sentences:
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        current.append(sentence)
+        current_words += len(sentence.split())
+        if current_words >= target_words:
+            passages.append(" ".join(current))
+            current = []
+            current_words = 0
+
+    if current:
+        passages.append(" ".join(current))
+    return passages
+
+
+class Retriever:
+    """Arama altyapıları için ortak arayüz"""
+
+    passages = []
+
+    def __len__(self):
+        return len(self.passages)
+
+    def add_passages(self, passages):
+        """Yeni pasajları indekse ekler"""
+        raise NotImplementedError
+
+    def search(self, query, k=3):
+        """[{"id", "text", "score"}, ...] biçiminde en iyi k sonucu döner"""
+        raise NotImplementedError
+
+
+class BM25Retriever(Retriever):
+    """Pasajlar üzerinde ters indeksli BM25 arama"""
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.passages = []
+        self.doc_lengths = []
+        self.postings = {}
+        self.total_length = 0
+        self.signature = None
+
+    def add_passages(self, passages):
+        """Yeni pasajları indekse ekler; mevcut girdiler yeniden işlenmez"""
+        for passage in passages:
+            doc_id = len(self.passages)
+            term_counts = Counter(tokenize(passage))
+            self.passages.append(passage)
+            length = sum(term_counts.values())
+            self.doc_lengths.append(length)
+            self.total_length += length
+            for term, tf in term_counts.items():
+                self.postings.setdefault(term, []).append((doc_id, tf))
+
+    def search(self, query, k=3):
+        """Sorguya en uygun k pasajı skorlarıyla döner"""
+        if not self.passages:
+            return []
+
+        num_docs = len(self.passages)
+        avg_length = self.total_length / num_docs or 1.0
+        scores = {}
+
+        for term in set(tokenize(query)):
+            term_postings = self.postings.get(term)
+            if not term_postings:
+                continue
+            df = len(term_postings)
+            idf = math.log(1 + (num_docs - df + 0.5) / (df + 0.5))
+            for doc_id, tf in term_postings:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        top = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [{"id": doc_id, "text": self.passages[doc_id], "score": score} for doc_id, score in top]
+
+    def save(self, path):
+        """İndeksi JSON olarak diske yazar"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        data = {
+            "version": INDEX_FORMAT_VERSION,
+            "k1": self.k1,
+            "b": self.b,
+            "signature": self.signature,
+            "passages": self.passages,
+            "doc_lengths": self.doc_lengths,
+            # Her terim için [doc_id, tf, doc_id, tf, ...] düz listesi
+            "postings": {term: [x for pair in plist for x in pair] for term, plist in self.postings.items()},
+        }
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Diske yazılmış indeksi yükler"""
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != INDEX_FORMAT_VERSION:
+            raise ValueError(f"Desteklenmeyen indeks sürümü: {data.get('version')}")
+
+        index = cls(k1=data["k1"], b=data["b"])
+        index.signature = data["signature"]
+        index.passages = data["passages"]
+        index.doc_lengths = data["doc_lengths"]
+        index.total_length = sum(index.doc_lengths)
+        index.postings = {term: list(zip(flat[0::2], flat[1::2])) for term, flat in data["postings"].items()}
+        return index
+
+    @classmethod
+    def build(cls, corpus_path=CORPUS_PATH):
+        """Korpusu pasajlara bölüp sıfırdan indeks oluşturur"""
+        index = cls()
+        index.add_passages(chunk_sentences(get_corpus(corpus_path).iter_sentences()))
+        index.signature = corpus_signature(corpus_path)
+        return index
+
+
+def load_or_build_index(corpus_path=CORPUS_PATH, index_path=BM25_INDEX_PATH):
+    """BM25 indeksini diskten yükler; yoksa ya da korpus değişmişse yeniden oluşturur"""
+    if not os.path.exists(corpus_path):
+        print(f"⚠️ Korpus bulunamadı: {corpus_path}")
+        return None
+
+    signature = corpus_signature(corpus_path)
+    if os.path.exists(index_path):
+        try:
+            start = time.perf_counter()
+            index = BM25Retriever.load(index_path)
+            if index.signature == signature:
+                print(f"✅ BM25 indeksi yüklendi ({len(index)} pasaj, {time.perf_counter() - start:.2f} sn)")
+                return index
+            print("🔁 Korpus değişmiş, BM25 indeksi yeniden oluşturuluyor...")
+        except Exception as e:
+            print(f"⚠️ BM25 indeksi okunamadı, yeniden oluşturuluyor: {e}")
+
+    start = time.perf_counter()
+    index = BM25Retriever.build(corpus_path)
+    index.save(index_path)
+    print(f"✅ BM25 indeksi oluşturuldu ({len(index)} pasaj, {time.perf_counter() - start:.2f} sn)")
+    return index
+
+
+def load_retriever(backend=RETRIEVER_BACKEND, corpus_path=CORPUS_PATH):
+    """İstenen arama altyapısını diskten yükler ya da oluşturur"""
+    if backend == "dense":
+        # numpy yalnızca vektör altyapısı seçildiğinde yüklenir
+        from vector_store import load_or_build_dense_index
+        return load_or_build_dense_index(corpus_path)
+    if backend != "bm25":
+        print(f"⚠️ Bilinmeyen retriever '{backend}', BM25 kullanılıyor")
+    return load_or_build_index(corpus_path)
+
+
+def append_to_indexes(previous_signature, corpus_path=CORPUS_PATH):
+    """Korpusun sonuna eklenen metni mevcut indekslere, yeniden oluşturmadan ekler.
+
+    Eklenen kısım, tam oluşturmayla aynı cümle ofsetleri ve pasaj bölme ile
+    işlenir. Yalnızca ekleme öncesi korpusla güncel olan indeksler güncellenir;
+    diğerleri bir sonraki yüklemede zaten yeniden oluşturulur.
+    """
+    passages = chunk_sentences(get_corpus(corpus_path).iter_sentences(previous_signature["size"]))
+    signature = corpus_signature(corpus_path)
+
+    if os.path.exists(BM25_INDEX_PATH):
+        try:
+            index = BM25Retriever.load(BM25_INDEX_PATH)
+            if index.signature == previous_signature:
+                index.add_passages(passages)
+                index.signature = signature
+                index.save(BM25_INDEX_PATH)
+                print(f"✅ BM25 indeksine {len(passages)} pasaj eklendi")
+        except Exception as e:
+            print(f"⚠️ BM25 indeksi güncellenemedi: {e}")
+
+    if os.path.exists(os.path.join(DENSE_INDEX_DIR, "manifest.json")):
+        try:
+            from vector_store import DenseRetriever
+            index = DenseRetriever.load(DENSE_INDEX_DIR)
+            if index.signature == previous_signature:
+                index.add_passages(passages)
+                index.signature = signature
+                index.save()
+                print(f"✅ Vektör indeksine {len(passages)} pasaj eklendi")
+        except Exception as e:
+            print(f"⚠️ Vektör indeksi güncellenemedi: {e}")
+
+
+_retriever = None
+_retriever_lock = threading.Lock()
+
+
+def get_retriever():
+    """Süreç genelinde tek bir retriever örneği döner"""
+    global _retriever
+    if _retriever is None:
+        with _retriever_lock:
+            if _retriever is None:
+                _retriever = load_retriever(RETRIEVER_BACKEND)
+    return _retriever
+
+
+def retrieve_hits(query, k=3):
+    """Sorgu için en uygun k pasajı skorlarıyla döner; korpus yoksa boş liste"""
+    retriever = get_retriever()
+    if retriever is None:
+        return []
+    return retriever.search(query, k)
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == "build":
+        if RETRIEVER_BACKEND == "dense":
+            from vector_store import remove_dense_index
+            remove_dense_index(DENSE_INDEX_DIR)
+        elif os.path.exists(BM25_INDEX_PATH):
+            os.remove(BM25_INDEX_PATH)
+        load_retriever()
+    else:
+        query = " ".join(sys.argv[1:]) or "artificial intelligence"
+        retriever = get_retriever()
+        if retriever:
+            start = time.perf_counter()
+            hits = retriever.search(query, 3)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            print(f"🔎 '{query}' için {len(hits)} pasaj ({elapsed_ms:.2f} ms)")
+            for hit in hits:
+                print(f"[{hit['id']}] ({hit['score']:.2f}) {hit['text'][:200]}...")
@@ -0,0 +1,54 @@
+from typing import Dict, List, Literal, get_args, get_origin
+from pydantic import BaseModel, Field, TypeAdapter
+
+# --- Pydantic Modelleri ---
+class Question(BaseModel):
+    question_id: int = Field(..., description="Soru numarası.")
+    question_text: str = Field(..., description="Soru metni.")
+    options: Dict[Literal['A', 'B', 'C', 'D', 'E'], str] = Field(..., description="5 adet seçenek.")
+    correct_option: Literal['A', 'B', 'C', 'D', 'E'] = Field(..., description="Doğru cevap anahtarı.")
+    explanation: str = Field(..., description="Doğru cevabın kısa açıklaması.")
+    question_type: str = Field(..., description="Soru tipi")
+
+class Quiz(BaseModel):
+    quiz: List[Question]
+
+# Doğrulayıcı bir kez kurulur, her yanıtta yeniden oluşturulmaz
+QUIZ_ADAPTER = TypeAdapter(Quiz)
+
+# --- Yapılandırılmış Çıktı Şeması ---
+_SCALAR_TYPES = {str: "string", int: "integer", float: "number", bool: "boolean"}
+
+def _annotation_schema(annotation):
+    """Tip ipucunu Gemini'nin kabul ettiği OpenAPI alt kümesine çevirir ($ref ve additionalProperties yok)"""
+    origin = get_origin(annotation)
+    args = get_args(annotation)
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return response_schema(annotation)
+    if origin is list:
+        return {"type": "array", "items": _annotation_schema(args[0])}
+    if origin is Literal:
+        return {"type": "string", "enum": [str(arg) for arg in args]}
+    if origin is dict:
+        # Anahtarları sabit (Literal) sözlükler her anahtarı zorunlu bir alan olarak tanımlar
+        keys = [str(key) for key in get_args(args[0])]
+        if not keys:
+            raise TypeError(f"Şemaya çevrilemeyen sözlük tipi: {annotation}")
+        return {"type": "object", "properties": {key: _annotation_schema(args[1]) for key in keys}, "required": keys}
+    if annotation in _SCALAR_TYPES:
+        return {"type": _SCALAR_TYPES[annotation]}
+    raise TypeError(f"Şemaya çevrilemeyen tip: {annotation}")
+
+def response_schema(model):
+    """Pydantic modelinden structured output (JSON modu) şeması türetir"""
+    properties = {}
+    for name, field in model.model_fields.items():
+        schema = _annotation_schema(field.annotation)
+        if field.description:
+            schema["description"] = field.description
+        properties[name] = schema
+    required = [name for name, field in model.model_fields.items() if field.is_required()]
+    return {"type": "object", "properties": properties, "required": required}
+
+# Modeller değişince şema da kendiliğinden değişir; elle yazılmış JSON örneği tutulmaz
+QUIZ_RESPONSE_SCHEMA = response_schema(Quiz)
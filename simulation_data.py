@@ -0,0 +1,101 @@
+from question_store import freeze_question
+
+# --- SİMÜLASYON VERİSİ ---
+# API kullanılamadığında gösterilen örnek sorular. Modül süreçte bir kez
+# yüklenir; sorular salt okunurdur, app her çalıştırmada yeniden kurmaz.
+BOŞLUK_DOLDURMA_SORULARI = [
+    {
+        "question_id": 1,
+        "question_text": "The rapid ______ of artificial intelligence across various sectors is expected to significantly reshape global labor markets.",
+        "options": {"A": "stagnation", "B": "proliferation", "C": "retraction", "D": "curtailment", "E": "impediment"},
+        "correct_option": "B",
+        "explanation": "'Proliferation' means rapid increase or spread, which fits the context of AI expansion.",
+        "question_type": "boşluk doldurma"
+    }
+]
+
+PARAGRAF_SORULARI = [
+    {
+        "question_id": 1,
+        "question_text": "Reading comprehension: The concept of sustainable development has gained significant traction in recent decades. This approach emphasizes meeting present needs without compromising future generations' ability to meet their own needs. What is the primary focus of sustainable development?",
+        "options": {
+            "A": "Maximizing current economic growth at all costs",
+            "B": "Balancing present needs with future generations' requirements", 
+            "C": "Eliminating all industrial activities",
+            "D": "Focusing exclusively on environmental conservation",
+            "E": "Prioritizing social equity over economic considerations"
+        },
+        "correct_option": "B",
+        "explanation": "The text emphasizes balancing present and future needs.",
+        "question_type": "paragraf sorusu"
+    }
+]
+
+KELİME_ANLAMI_SORULARI = [
+    {
+        "question_id": 1,
+        "question_text": "Choose the word that is closest in meaning to 'ubiquitous':",
+        "options": {
+            "A": "Rare",
+            "B": "Widespread", 
+            "C": "Complicated",
+            "D": "Expensive",
+            "E": "Temporary"
+        },
+        "correct_option": "B",
+        "explanation": "'Ubiquitous' means found everywhere, making 'widespread' the closest synonym.",
+        "question_type": "kelime anlamı"
+    }
+]
+
+DİL_BİLGİSİ_SORULARI = [
+    {
+        "question_id": 1,
+        "question_text": "Choose the correct verb form: If I ______ more time, I would have completed the project successfully.",
+        "options": {
+            "A": "have had",
+            "B": "had had", 
+            "C": "would have",
+            "D": "had",
+            "E": "have"
+        },
+        "correct_option": "B",
+        "explanation": "Type 3 conditional requires 'if + past perfect, would + have + past participle'.",
+        "question_type": "dil bilgisi"
+    }
+]
+
+CLOZE_TEST_SORULARI = [
+    {
+        "question_id": 1,
+        "question_text": "Cloze test: Climate change represents one of the most pressing challenges of our time. The ______ of greenhouse gases has led to increased global temperatures. This phenomenon has far-reaching consequences for ecosystems worldwide.",
+        "options": {
+            "A": "reduction, known, manageable",
+            "B": "release, referred, irreversible", 
+            "C": "absorption, called, temporary",
+            "D": "elimination, termed, beneficial",
+            "E": "production, named, insignificant"
+        },
+        "correct_option": "B",
+        "explanation": "'Release', 'referred', and 'irreversible' fit the context of climate change discussion.",
+        "question_type": "cloze test"
+    }
+]
+
+BOŞLUK_DOLDURMA_SORULARI = tuple(freeze_question(q) for q in BOŞLUK_DOLDURMA_SORULARI)
+PARAGRAF_SORULARI = tuple(freeze_question(q) for q in PARAGRAF_SORULARI)
+KELİME_ANLAMI_SORULARI = tuple(freeze_question(q) for q in KELİME_ANLAMI_SORULARI)
+DİL_BİLGİSİ_SORULARI = tuple(freeze_question(q) for q in DİL_BİLGİSİ_SORULARI)
+CLOZE_TEST_SORULARI = tuple(freeze_question(q) for q in CLOZE_TEST_SORULARI)
+
+# Tüm soruları birleştir
+TÜM_SORULAR = BOŞLUK_DOLDURMA_SORULARI + PARAGRAF_SORULARI + KELİME_ANLAMI_SORULARI + DİL_BİLGİSİ_SORULARI + CLOZE_TEST_SORULARI
+
+# Soru tipine göre kaynak; bilinmeyen tipler cloze test sorularını kullanır
+SIMULATION_QUESTIONS = {
+    "boşluk doldurma": BOŞLUK_DOLDURMA_SORULARI,
+    "paragraf sorusu": PARAGRAF_SORULARI,
+    "kelime anlamı": KELİME_ANLAMI_SORULARI,
+    "dil bilgisi": DİL_BİLGİSİ_SORULARI,
+    "cloze test": CLOZE_TEST_SORULARI,
+}
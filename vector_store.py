@@ -0,0 +1,322 @@
+import os
+import re
+import json
+import time
+import mmap
+import shutil
+import threading
+import zlib
+import numpy as np
+
+from corpus import get_corpus
+from retrieval import CORPUS_PATH, DENSE_INDEX_DIR, INDEX_DIR, Retriever, chunk_sentences, corpus_signature
+
+# --- Vektör İndeksi Ayarları ---
+# "hashing" ağ bağlantısı gerektirmez; "gemini" Gemini embedding API'sini kullanır
+EMBEDDER = os.getenv("EMBEDDER", "hashing").lower()
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "models/embedding-001")
+HASHING_DIM = 1024
+
+DENSE_FORMAT_VERSION = 2
+
+_WORD_RE = re.compile(r"[^\W\d_]+")
+_TURKISH_CASE = str.maketrans({"İ": "i", "I": "i"})
+
+
+class HashingEmbedder:
+    """Kelime ve karakter n-gram'larını sabit boyutlu vektöre hash'leyen çevrimdışı embedder.
+
+    crc32 kullanıldığı için vektörler süreçler ve çalıştırmalar arasında aynıdır.
+    """
+
+    name = "hashing"
+
+    def __init__(self, dim=HASHING_DIM, ngram_range=(3, 5)):
+        self.dim = dim
+        self.ngram_range = ngram_range
+        self._cache = {}
+
+    def _word_features(self, word):
+        """Bir kelimenin hash indekslerini ve işaretlerini döner (kelime başına önbellekli)"""
+        cached = self._cache.get(word)
+        if cached is not None:
+            return cached
+
+        features = ["w:" + word]
+        padded = f"<{word}>"
+        for n in range(self.ngram_range[0], self.ngram_range[1] + 1):
+            features.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+
+        hashes = np.array([zlib.crc32(f.encode("utf-8")) for f in features], dtype=np.uint32)
+        # Üst bit işareti belirler, çakışmaların etkisini dengeler
+        cached = (hashes % self.dim, np.where(hashes & 0x80000000, 1.0, -1.0))
+        self._cache[word] = cached
+        return cached
+
+    def embed(self, texts):
+        """Metin listesini L2 normalize edilmiş float32 matrise çevirir"""
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = _WORD_RE.findall(text.translate(_TURKISH_CASE).lower())
+            if not words:
+                continue
+            parts = [self._word_features(word) for word in words]
+            indices = np.concatenate([p[0] for p in parts])
+            signs = np.concatenate([p[1] for p in parts])
+            matrix[row] = np.bincount(indices, weights=signs, minlength=self.dim)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+
+class GeminiEmbedder:
+    """Gemini embedding API'si ile embedder (ağ bağlantısı ve API anahtarı gerekir)"""
+
+    name = "gemini"
+
+    def __init__(self, model_name=EMBEDDING_MODEL):
+        import google.generativeai as genai
+        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+        self._genai = genai
+        self.model_name = model_name
+        self.dim = None
+
+    def embed(self, texts):
+        if not texts:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        # Liste verilince istemci batchEmbedContents ile 100'erli istekler gönderir
+        vectors = self._genai.embed_content(model=self.model_name, content=list(texts))["embedding"]
+        matrix = np.asarray(vectors, dtype=np.float32).reshape(len(texts), -1)
+        self.dim = matrix.shape[1]
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+
+def get_embedder(name=EMBEDDER):
+    """Ada göre embedder örneği döner"""
+    if name == "gemini":
+        return GeminiEmbedder()
+    return HashingEmbedder()
+
+
+class PassageStore:
+    """Pasaj metinleri: JSONL dosyası + satır bitişlerinin uint64 ofset dosyası.
+
+    İki dosya da mmap ile okunur; pasaj i tek satır çözülerek getirilir. Aynı
+    indeksi açan süreçler metinleri belleğe kopyalamaz, sayfa önbelleğini paylaşır.
+    Geçerli pasaj sayısı manifestte tutulur; yarıda kalan bir eklemenin artığı
+    bir sonraki eklemede kesilip atılır.
+    """
+
+    def __init__(self, path, count=0):
+        self.path = path
+        self.offsets_path = path + ".idx"
+        self.count = count
+        self._data = None
+        self._ends = None
+        self._file = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self.count
+
+    def _map(self):
+        with self._lock:
+            if self._data is None:
+                self._file = open(self.path, "rb")
+                self._ends = np.memmap(self.offsets_path, dtype=np.uint64, mode="r", shape=(self.count,))
+                self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            return self._data, self._ends
+
+    def __getitem__(self, i):
+        if not 0 <= i < self.count:
+            raise IndexError(i)
+        data, ends = self._map()
+        start = int(ends[i - 1]) if i else 0
+        return json.loads(data[start:int(ends[i])])
+
+    def __iter__(self):
+        return (self[i] for i in range(self.count))
+
+    def append(self, passages):
+        """Pasajları dosyaların sonuna ekler"""
+        if not passages:
+            return
+        self.close()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        lines = [json.dumps(p, ensure_ascii=False).encode("utf-8") + b"\n" for p in passages]
+        committed = 0
+        if self.count:
+            committed = int(np.memmap(self.offsets_path, dtype=np.uint64, mode="r", shape=(self.count,))[-1])
+        with open(self.offsets_path, "ab") as offsets_file, open(self.path, "ab") as data_file:
+            # Manifestte olmayan (yarıda kalmış) kayıtlar kesilir
+            offsets_file.truncate(self.count * 8)
+            data_file.truncate(committed)
+            data_file.writelines(lines)
+            np.cumsum([committed] + [len(line) for line in lines], dtype=np.uint64)[1:].tofile(offsets_file)
+        self.count += len(lines)
+
+    def close(self):
+        with self._lock:
+            if self._data is not None:
+                self._data.close()
+                self._file.close()
+            self._data = self._ends = self._file = None
+
+
+class DenseRetriever(Retriever):
+    """Segment dosyalarında saklanan float32 embedding'ler üzerinde kosinüs arama.
+
+    Her segment ayrı bir .npy dosyasıdır ve mmap ile açılır; pasaj metinleri de
+    mmap'li PassageStore'dadır. Aynı indeksi kullanan Streamlit ve işçi süreçleri
+    işletim sisteminin sayfa önbelleğini paylaşır, her biri kopya yüklemez.
+    """
+
+    def __init__(self, index_dir=DENSE_INDEX_DIR, embedder=None, passage_count=0):
+        self.index_dir = index_dir
+        self.embedder = embedder or get_embedder()
+        self.passages = PassageStore(os.path.join(index_dir, "passages.jsonl"), passage_count)
+        self.segments = []
+        self.segment_files = []
+        self.signature = None
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.index_dir, "manifest.json")
+
+    def add_passages(self, passages):
+        """Pasajları embed edip yeni bir segment dosyası olarak ekler"""
+        if not passages:
+            return
+        os.makedirs(self.index_dir, exist_ok=True)
+        matrix = self.embedder.embed(list(passages))
+        segment_file = f"segment_{len(self.segment_files):04d}.npy"
+        np.save(os.path.join(self.index_dir, segment_file), matrix)
+        self.segment_files.append(segment_file)
+        self.segments.append(np.load(os.path.join(self.index_dir, segment_file), mmap_mode="r"))
+        self.passages.append(passages)
+
+    def search(self, query, k=3):
+        """Sorguya kosinüs benzerliği en yüksek k pasajı döner"""
+        if not len(self.passages):
+            return []
+
+        query_vector = self.embedder.embed([query])[0]
+        candidate_ids = []
+        candidate_scores = []
+        offset = 0
+
+        for segment in self.segments:
+            scores = segment @ query_vector
+            top_k = min(k, len(scores))
+            top = np.argpartition(-scores, top_k - 1)[:top_k]
+            candidate_ids.append(top + offset)
+            candidate_scores.append(scores[top])
+            offset += len(segment)
+
+        ids = np.concatenate(candidate_ids)
+        scores = np.concatenate(candidate_scores)
+        order = np.argsort(-scores)[:k]
+        return [{"id": int(ids[i]), "text": self.passages[int(ids[i])], "score": float(scores[i])} for i in order]
+
+    def save(self):
+        """Manifesti diske yazar (segmentler ve pasaj metinleri eklenirken yazılır)"""
+        os.makedirs(self.index_dir, exist_ok=True)
+        manifest = {
+            "version": DENSE_FORMAT_VERSION,
+            "embedder": self.embedder.name,
+            "dim": self.embedder.dim,
+            "segments": self.segment_files,
+            "passages": len(self.passages),
+            "signature": self.signature,
+        }
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(tmp_path, self.manifest_path)
+
+    @classmethod
+    def load(cls, index_dir=DENSE_INDEX_DIR):
+        """Manifesti okur ve segmentleri mmap ile açar"""
+        with open(os.path.join(index_dir, "manifest.json"), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("version") != DENSE_FORMAT_VERSION:
+            raise ValueError(f"Desteklenmeyen indeks sürümü: {manifest.get('version')}")
+
+        index = cls(index_dir, get_embedder(manifest["embedder"]), manifest["passages"])
+        index.signature = manifest["signature"]
+        index.segment_files = manifest["segments"]
+        index.segments = [np.load(os.path.join(index_dir, name), mmap_mode="r") for name in index.segment_files]
+        if sum(len(segment) for segment in index.segments) != len(index.passages):
+            raise ValueError("Segmentler ile pasaj sayısı tutarsız")
+        return index
+
+    def sync_to_chroma(self, collection_name="yds_passages", persist_dir=None):
+        """Embedding'leri isteğe bağlı olarak bir Chroma koleksiyonuna aktarır"""
+        import chromadb
+
+        client = chromadb.PersistentClient(path=persist_dir or os.path.join(INDEX_DIR, "chroma"))
+        collection = client.get_or_create_collection(collection_name, metadata={"hnsw:space": "cosine"})
+        offset = 0
+        for segment in self.segments:
+            ids = [str(i) for i in range(offset, offset + len(segment))]
+            collection.upsert(
+                ids=ids,
+                embeddings=np.asarray(segment).tolist(),
+                documents=[self.passages[i] for i in range(offset, offset + len(segment))],
+            )
+            offset += len(segment)
+        print(f"✅ {offset} pasaj Chroma koleksiyonuna aktarıldı: {collection_name}")
+        return collection
+
+
+def remove_dense_index(index_dir=DENSE_INDEX_DIR):
+    """Vektör indeksi klasörünü siler"""
+    if os.path.isdir(index_dir):
+        shutil.rmtree(index_dir)
+
+
+def load_or_build_dense_index(corpus_path=CORPUS_PATH, index_dir=DENSE_INDEX_DIR):
+    """Vektör indeksini diskten yükler; yoksa ya da korpus değişmişse yeniden oluşturur"""
+    if not os.path.exists(corpus_path):
+        print(f"⚠️ Korpus bulunamadı: {corpus_path}")
+        return None
+
+    signature = corpus_signature(corpus_path)
+    if os.path.exists(os.path.join(index_dir, "manifest.json")):
+        try:
+            start = time.perf_counter()
+            index = DenseRetriever.load(index_dir)
+            if index.signature == signature and index.embedder.name == EMBEDDER:
+                print(f"✅ Vektör indeksi yüklendi ({len(index)} pasaj, {time.perf_counter() - start:.2f} sn)")
+                return index
+            print("🔁 Korpus ya da embedder değişmiş, vektör indeksi yeniden oluşturuluyor...")
+        except Exception as e:
+            print(f"⚠️ Vektör indeksi okunamadı, yeniden oluşturuluyor: {e}")
+
+    start = time.perf_counter()
+    remove_dense_index(index_dir)
+    passages = chunk_sentences(get_corpus(corpus_path).iter_sentences())
+    index = DenseRetriever(index_dir)
+    index.add_passages(passages)
+    index.signature = signature
+    index.save()
+    print(f"✅ Vektör indeksi oluşturuldu ({len(index)} pasaj, {time.perf_counter() - start:.2f} sn)")
+    return index
+
+
+if __name__ == "__main__":
+    import sys
+
+    index = load_or_build_dense_index()
+    if index and len(sys.argv) > 1 and sys.argv[1] == "chroma":
+        index.sync_to_chroma()
+    elif index:
+        query = " ".join(sys.argv[1:]) or "artificial intelligence"
+        start = time.perf_counter()
+        hits = index.search(query, 3)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        print(f"🔎 '{query}' için {len(hits)} pasaj ({elapsed_ms:.2f} ms)")
+        for hit in hits:
+            print(f"[{hit['id']}] ({hit['score']:.3f}) {hit['text'][:200]}...")